@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the query engine shared by both servers (src/query_engine.py)
+
+Measures, for each tool query shape:
+
+- compile: building its QueryPlan from tool arguments, with the memoized
+  projections, sorts and stages warm ("memoized") and cleared before every
+  call ("cold"), so the saving of shape memoization shows up directly
+- cache: a result cache hit for one page of articles
+
+With --execute N it also runs N plans per shape against the MongoDB in
+MONGODB_URI (PyMongo, one at a time) and reports p50/p95/p99 latency, like
+scripts/bench_tools.py but without either server around the engine.
+
+Usage:
+    python scripts/bench_query_engine.py [--repeat N] [--execute N] [-o bench_engine.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+from generate_corpus import CATEGORIES, TOPIC_WORDS
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import query_engine as engine  # noqa: E402
+from trends import trend_window  # noqa: E402
+
+
+def build_shapes(collection_name: str, rng: random.Random) -> dict:
+    """Map shape name -> zero-argument plan compiler with randomized arguments"""
+    category_keys = [engine.normalize_category(name) for name, _ in CATEGORIES]
+    words = [word for words in TOPIC_WORDS.values() for word in words]
+    fields_choices = [None, ["title", "url", "published_date"], ["title", "content", "source"]]
+
+    def cutoff() -> datetime:
+        return datetime.now() - timedelta(days=rng.choice((1, 7, 30)))
+
+    def after() -> list:
+        return [datetime.now() - timedelta(minutes=rng.randrange(10_000)), ObjectId()]
+
+    def trends():
+        # Hourly buckets, read from the hourly rollups
+        bin_size = rng.choice((1, 6))
+        return engine.trends_plan("category", rng.sample(category_keys, 3), "hour", bin_size, *trend_window("hour", 7))
+
+    return {
+        "fetch_news": lambda: engine.fetch_news_plan(
+            None, cutoff(), "date", 10, rng.choice(fields_choices)
+        ),
+        "fetch_news.category.cursor": lambda: engine.fetch_news_plan(
+            rng.choice(category_keys), cutoff(), "date", 10, rng.choice(fields_choices), after=after()
+        ),
+        "fetch_news.relevance": lambda: engine.fetch_news_plan(
+            rng.choice(category_keys), cutoff(), "relevance", 10, rng.choice(fields_choices)
+        ),
+        "fetch_news_multi": lambda: engine.multi_category_plan(
+            collection_name, rng.sample(category_keys, 5), cutoff(), 5, rng.choice(fields_choices)
+        ),
+        "search_news": lambda: engine.text_search_plan(rng.choice(words), 10, rng.choice(fields_choices)),
+        "search_news.substring": lambda: engine.substring_search_plan(
+            rng.choice(words), 10, rng.choice(fields_choices), cutoff_date=cutoff()
+        ),
+        "news_trends": trends,
+    }
+
+
+def measure_compile(compile_plan, repeat: int, cold: bool) -> float:
+    """Mean microseconds per compiled plan"""
+    total = 0.0
+    for _ in range(repeat):
+        if cold:
+            engine.clear_plan_cache()
+        started = time.perf_counter()
+        compile_plan()
+        total += time.perf_counter() - started
+    return 1e6 * total / repeat
+
+
+def measure_cache_hit(repeat: int) -> float:
+    """Mean microseconds per result cache hit on a 10-article page"""
+    cache = engine.QueryCache(ttl_seconds=60, max_entries=1024, max_bytes=64 * 1024 * 1024)
+    now = datetime.now()
+    page = [
+        {"_id": str(ObjectId()), "title": f"Article {i}", "content": "Lorem ipsum " * 16,
+         "category": "Technology", "source": "Bench Wire", "published_date": (now - timedelta(minutes=i)).isoformat()}
+        for i in range(10)
+    ]
+    key = ("fetch_news", "technology", 10, 7, (), engine.DEFAULT_PREVIEW_CHARS, None)
+    cache.set(key, (page, None), frozenset({"technology"}))
+    started = time.perf_counter()
+    for _ in range(repeat):
+        cache.get(key)
+    return 1e6 * (time.perf_counter() - started) / repeat
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure_execute(repository: engine.NewsRepository, shape: str, compile_plan, count: int) -> dict:
+    """Run count plans of one shape and report their latency"""
+    collection = repository.rollups["hour"] if shape == "news_trends" else repository.news
+    latencies = []
+    errors = 0
+    for _ in range(count):
+        plan = compile_plan()
+        started = time.perf_counter()
+        try:
+            engine.run_plan(collection, plan)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared query engine")
+    parser.add_argument("--repeat", type=int, default=10_000, help="Plans compiled per shape and mode")
+    parser.add_argument("--execute", type=int, default=0, help="Also run this many plans per shape against MongoDB")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for randomized tool arguments")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+    report = {"compile": {}, "cache_hit_us": measure_cache_hit(args.repeat), "execute": {}}
+
+    print(f"{'shape':<28} {'memoized us':>12} {'cold us':>10}", file=sys.stderr)
+    for mode in ("cold", "memoized"):
+        shapes = build_shapes(collection_name, random.Random(args.seed))
+        engine.clear_plan_cache()
+        for name, compile_plan in shapes.items():
+            report["compile"].setdefault(name, {})[f"{mode}_us"] = measure_compile(
+                compile_plan, args.repeat, mode == "cold"
+            )
+    for name, result in report["compile"].items():
+        print(f"{name:<28} {result['memoized_us']:>12.2f} {result['cold_us']:>10.2f}", file=sys.stderr)
+    report["plan_cache"] = engine.plan_cache_info()
+
+    if args.execute:
+        client = MongoClient(engine.mongo_uri(), **engine.client_options())
+        repository = engine.NewsRepository(client)
+        try:
+            for name, compile_plan in build_shapes(collection_name, random.Random(args.seed)).items():
+                report["execute"][name] = measure_execute(repository, name, compile_plan, args.execute)
+                print(f"{name:<28} p50 {report['execute'][name]['p50_ms']:.2f}ms  "
+                      f"p99 {report['execute'][name]['p99_ms']:.2f}ms", file=sys.stderr)
+        finally:
+            client.close()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the stdio server's widget text renderer
+
+Compares the previous string-concatenating renderer with the one-pass
+renderer in src/server.py, for 10, 1k and 10k articles.
+
+Usage: python scripts/bench_render.py [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from server import format_news_for_widget, iter_news_widget_chunks  # noqa: E402
+
+SIZES = (10, 1_000, 10_000)
+
+
+def legacy_format_news_for_widget(news_articles: list, title: str = "News Feed") -> str:
+    """The renderer as it was before the one-pass rewrite, kept as a baseline"""
+    result = f"📰 **{title}**\n\n"
+    result += f"Found {len(news_articles)} article(s)\n\n"
+    result += "=" * 60 + "\n\n"
+
+    for idx, article in enumerate(news_articles, 1):
+        title = article.get("title", "Untitled")
+        content = article.get("content", "No content available")
+        source = article.get("source", "Unknown source")
+        category = article.get("category", "Uncategorized")
+        published_date = article.get("published_date", datetime.now())
+        url = article.get("url", "")
+
+        if isinstance(published_date, datetime):
+            date_str = published_date.strftime("%B %d, %Y %I:%M %p")
+        else:
+            date_str = str(published_date)
+
+        content_preview = content[:200] + "..." if len(content) > 200 else content
+
+        result += f"**{idx}. {title}**\n"
+        result += f"📂 Category: {category}\n"
+        result += f"📰 Source: {source}\n"
+        result += f"📅 Published: {date_str}\n\n"
+        result += f"{content_preview}\n\n"
+
+        if url:
+            result += f"🔗 Read more: {url}\n\n"
+
+        result += "-" * 60 + "\n\n"
+
+    return result
+
+
+def make_articles(count: int) -> list:
+    """Build articles shaped like the projected query results"""
+    now = datetime(2025, 10, 15, 12, 0)
+    return [
+        {
+            "title": f"Article {i}: Markets, models and the weather",
+            "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+            "content_truncated": True,
+            "category": ("Technology", "Business", "Sports", "Health")[i % 4],
+            "source": "Bench Wire",
+            "url": f"https://example.com/articles/{i}",
+            "published_date": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def measure(func, articles: list, repeat: int) -> float:
+    """Best-of-repeat seconds for one render"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(articles)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark widget text rendering")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    renderers = {
+        "legacy": legacy_format_news_for_widget,
+        "one-pass": format_news_for_widget,
+        "chunked": lambda articles: list(iter_news_widget_chunks(articles, chunk_articles=100)),
+    }
+
+    print(f"{'articles':>10} {'renderer':>10} {'ms/render':>12} {'articles/s':>14}")
+    for size in SIZES:
+        articles = make_articles(size)
+        for name, func in renderers.items():
+            seconds = measure(func, articles, args.repeat)
+            print(f"{size:>10} {name:>10} {seconds * 1000:>12.3f} {size / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for article result serialization in the HTTP server
+
+Measures per-article CPU cost from raw BSON (as the driver receives it) to
+JSON bytes, with no MongoDB needed:
+
+- legacy:   default decoding, then the old loop rewriting _id with str() and
+            published_date with isoformat(), then json.dumps
+- registry: decoding with src/query_engine.py's ARTICLE_CODEC_OPTIONS (ObjectId and
+            datetime become strings while parsing), then json.dumps
+- orjson:   registry decoding, then orjson.dumps (FAST_JSON=true)
+
+Usage: python scripts/bench_serialize.py [--articles 100 1000] [--repeat N]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from datetime import datetime, timedelta
+
+import bson
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from query_engine import ARTICLE_CODEC_OPTIONS  # noqa: E402
+
+
+def make_batch(count: int) -> bytes:
+    """Concatenated BSON documents shaped like projected fetch_news results"""
+    now = datetime(2025, 10, 15, 12, 0)
+    return b"".join(
+        bson.encode({
+            "_id": ObjectId(),
+            "title": f"Article {i}: Markets, models and the weather",
+            "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+            "content_truncated": True,
+            "category": ("Technology", "Business", "Sports", "Health")[i % 4],
+            "source": "Bench Wire",
+            "url": f"https://example.com/articles/{i}",
+            "published_date": now - timedelta(minutes=i),
+        })
+        for i in range(count)
+    )
+
+
+def legacy(data: bytes, codec_options) -> bytes:
+    articles = bson.decode_all(data)
+    for article in articles:
+        article["_id"] = str(article["_id"])
+        if isinstance(article.get("published_date"), datetime):
+            article["published_date"] = article["published_date"].isoformat()
+    return json.dumps(articles, default=str).encode()
+
+
+def registry(data: bytes, codec_options) -> bytes:
+    return json.dumps(bson.decode_all(data, codec_options), default=str).encode()
+
+
+def registry_orjson(data: bytes, codec_options) -> bytes:
+    import orjson
+    return orjson.dumps(bson.decode_all(data, codec_options), default=str)
+
+
+def measure(func, data: bytes, codec_options, repeat: int) -> float:
+    """Best-of-repeat seconds for one batch"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(data, codec_options)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark article result serialization")
+    parser.add_argument("--articles", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Batch sizes to measure")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    paths = {"legacy": legacy, "registry": registry}
+    if importlib.util.find_spec("orjson") is not None:
+        paths["orjson"] = registry_orjson
+    else:
+        print("orjson is not installed; skipping the orjson path")
+
+    print(f"{'articles':>10} {'path':>10} {'us/article':>12} {'vs legacy':>10}")
+    for size in args.articles:
+        data = make_batch(size)
+        baseline = None
+        for name, func in paths.items():
+            seconds = measure(func, data, ARTICLE_CODEC_OPTIONS, args.repeat)
+            baseline = baseline or seconds
+            print(f"{size:>10} {name:>10} {seconds / size * 1e6:>12.2f} {baseline / seconds:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Repeatable benchmark for the news tools of both servers
+
+Exercises fetch_news, search_news, semantic_search_news and get_news_categories from src/server.py
+(stdio) and server/main.py (FastMCP) against the MongoDB configured in
+MONGODB_URI. Use a local mongod loaded with scripts/generate_corpus.py output.
+Reports throughput and p50/p95/p99 latency per scenario as JSON, tagged with
+the current git commit, so runs can be compared across commits.
+
+Usage:
+    python scripts/generate_corpus.py --count 100000 --end-date 2025-10-15 -o corpus.jsonl
+    python scripts/ingest_news.py corpus.jsonl
+    python scripts/bench_tools.py --requests 500 --concurrency 16 -o bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+
+from generate_corpus import CATEGORIES, TOPIC_WORDS
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_module(name: str, path: str):
+    """Import a server entry point by path under a unique module name"""
+    # Let the entry point import its sibling modules, as when run directly
+    sys.path.insert(0, os.path.dirname(os.path.join(ROOT, path)))
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def tool_function(tool):
+    """FastMCP may wrap decorated tools; return the underlying coroutine function"""
+    return getattr(tool, "fn", tool)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def build_scenarios(stdio, http, rng: random.Random) -> dict:
+    """Map scenario name -> zero-argument coroutine factory with randomized arguments"""
+    categories = [name for name, _ in CATEGORIES]
+    words = [word for words in TOPIC_WORDS.values() for word in words]
+
+    def stdio_failed(result) -> bool:
+        return result[0].text.startswith("Error")
+
+    def http_failed(result) -> bool:
+        return "error" in result.get("data", {})
+
+    fetch_news = tool_function(http.fetch_news)
+    fetch_news_multi = tool_function(http.fetch_news_multi)
+    search_news = tool_function(http.search_news)
+    semantic_search_news = tool_function(http.semantic_search_news)
+    get_news_categories = tool_function(http.get_news_categories)
+    news_trends = tool_function(http.news_trends)
+
+    return {
+        "stdio.fetch_news": (lambda: stdio.fetch_news_handler({
+            "category": rng.choice(categories), "days_back": rng.choice((1, 7, 30)), "limit": 10
+        }), stdio_failed),
+        "stdio.fetch_news.relevance": (lambda: stdio.fetch_news_handler({
+            "category": rng.choice(categories), "sort_by": "relevance", "limit": 10
+        }), stdio_failed),
+        "stdio.fetch_news_multi": (lambda: stdio.fetch_news_multi_handler({
+            "categories": rng.sample(categories, 6), "per_category": 5
+        }), stdio_failed),
+        "stdio.search_news": (lambda: stdio.search_news_handler({
+            "query": rng.choice(words), "limit": 10
+        }), stdio_failed),
+        "stdio.search_news.recent": (lambda: stdio.search_news_handler({
+            "query": rng.choice(words), "days_back": 7, "limit": 10
+        }), stdio_failed),
+        "stdio.semantic_search_news": (lambda: stdio.semantic_search_news_handler({
+            "query": " ".join(rng.sample(words, 3)), "limit": 10
+        }), stdio_failed),
+        "stdio.get_news_categories": (lambda: stdio.get_categories_handler(), stdio_failed),
+        "stdio.news_trends": (lambda: stdio.news_trends_handler({
+            "dimension": rng.choice(("category", "source")), "interval": rng.choice(("hour", "day")),
+            "days_back": 7
+        }), stdio_failed),
+        "http.fetch_news": (lambda: fetch_news(
+            category=rng.choice(categories), days_back=rng.choice((1, 7, 30)), limit=10
+        ), http_failed),
+        "http.fetch_news_multi": (lambda: fetch_news_multi(
+            categories=rng.sample(categories, 6), per_category=5
+        ), http_failed),
+        "http.search_news": (lambda: search_news(query=rng.choice(words), limit=10), http_failed),
+        "http.search_news.recent": (lambda: search_news(query=rng.choice(words), days_back=7, limit=10), http_failed),
+        "http.semantic_search_news": (lambda: semantic_search_news(
+            query=" ".join(rng.sample(words, 3)), limit=10
+        ), http_failed),
+        "http.get_news_categories": (lambda: get_news_categories(), http_failed),
+        "http.news_trends": (lambda: news_trends(
+            dimension=rng.choice(("category", "source")), interval=rng.choice(("hour", "day")), days_back=7
+        ), http_failed),
+    }
+
+
+async def run_scenario(factory, failed, requests: int, concurrency: int) -> dict:
+    """Issue requests calls with at most concurrency in flight"""
+    latencies = []
+    errors = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one_call():
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                if failed(await factory()):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_per_s": requests / elapsed if elapsed else 0.0,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    stdio = load_module("stdio_server", "src/server.py")
+    http = load_module("http_server", "server/main.py")
+    if not stdio.connect_to_mongodb():
+        raise SystemExit("stdio server could not connect to MongoDB")
+    # Servers open the semantic index at startup; semantic scenarios report
+    # errors when it has not been built (scripts/build_vector_index.py)
+    stdio.load_semantic_index()
+    http.semantic_index = stdio.semantic_index
+    # With HOT_STORE_DAYS set, both servers answer recent queries from one
+    # preloaded hot store; it is not kept current during the run
+    if stdio.HOT_STORE_DAYS > 0:
+        stdio.load_hot_store()
+        http.hot_store = stdio.hot_store
+
+    scenarios = build_scenarios(stdio, http, random.Random(args.seed))
+    selected = [name for name in scenarios if not args.only or any(part in name for part in args.only)]
+
+    results = {}
+    for name in selected:
+        factory, failed = scenarios[name]
+        # Warm up connections and server caches before measuring
+        await run_scenario(factory, failed, min(args.warmup, args.requests), args.concurrency)
+        results[name] = await run_scenario(factory, failed, args.requests, args.concurrency)
+        print(f"{name:<30} {results[name]['throughput_per_s']:>10,.1f}/s  "
+              f"p50 {results[name]['p50_ms']:.2f}ms  p99 {results[name]['p99_ms']:.2f}ms",
+              file=sys.stderr)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "database": os.getenv("MONGODB_DATABASE", "news_db"),
+            "collection": os.getenv("MONGODB_COLLECTION", "news"),
+            "result_cache": args.with_cache,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the news tools of both servers")
+    parser.add_argument("--requests", type=int, default=200, help="Measured calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured calls per scenario")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for randomized tool arguments")
+    parser.add_argument("--only", nargs="*", help="Run scenarios whose name contains any of these")
+    parser.add_argument("--with-cache", action="store_true",
+                        help="Keep the servers' result caches on (off by default to measure MongoDB)")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        os.environ["QUERY_CACHE_TTL_SECONDS"] = "0"
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
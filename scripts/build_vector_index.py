@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Build or update the semantic search index
+
+A full build fits the embedding model on a random sample of articles. It then
+embeds every article, stores each vector on its article (field "embedding")
+and writes the IVF index that semantic_search_news serves from.
+
+--update embeds only the articles added since the index was built and
+appends them to it, keeping the model and clustering. The servers also pick
+new articles up on their own while running; --update makes that permanent.
+Rebuild fully once a large share of the collection is new.
+
+Usage:
+    python scripts/build_vector_index.py [--sample 50000] [--dim 256] [--nlist 0]
+    python scripts/build_vector_index.py --update
+    python scripts/build_vector_index.py --bench 500
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from semantic_index import (  # noqa: E402
+    DEFAULT_DIM, DEFAULT_HASH_DIM, ID_BYTES, EmbeddingModel,
+    append_to_index, article_text, article_vectors, open_index, write_index
+)
+from generate_corpus import TOPIC_WORDS  # noqa: E402
+
+load_dotenv()
+
+
+def sample_texts(collection, size: int):
+    """Texts of a random sample of articles, for fitting the model"""
+    pipeline = [{"$sample": {"size": size}}, {"$project": {"title": 1, "content": 1}}]
+    for article in collection.aggregate(pipeline, allowDiskUse=True):
+        yield article_text(article)
+
+
+def embed_articles(collection, model: EmbeddingModel, query: dict, path: str,
+                   store: bool, batch_size: int) -> int:
+    """
+    Embed matching articles in _id order into path + ".vectors" / ".ids" (raw
+    rows), optionally saving each vector on its article. Returns the row count.
+    """
+    count = 0
+    started = time.monotonic()
+    with open(path + ".vectors", "wb") as vectors_file, open(path + ".ids", "wb") as ids_file:
+        cursor = collection.find(query, {"title": 1, "content": 1}).sort("_id", 1).batch_size(batch_size)
+        batch = []
+        for article in cursor:
+            batch.append(article)
+            if len(batch) < batch_size:
+                continue
+            count += write_batch(collection, model, batch, vectors_file, ids_file, store)
+            batch = []
+            if count % (batch_size * 50) == 0:
+                print(f"  {count:,} articles embedded, {count / (time.monotonic() - started):,.0f}/s")
+        if batch:
+            count += write_batch(collection, model, batch, vectors_file, ids_file, store)
+    return count
+
+
+def write_batch(collection, model: EmbeddingModel, batch: list, vectors_file, ids_file, store: bool) -> int:
+    ids, vectors = article_vectors(model, batch)
+    vectors_file.write(vectors.astype("<f4").tobytes())
+    ids_file.write(ids.tobytes())
+    if store:
+        collection.bulk_write([
+            UpdateOne({"_id": article["_id"]}, {"$set": {"embedding": vector.astype("<f4").tobytes()}})
+            for article, vector in zip(batch, vectors)
+        ], ordered=False)
+    return len(batch)
+
+
+def read_rows(path: str, count: int, dim: int) -> tuple:
+    """Memory-map the raw rows written by embed_articles"""
+    if not count:
+        return np.zeros((0, ID_BYTES), dtype=np.uint8), np.zeros((0, dim), dtype=np.float32)
+    ids = np.memmap(path + ".ids", dtype=np.uint8, mode="r", shape=(count, ID_BYTES))
+    vectors = np.memmap(path + ".vectors", dtype="<f4", mode="r", shape=(count, dim))
+    return ids, vectors
+
+
+def remove_rows(path: str) -> None:
+    for suffix in (".vectors", ".ids"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def build(collection, args) -> None:
+    total = collection.estimated_document_count()
+    if not total:
+        raise SystemExit("The news collection is empty; ingest articles first")
+    sample_size = min(args.sample, total)
+    print(f"Fitting a {args.dim}-dimension model on {sample_size:,} of ~{total:,} articles...")
+    started = time.monotonic()
+    model = EmbeddingModel.fit(sample_texts(collection, sample_size), args.hash_dim, args.dim)
+    print(f"  fitted in {time.monotonic() - started:.1f}s")
+
+    os.makedirs(args.index_dir, exist_ok=True)
+    rows_path = os.path.join(args.index_dir, "build")
+    print("Embedding articles...")
+    count = embed_articles(collection, model, {"_id": {"$type": "objectId"}}, rows_path,
+                           not args.no_store, args.batch_size)
+    ids, vectors = read_rows(rows_path, count, model.dim)
+
+    nlist = args.nlist or max(1, int(2 * np.sqrt(count)))
+    print(f"Clustering {count:,} vectors into {nlist:,} lists...")
+    write_index(args.index_dir, model, ids, vectors, nlist)
+    del ids, vectors
+    remove_rows(rows_path)
+    print(f"Index written to {args.index_dir}")
+
+
+def update(collection, args) -> None:
+    index = open_index(args.index_dir)
+    if index is None:
+        raise SystemExit(f"No index in {args.index_dir}; run a full build first")
+
+    query = {"_id": {"$gt": ObjectId(index.last_id)}} if index.last_id else {"_id": {"$type": "objectId"}}
+    rows_path = os.path.join(args.index_dir, "update")
+    count = embed_articles(collection, index.model, query, rows_path, not args.no_store, args.batch_size)
+    ids, vectors = read_rows(rows_path, count, index.model.dim)
+    meta = append_to_index(args.index_dir, np.asarray(ids), np.asarray(vectors))
+    del ids, vectors
+    remove_rows(rows_path)
+
+    unclustered = meta["count"] - meta["main_count"]
+    print(f"Appended {count:,} articles; {unclustered:,} of {meta['count']:,} are not clustered yet")
+    if unclustered > meta["main_count"] * 0.2:
+        print("Consider a full rebuild to recluster the index")
+
+
+def bench(args) -> None:
+    """Latency of embedding a query and searching the index"""
+    index = open_index(args.index_dir)
+    if index is None:
+        raise SystemExit(f"No index in {args.index_dir}")
+
+    rng = random.Random(7)
+    words = [word for words in TOPIC_WORDS.values() for word in words]
+    latencies = []
+    for _ in range(args.bench):
+        query = " ".join(rng.sample(words, 3))
+        started = time.perf_counter()
+        index.search(index.model.embed(query), args.k, args.nprobe)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    pct = lambda p: 1000 * latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]  # noqa: E731
+    print(f"{len(index):,} vectors, {len(index.centroids):,} lists, nprobe {args.nprobe}, k {args.k}")
+    print(f"p50 {pct(50):.2f}ms  p95 {pct(95):.2f}ms  p99 {pct(99):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the semantic search index")
+    parser.add_argument("--update", action="store_true", help="Append articles added since the last build")
+    parser.add_argument("--bench", type=int, default=0, metavar="QUERIES",
+                        help="Only measure search latency over this many queries")
+    parser.add_argument("--index-dir", default=os.getenv("SEMANTIC_INDEX_DIR", ".semantic"))
+    parser.add_argument("--sample", type=int, default=50_000, help="Articles used to fit the model")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Vector dimensions")
+    parser.add_argument("--hash-dim", type=int, default=DEFAULT_HASH_DIM, help="Hashed term buckets")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (default: 2 * sqrt(articles))")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--no-store", action="store_true", help="Do not save vectors on the articles")
+    parser.add_argument("--k", type=int, default=10, help="Results per query for --bench")
+    parser.add_argument("--nprobe", type=int, default=int(os.getenv("SEMANTIC_NPROBE", "32")),
+                        help="Lists searched per query for --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+
+    print(f"Connecting to MongoDB at {mongo_uri}...")
+    client = MongoClient(mongo_uri)
+    collection = client[db_name][collection_name]
+    try:
+        if args.update:
+            update(collection, args)
+        else:
+            build(collection, args)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Materialized per-category statistics for get_news_categories
+
+The category_stats collection holds one small document per category_key:
+
+    {_id: category_key, name: category, count: int, latest_published_date: Date}
+
+Ingestion keeps it current with update_category_stats(). Running this script
+rebuilds it from scratch with a single $group ... $out, e.g. after bulk
+deletes or to repair drift.
+"""
+
+import os
+from collections import defaultdict
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def update_category_stats(stats_collection, articles) -> None:
+    """Fold newly inserted articles into category_stats with atomic upserts"""
+    counts = defaultdict(int)
+    latest = {}
+    names = {}
+    for article in articles:
+        key = article.get("category_key")
+        if key is None:
+            continue
+        counts[key] += 1
+        names.setdefault(key, article.get("category"))
+        published_date = article.get("published_date")
+        if published_date is not None and (key not in latest or published_date > latest[key]):
+            latest[key] = published_date
+
+    operations = []
+    for key, count in counts.items():
+        update = {"$inc": {"count": count}, "$setOnInsert": {"name": names[key]}}
+        if key in latest:
+            update["$max"] = {"latest_published_date": latest[key]}
+        operations.append(UpdateOne({"_id": key}, update, upsert=True))
+
+    if operations:
+        stats_collection.bulk_write(operations, ordered=False)
+
+
+def rebuild_category_stats(collection, stats_collection_name: str) -> int:
+    """Recompute category_stats from the news collection; returns the category count"""
+    pipeline = [
+        {"$match": {"category_key": {"$type": "string"}}},
+        {"$group": {
+            "_id": "$category_key",
+            "name": {"$first": "$category"},
+            "count": {"$sum": 1},
+            "latest_published_date": {"$max": "$published_date"}
+        }},
+        # $out swaps the collection in atomically, so readers never see a partial rebuild
+        {"$out": stats_collection_name}
+    ]
+    collection.aggregate(pipeline)
+    return collection.database[stats_collection_name].count_documents({})
+
+
+def main():
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+    stats_collection_name = os.getenv("MONGODB_CATEGORY_STATS_COLLECTION", "category_stats")
+
+    print(f"Connecting to MongoDB at {mongo_uri}...")
+    client = MongoClient(mongo_uri)
+    collection = client[db_name][collection_name]
+
+    print(f"Rebuilding {stats_collection_name} from {collection_name}...")
+    total = rebuild_category_stats(collection, stats_collection_name)
+    print(f"Rebuilt statistics for {total} categories")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic news corpus generator
+
+Writes JSONL articles (the input format of scripts/ingest_news.py) with
+realistic shape:
+
+- category skew: a few categories carry most of the traffic (Zipf-like)
+- date spread: exponential, so recent days are dense and the tail is thin
+- content lengths: log-normal, from short briefs to long-form pieces
+- engagement: heavy-tailed (Pareto)
+
+The same --seed, --count and --end-date always produce the same file.
+
+Usage:
+    python scripts/generate_corpus.py --count 1000000 --end-date 2025-10-15 -o corpus.jsonl
+    python scripts/ingest_news.py corpus.jsonl
+"""
+
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# (category, relative weight)
+CATEGORIES = [
+    ("Technology", 24), ("Business", 18), ("Sports", 15), ("Entertainment", 11),
+    ("Health", 8), ("Science", 7), ("Environment", 6), ("Politics", 5),
+    ("World", 3), ("History", 1.5), ("Travel", 1), ("Education", 0.5),
+]
+
+SOURCES = [
+    "Tech News Daily", "Financial Times", "World News Network", "Health Journal",
+    "Sports Daily", "Entertainment Weekly", "Science Today", "Green Energy News",
+    "Archaeology Monthly", "Global Wire", "Morning Ledger", "Evening Standard Post",
+]
+
+TOPIC_WORDS = {
+    "Technology": ["AI", "semiconductor", "chip maker", "cloud", "startup", "quantum", "software", "smartphone", "robotics", "cybersecurity"],
+    "Business": ["markets", "earnings", "merger", "inflation", "interest rates", "stocks", "investors", "retail", "supply chain", "IPO"],
+    "Sports": ["championship", "overtime", "transfer", "coach", "league", "tournament", "record", "injury", "playoffs", "stadium"],
+    "Entertainment": ["streaming", "premiere", "box office", "festival", "album", "series", "award", "director", "celebrity", "tour"],
+    "Health": ["vaccine", "diet", "study", "hospital", "clinical trial", "mental health", "nutrition", "research", "treatment", "fitness"],
+    "Science": ["species", "telescope", "experiment", "physics", "genome", "expedition", "discovery", "laboratory", "climate model", "fossil"],
+    "Environment": ["renewable", "emissions", "climate", "wildfire", "drought", "solar", "conservation", "pollution", "biodiversity", "ocean"],
+    "Politics": ["election", "parliament", "policy", "senate", "campaign", "minister", "legislation", "vote", "coalition", "reform"],
+    "World": ["summit", "treaty", "border", "diplomat", "refugees", "trade talks", "embassy", "sanctions", "ceasefire", "alliance"],
+    "History": ["artifacts", "ancient", "excavation", "manuscript", "dynasty", "archive", "museum", "ruins", "civilization", "heritage"],
+    "Travel": ["airline", "destination", "tourism", "hotel", "visa", "cruise", "itinerary", "airport", "resort", "backpacking"],
+    "Education": ["university", "students", "curriculum", "scholarship", "teachers", "exam", "campus", "literacy", "tuition", "research grant"],
+}
+
+FILLER = [
+    "officials said on", "according to people familiar with", "analysts expect", "the report found",
+    "in a statement", "over the coming months", "for the first time", "amid growing concern about",
+    "a spokesperson confirmed", "the latest figures show", "experts warned that", "following weeks of",
+]
+
+SENTENCES_PER_CATEGORY = 400
+
+
+def build_sentence_pool(rng: random.Random) -> dict:
+    """Pre-generate sentences per category so long articles are cheap to assemble"""
+    pool = {}
+    for category, _ in CATEGORIES:
+        words = TOPIC_WORDS[category]
+        sentences = []
+        for _ in range(SENTENCES_PER_CATEGORY):
+            a, b = rng.sample(words, 2)
+            sentences.append(
+                f"{a.capitalize()} {rng.choice(FILLER)} {b}, {rng.choice(FILLER)} the {rng.choice(words)} sector."
+            )
+        pool[category] = sentences
+    return pool
+
+
+def generate_articles(count: int, seed: int, end_date: datetime, days: int):
+    """Yield count synthetic articles, deterministically for a given seed"""
+    rng = random.Random(seed)
+    pool = build_sentence_pool(rng)
+    names = [name for name, _ in CATEGORIES]
+    weights = [weight for _, weight in CATEGORIES]
+    max_age = days * 86400
+    mean_age = max_age / 6
+
+    for i in range(count):
+        category = rng.choices(names, weights)[0]
+        words = TOPIC_WORDS[category]
+        age = min(int(rng.expovariate(1 / mean_age)), max_age)
+        # Log-normal sentence count: median ~12, long tail up to a few hundred
+        sentences = max(2, min(int(rng.lognormvariate(2.5, 0.8)), 400))
+        body = " ".join(rng.choice(pool[category]) for _ in range(sentences))
+
+        yield {
+            "title": f"{rng.choice(words).capitalize()} {rng.choice(FILLER)} {rng.choice(words)}",
+            "content": body,
+            "category": category,
+            "source": rng.choice(SOURCES),
+            "url": f"https://news.example.com/{category.lower()}/{seed}-{i}",
+            "published_date": (end_date - timedelta(seconds=age)).isoformat(),
+            "engagement": int(rng.paretovariate(1.5)) - 1,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic news corpus")
+    parser.add_argument("--count", type=int, default=10_000, help="Number of articles")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", default=None,
+                        help="Newest publication date (ISO, default: today 00:00 UTC)")
+    parser.add_argument("--days", type=int, default=365, help="Oldest article age in days")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.end_date:
+        end_date = datetime.fromisoformat(args.end_date)
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+    else:
+        end_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for article in generate_articles(args.count, args.seed, end_date, args.days):
+            out.write(json.dumps(article, ensure_ascii=False))
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Bulk news ingestion from JSONL/NDJSON files
+
+Streams one or more files line by line, never loading them whole. Articles are
+upserted by url in unordered bulk_write batches, with several batches in
+flight at once. Progress and throughput are printed as it goes.
+
+After each contiguous run of finished batches, a checkpoint file records the
+byte offset reached. A crashed or interrupted run then resumes from there
+instead of starting over. Re-ingesting a line is harmless because writes are
+upserts.
+
+Usage:
+    python scripts/ingest_news.py feed-2025-10-15.jsonl [more.jsonl ...]
+        [--batch-size 1000] [--concurrency 4] [--checkpoint-dir .ingest]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from dateutil import parser as date_parser
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+from refresh_relevance import compute_relevance_score, load_source_weights
+from migrate_category_keys import normalize_category
+from category_stats import update_category_stats
+from news_rollups import ensure_rollup_indexes, rollup_collections, update_rollups
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from semantic_index import EmbeddingModel, article_text  # noqa: E402
+
+load_dotenv()
+
+REQUIRED_FIELDS = ("title", "content", "category", "source", "published_date", "url")
+# Required fields that must be strings (published_date may also be a date)
+TEXT_FIELDS = ("title", "content", "category", "source", "url")
+# Bytes before a checkpoint offset that must be unchanged for a resume
+FINGERPRINT_BYTES = 4096
+
+
+def ensure_ingest_indexes(collection):
+    """Unique url index backing the upsert key"""
+    collection.create_index(
+        "url",
+        unique=True,
+        partialFilterExpression={"url": {"$type": "string"}}
+    )
+
+
+def prepare_article(raw: dict, source_weights: dict, model: Optional[EmbeddingModel] = None) -> dict:
+    """Validate a raw feed record and derive the stored fields"""
+    if not isinstance(raw, dict):
+        raise ValueError("not a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if not raw.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    not_text = [field for field in TEXT_FIELDS if not isinstance(raw[field], str)]
+    if not_text:
+        raise ValueError(f"{', '.join(not_text)} must be a string")
+
+    article = dict(raw)
+    article.pop("_id", None)
+    if not isinstance(article["published_date"], datetime):
+        article["published_date"] = date_parser.isoparse(str(article["published_date"]))
+    article["category_key"] = normalize_category(article["category"])
+    article["relevance_score"] = compute_relevance_score(article, source_weights)
+    if model is not None:
+        article["embedding"] = model.embed(article_text(article)).astype("<f4").tobytes()
+    return article
+
+
+def write_batch(collection, stats_collection, rollups: Optional[dict], articles: list) -> tuple:
+    """Upsert one batch by url; returns (inserted, updated)"""
+    operations = [
+        UpdateOne({"url": article["url"]}, {"$set": article}, upsert=True)
+        for article in articles
+    ]
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Unordered: the rest of the batch was still written, so count its inserts before failing
+        record_inserted(stats_collection, rollups,
+                        [articles[upsert["index"]] for upsert in e.details.get("upserted", [])])
+        raise
+
+    record_inserted(stats_collection, rollups, [articles[idx] for idx in result.upserted_ids])
+    return result.upserted_count, result.modified_count
+
+
+def record_inserted(stats_collection, rollups: Optional[dict], inserted: list):
+    """Only newly inserted articles change category counts and trend rollups"""
+    update_category_stats(stats_collection, inserted)
+    if rollups is not None:
+        update_rollups(rollups, inserted)
+
+
+def read_batches(path: str, start_offset: int, batch_size: int, source_weights: dict,
+                 model: Optional[EmbeddingModel], errors: list):
+    """
+    Yield (articles, end_offset) batches from a JSONL file starting at a byte offset.
+
+    Reads in binary mode so offsets are exact; invalid lines are reported in errors.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        batch = []
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                batch.append(prepare_article(json.loads(line), source_weights, model))
+            except (ValueError, TypeError, OverflowError) as e:
+                errors.append((offset, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                yield batch, offset
+                batch = []
+        if batch:
+            yield batch, offset
+
+
+def fingerprint(path: str, offset: int) -> str:
+    """Digest of the bytes just before offset"""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+class Checkpoint:
+    """
+    Byte offset of the last contiguous run of written batches for one input file.
+
+    Checkpoints are keyed by the file's resolved path, so inputs with the same
+    name in different directories never share an offset. A run resumes only if
+    the file was appended to since: same inode, no smaller than when the offset
+    was saved, and the bytes just before the offset unchanged. A file replaced
+    or rewritten in place, even by a larger one, starts over.
+    """
+
+    def __init__(self, checkpoint_dir: str, path: str):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path_digest = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()[:16]
+        self.path = os.path.join(checkpoint_dir, f"{os.path.basename(path)}-{path_digest}.checkpoint")
+        self.input_path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.inode = stat.st_ino
+        self.offset = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            offset = saved.get("offset", 0)
+            if (saved.get("inode") == self.inode
+                    and saved.get("size", self.size + 1) <= self.size
+                    and offset <= self.size
+                    and saved.get("fingerprint") == fingerprint(path, offset)):
+                self.offset = offset
+
+    def save(self, offset: int):
+        self.offset = offset
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "offset": offset,
+                "size": self.size,
+                "inode": self.inode,
+                "fingerprint": fingerprint(self.input_path, offset),
+                "saved_at": time.time(),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+def ingest_file(path: str, collection, stats_collection, rollups: Optional[dict], args,
+                source_weights: dict, model: Optional[EmbeddingModel], totals: dict):
+    """Ingest one file with bounded parallel batches and checkpointing"""
+    checkpoint = Checkpoint(args.checkpoint_dir, path)
+    if checkpoint.offset:
+        print(f"Resuming {path} at byte {checkpoint.offset:,} of {checkpoint.size:,}")
+    else:
+        print(f"Ingesting {path} ({checkpoint.size:,} bytes)")
+
+    errors = []
+    in_flight = {}
+    finished = {}
+    next_to_commit = 0
+    last_report = time.monotonic()
+
+    def collect(done):
+        nonlocal next_to_commit
+        for future in done:
+            seq, end_offset = in_flight.pop(future)
+            inserted, updated = future.result()
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+            finished[seq] = end_offset
+        # Batches finish out of order; only advance past a contiguous prefix
+        committed = None
+        while next_to_commit in finished:
+            committed = finished.pop(next_to_commit)
+            next_to_commit += 1
+        if committed is not None:
+            checkpoint.save(committed)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        batches = read_batches(path, checkpoint.offset, args.batch_size, source_weights, model, errors)
+        for seq, (articles, end_offset) in enumerate(batches):
+            # Bound memory: never read further ahead than the writers can absorb
+            while len(in_flight) >= args.concurrency * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            future = executor.submit(write_batch, collection, stats_collection, rollups, articles)
+            in_flight[future] = (seq, end_offset)
+            totals["articles"] += len(articles)
+
+            if time.monotonic() - last_report >= args.progress_every:
+                report_progress(totals)
+                last_report = time.monotonic()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    for offset, message in errors[:10]:
+        print(f"  skipped line ending at byte {offset:,}: {message}")
+    if len(errors) > 10:
+        print(f"  ... and {len(errors) - 10} more invalid lines")
+    totals["invalid"] += len(errors)
+
+
+def load_embedding_model(index_dir: str) -> Optional[EmbeddingModel]:
+    """The semantic index's embedding model, if one has been built"""
+    model_path = os.path.join(index_dir, "model.npz")
+    if not os.path.exists(model_path):
+        return None
+    print(f"Embedding articles with {model_path}")
+    return EmbeddingModel.load(model_path)
+
+
+def report_progress(totals: dict):
+    elapsed = time.monotonic() - totals["started"]
+    rate = totals["articles"] / elapsed if elapsed else 0
+    print(
+        f"  {totals['articles']:,} articles read, {totals['inserted']:,} inserted, "
+        f"{totals['updated']:,} updated, {rate:,.0f} articles/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest news articles from JSONL files")
+    parser.add_argument("files", nargs="+", help="JSONL/NDJSON files, one article per line")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Articles per bulk_write")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches written in parallel")
+    parser.add_argument("--checkpoint-dir", default=".ingest", help="Where resume offsets are stored")
+    parser.add_argument("--progress-every", type=float, default=5, help="Seconds between progress lines")
+    parser.add_argument("--source-weights", default=os.getenv("SOURCE_WEIGHTS_FILE"),
+                        help="JSON file mapping source name to weight (for relevance scores)")
+    parser.add_argument("--index-dir", default=os.getenv("SEMANTIC_INDEX_DIR", ".semantic"),
+                        help="Semantic index whose model embeds new articles, if built")
+    parser.add_argument("--skip-rollups", action="store_true",
+                        help="Do not count articles into the news_trends rollups "
+                             "(when scripts/news_rollups.py --watch does it)")
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+    stats_collection_name = os.getenv("MONGODB_CATEGORY_STATS_COLLECTION", "category_stats")
+
+    print(f"Connecting to MongoDB at {mongo_uri}...")
+    client = MongoClient(mongo_uri, maxPoolSize=max(args.concurrency, 1) + 1)
+    db = client[db_name]
+    collection = db[collection_name]
+    ensure_ingest_indexes(collection)
+    rollups = None if args.skip_rollups else rollup_collections(db)
+    if rollups is not None:
+        ensure_rollup_indexes(rollups)
+    source_weights = load_source_weights(args.source_weights)
+    model = load_embedding_model(args.index_dir)
+
+    totals = {"articles": 0, "inserted": 0, "updated": 0, "invalid": 0, "started": time.monotonic()}
+    try:
+        for path in args.files:
+            ingest_file(path, collection, db[stats_collection_name], rollups, args, source_weights, model, totals)
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume from the last checkpoint")
+        sys.exit(130)
+    finally:
+        client.close()
+
+    report_progress(totals)
+    print(f"Done: {totals['invalid']:,} invalid lines skipped")
+
+
+if __name__ == "__main__":
+    main()
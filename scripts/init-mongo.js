@@ -12,8 +12,20 @@ print('Creating indexes...');
 
 // Create indexes for better query performance
 db.news.createIndex({ "category": 1 });
-db.news.createIndex({ "published_date": -1 });
-db.news.createIndex({ "title": "text", "content": "text" });
+db.news.createIndex({ "published_date": -1, "_id": -1 });
+// Weighted text index for search_news: title matches rank above content matches
+db.news.createIndex(
+  { "title": "text", "content": "text" },
+  { name: "news_text", weights: { title: 10, content: 2 }, default_language: "english" }
+);
+
+// Category filters match the normalized category_key (see scripts/migrate_category_keys.py)
+db.news.createIndex({ "category_key": 1, "published_date": -1, "_id": -1 });
+db.news.createIndex({ "category_key": 1, "relevance_score": -1, "published_date": -1, "_id": -1 });
+
+// Relevance ordering for fetch_news(sort_by="relevance"); see scripts/refresh_relevance.py
+db.news.createIndex({ "relevance_score": -1, "published_date": -1, "_id": -1 });
+db.news.createIndex({ "relevance_dirty": 1 }, { partialFilterExpression: { relevance_dirty: true } });
 
 print('Inserting sample news data...');
 
@@ -101,5 +113,26 @@ db.news.insertMany([
   }
 ]);
 
+// Derive the normalized category key used by category filters
+db.news.updateMany(
+  { category_key: { $exists: false } },
+  [{ $set: { category_key: { $toLower: { $trim: { input: "$category" } } } } }]
+);
+
+// Materialize per-category counts read by get_news_categories (see scripts/category_stats.py)
+db.news.aggregate([
+  { $match: { category_key: { $type: "string" } } },
+  { $group: {
+      _id: "$category_key",
+      name: { $first: "$category" },
+      count: { $sum: 1 },
+      latest_published_date: { $max: "$published_date" }
+  } },
+  { $out: "category_stats" }
+]);
+
+// Flag the sample articles so the relevance job scores them on its next run
+db.news.updateMany({}, { $set: { relevance_dirty: true } });
+
 print('Database initialization complete!');
 print('Total documents inserted: ' + db.news.count());
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+One-shot migration: add normalized category_key to existing news articles
+
+Category filters in fetch_news match category_key exactly, so they can use the
+(category_key, published_date) index instead of a case-insensitive regex scan.
+This script backfills the key on articles that lack it and creates the
+indexes. It is safe to re-run.
+"""
+
+import os
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def normalize_category(category: str) -> str:
+    """Normalize a category name to the indexed category_key form"""
+    return category.strip().lower()
+
+
+def ensure_category_indexes(collection):
+    """Create the compound indexes used by category filters"""
+    # Equality on category_key, then the sort field, so category + days_back
+    # queries are bounded index range scans in the requested order; the _id
+    # suffix matches the keyset pagination tie-breaker
+    collection.create_index([("category_key", 1), ("published_date", -1), ("_id", -1)])
+    collection.create_index([("category_key", 1), ("relevance_score", -1), ("published_date", -1), ("_id", -1)])
+
+
+def migrate_category_keys(collection) -> int:
+    """Backfill category_key server-side; returns the number of updated articles"""
+    # Pipeline update (MongoDB 4.2+) so documents never leave the server
+    result = collection.update_many(
+        {"category_key": {"$exists": False}, "category": {"$type": "string"}},
+        [{"$set": {"category_key": {"$toLower": {"$trim": {"input": "$category"}}}}}]
+    )
+    return result.modified_count
+
+
+def main():
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+
+    print(f"Connecting to MongoDB at {mongo_uri}...")
+    client = MongoClient(mongo_uri)
+    collection = client[db_name][collection_name]
+
+    print("Backfilling category_key...")
+    updated = migrate_category_keys(collection)
+    print(f"Updated {updated} articles")
+
+    print("Creating category indexes...")
+    ensure_category_indexes(collection)
+    print("Migration complete!")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
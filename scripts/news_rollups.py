@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Hourly and daily article counts per category and per source, for news_trends
+
+Each rollup collection holds one small document per dimension value and bucket:
+
+    {dim: "category" | "source", key: category_key | source, t: bucket start (UTC),
+     name: display name, count: int}
+
+news_rollups_hourly has hour buckets and news_rollups_daily day buckets, so
+news_trends reads a few of these documents instead of scanning articles.
+
+Ingestion keeps both current with update_rollups(). Running this script
+rebuilds them from scratch with $group ... $out (MongoDB 5.0+), e.g. after
+bulk deletes or to repair drift. With --watch it instead follows a change
+stream (replica set) and counts every inserted article; use that when other
+writers insert articles, and ingest with --skip-rollups so nothing is counted twice.
+
+Usage:
+    python scripts/news_rollups.py
+    python scripts/news_rollups.py --watch
+"""
+
+import os
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rollup unit -> collection name
+ROLLUP_COLLECTIONS = {
+    "hour": os.getenv("MONGODB_ROLLUP_HOURLY_COLLECTION", "news_rollups_hourly"),
+    "day": os.getenv("MONGODB_ROLLUP_DAILY_COLLECTION", "news_rollups_daily"),
+}
+
+
+def rollup_collections(db) -> dict:
+    return {unit: db[name] for unit, name in ROLLUP_COLLECTIONS.items()}
+
+
+def ensure_rollup_indexes(collections: dict) -> None:
+    """Unique bucket key backing the upserts, and the index news_trends reads by"""
+    for collection in collections.values():
+        collection.create_index([("dim", ASCENDING), ("key", ASCENDING), ("t", ASCENDING)], unique=True)
+        collection.create_index([("dim", ASCENDING), ("t", ASCENDING)])
+
+
+def bucket_start(value: datetime, unit: str) -> datetime:
+    """Start of the UTC hour or day containing value, as a naive UTC datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    if unit == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def update_rollups(collections: dict, articles) -> None:
+    """Fold newly inserted articles into the rollups with atomic upserts"""
+    counts = {unit: defaultdict(int) for unit in collections}
+    names = {}
+    for article in articles:
+        published_date = article.get("published_date")
+        if not isinstance(published_date, datetime):
+            continue
+        for dim, key, name in (
+            ("category", article.get("category_key"), article.get("category")),
+            ("source", article.get("source"), article.get("source")),
+        ):
+            if key is None:
+                continue
+            names.setdefault((dim, key), name)
+            for unit in collections:
+                counts[unit][(dim, key, bucket_start(published_date, unit))] += 1
+
+    for unit, collection in collections.items():
+        operations = [
+            UpdateOne(
+                {"dim": dim, "key": key, "t": t},
+                {"$inc": {"count": count}, "$setOnInsert": {"name": names[(dim, key)]}},
+                upsert=True
+            )
+            for (dim, key, t), count in counts[unit].items()
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+
+def rebuild_rollups(collection, collections: dict) -> dict:
+    """Recompute every rollup from the news collection; returns the bucket count per unit"""
+    totals = {}
+    for unit, rollup_collection in collections.items():
+        pipeline = [
+            {"$match": {"published_date": {"$type": "date"}}},
+            {"$project": {
+                "t": {"$dateTrunc": {"date": "$published_date", "unit": unit}},
+                "dims": [
+                    {"dim": "category", "key": "$category_key", "name": "$category"},
+                    {"dim": "source", "key": "$source", "name": "$source"},
+                ],
+            }},
+            {"$unwind": "$dims"},
+            {"$match": {"dims.key": {"$type": "string"}}},
+            {"$group": {
+                "_id": {"dim": "$dims.dim", "key": "$dims.key", "t": "$t"},
+                "name": {"$first": "$dims.name"},
+                "count": {"$sum": 1},
+            }},
+            {"$project": {"_id": 0, "dim": "$_id.dim", "key": "$_id.key", "t": "$_id.t", "name": 1, "count": 1}},
+            # $out swaps the collection in atomically and keeps its indexes
+            {"$out": rollup_collection.name},
+        ]
+        collection.aggregate(pipeline, allowDiskUse=True)
+        totals[unit] = rollup_collection.count_documents({})
+    ensure_rollup_indexes(collections)
+    return totals
+
+
+def watch(collection, collections: dict) -> None:
+    """Count inserted articles as they happen; runs until interrupted"""
+    pipeline = [{"$match": {"operationType": "insert"}}]
+    with collection.watch(pipeline) as stream:
+        print("Watching for inserted articles (Ctrl+C to stop)...")
+        for change in stream:
+            update_rollups(collections, [change["fullDocument"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or maintain the news_trends rollups")
+    parser.add_argument("--watch", action="store_true",
+                        help="Count inserted articles from a change stream instead of rebuilding")
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+
+    print(f"Connecting to MongoDB at {mongo_uri}...")
+    client = MongoClient(mongo_uri)
+    db = client[db_name]
+    collection = db[collection_name]
+    collections = rollup_collections(db)
+
+    try:
+        if args.watch:
+            ensure_rollup_indexes(collections)
+            watch(collection, collections)
+        else:
+            print(f"Rebuilding {', '.join(ROLLUP_COLLECTIONS.values())} from {collection_name}...")
+            totals = rebuild_rollups(collection, collections)
+            print(", ".join(f"{count:,} {unit} buckets" for unit, count in totals.items()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Background job that keeps the precomputed relevance_score of news articles current
+
+relevance = recency decay x source weight x engagement
+
+The score is stored in log space relative to a fixed epoch:
+
+    relevance_score = ln(2) * hours_since_epoch / half_life
+                      + ln(source_weight) + ln(1 + engagement)
+
+Every article decays at the same rate, so ordering by this value equals
+ordering by the decayed score at any moment. Scores therefore never go stale
+with time. Only articles whose engagement or source weight changed need
+rescoring. Writers flag those with `relevance_dirty: true` and this job picks
+them up in batches.
+"""
+
+import os
+import json
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Hours for an article's relevance to halve as it ages
+RELEVANCE_HALF_LIFE_HOURS = float(os.getenv("RELEVANCE_HALF_LIFE_HOURS", "24"))
+
+# Weight used for sources missing from the weights file
+DEFAULT_SOURCE_WEIGHT = 1.0
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def load_source_weights(path: str = None) -> dict:
+    """Load {source name: weight} from a JSON file, if one is given"""
+    if not path:
+        return {}
+    with open(path) as f:
+        return {source: float(weight) for source, weight in json.load(f).items()}
+
+
+def compute_relevance_score(article: dict, source_weights: dict = None) -> float:
+    """Compute the log-space relevance score for a single article"""
+    published_date = article.get("published_date") or EPOCH
+    if published_date.tzinfo is not None:
+        published_date = published_date.astimezone(timezone.utc).replace(tzinfo=None)
+    hours = (published_date - EPOCH).total_seconds() / 3600
+
+    weight = (source_weights or {}).get(article.get("source"), DEFAULT_SOURCE_WEIGHT)
+    engagement = max(float(article.get("engagement") or 0), 0.0)
+
+    recency = math.log(2) * hours / RELEVANCE_HALF_LIFE_HOURS
+    return recency + math.log(max(weight, 1e-6)) + math.log1p(engagement)
+
+
+def refresh_scores(collection, source_weights: dict = None, full: bool = False,
+                   batch_size: int = 1000) -> int:
+    """
+    Rescore flagged articles (or all articles with full=True).
+
+    Returns the number of articles updated.
+    """
+    query = {} if full else {"relevance_dirty": True}
+    projection = {"published_date": 1, "source": 1, "engagement": 1}
+    updated = 0
+    batch = []
+
+    for article in collection.find(query, projection, batch_size=batch_size):
+        score = compute_relevance_score(article, source_weights)
+        batch.append(UpdateOne(
+            {"_id": article["_id"]},
+            {"$set": {"relevance_score": score}, "$unset": {"relevance_dirty": ""}}
+        ))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+
+    return updated
+
+
+def ensure_relevance_indexes(collection):
+    """Create the indexes used by relevance ordering and this job"""
+    # Score first so "relevance" queries walk the index in order and stop at limit;
+    # published_date lets the days_back filter be checked without fetching documents,
+    # and _id makes the order unique for keyset pagination
+    collection.create_index([("relevance_score", -1), ("published_date", -1), ("_id", -1)])
+    collection.create_index(
+        "relevance_dirty",
+        partialFilterExpression={"relevance_dirty": True}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh precomputed news relevance scores")
+    parser.add_argument("--full", action="store_true",
+                        help="Rescore every article (e.g. after changing source weights)")
+    parser.add_argument("--source-weights", default=os.getenv("SOURCE_WEIGHTS_FILE"),
+                        help="JSON file mapping source name to weight")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Keep running and refresh every N seconds")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+    db_name = os.getenv("MONGODB_DATABASE", "news_db")
+    collection_name = os.getenv("MONGODB_COLLECTION", "news")
+
+    client = MongoClient(mongo_uri)
+    collection = client[db_name][collection_name]
+    ensure_relevance_indexes(collection)
+    source_weights = load_source_weights(args.source_weights)
+
+    full = args.full
+    while True:
+        started = time.monotonic()
+        updated = refresh_scores(collection, source_weights, full=full, batch_size=args.batch_size)
+        print(f"Rescored {updated} articles in {time.monotonic() - started:.2f}s")
+
+        if args.interval <= 0:
+            break
+        full = False
+        time.sleep(args.interval)
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,16 @@ import random
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from refresh_relevance import compute_relevance_score, ensure_relevance_indexes
+from migrate_category_keys import normalize_category, ensure_category_indexes
+from category_stats import rebuild_category_stats
+
 load_dotenv()
 
+# Weighted text index used by search_news: a title hit counts 5x a content hit
+TEXT_INDEX_NAME = "news_text"
+TEXT_INDEX_WEIGHTS = {"title": 10, "content": 2}
+
 # Sample news data
 SAMPLE_NEWS = [
     {
@@ -96,6 +104,23 @@ SAMPLE_NEWS = [
 ]
 
 
+def ensure_text_index(collection):
+    """Create the weighted title/content text index, replacing an older one"""
+    # A collection can only have one text index, so drop any that differs
+    for name, info in collection.index_information().items():
+        is_text = any(direction == "text" for _, direction in info["key"])
+        if is_text and dict(info.get("weights", {})) != TEXT_INDEX_WEIGHTS:
+            print(f"Dropping outdated text index {name}...")
+            collection.drop_index(name)
+    
+    collection.create_index(
+        [("title", "text"), ("content", "text")],
+        name=TEXT_INDEX_NAME,
+        weights=TEXT_INDEX_WEIGHTS,
+        default_language="english"
+    )
+
+
 def setup_database():
     """Set up MongoDB with sample news data"""
     try:
@@ -103,6 +128,7 @@ def setup_database():
         mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
         db_name = os.getenv("MONGODB_DATABASE", "news_db")
         collection_name = os.getenv("MONGODB_COLLECTION", "news")
+        stats_collection_name = os.getenv("MONGODB_CATEGORY_STATS_COLLECTION", "category_stats")
         
         print(f"Connecting to MongoDB at {mongo_uri}...")
         client = MongoClient(mongo_uri)
@@ -119,16 +145,26 @@ def setup_database():
         print(f"Clearing existing data from {collection_name}...")
         collection.delete_many({})
         
-        # Insert sample data
+        # Insert sample data with category keys and precomputed relevance scores
+        for article in SAMPLE_NEWS:
+            article["category_key"] = normalize_category(article["category"])
+            article["relevance_score"] = compute_relevance_score(article)
         print(f"Inserting {len(SAMPLE_NEWS)} sample news articles...")
         result = collection.insert_many(SAMPLE_NEWS)
         print(f"Successfully inserted {len(result.inserted_ids)} articles!")
         
+        # The collection was cleared, so rebuild category statistics from scratch
+        print(f"Rebuilding {stats_collection_name}...")
+        rebuild_category_stats(collection, stats_collection_name)
+        
         # Create indexes for better performance
         print("Creating indexes...")
         collection.create_index("category")
-        collection.create_index("published_date")
-        collection.create_index([("title", "text"), ("content", "text")])
+        # _id breaks ties for keyset pagination
+        collection.create_index([("published_date", -1), ("_id", -1)])
+        ensure_text_index(collection)
+        ensure_relevance_indexes(collection)
+        ensure_category_indexes(collection)
         print("Indexes created successfully!")
         
         # Display summary
@@ -4,48 +4,184 @@ OpenAI Apps SDK MCP Server with MongoDB Integration
 Based on the pizza example from openai-apps-sdk-examples
 """
 
+import asyncio
 import os
+import re
 import json
-from typing import Any, Dict, List
+import time
+import hashlib
+import inspect
+import functools
+import itertools
+import sys
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 from fastmcp import FastMCP
 from pydantic import BaseModel, Field, ConfigDict, ValidationError
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from bson.objectid import ObjectId
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+import pymongo
+from pymongo import AsyncMongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+from starlette.responses import JSONResponse, Response
+from starlette.staticfiles import StaticFiles
 import logging
 
+# Modules shared with the stdio server live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from hot_store import PROJECTION as HOT_STORE_PROJECTION, HotArticle, HotStore  # noqa: E402
+from query_engine import (  # noqa: E402
+    ALL_CATEGORIES_TAG, ARTICLE_CODEC_OPTIONS, CATEGORY_SCAN_PLAN, CATEGORY_STATS_PLAN, DEFAULT_PREVIEW_CHARS,
+    INDEX_MANIFEST, INDEX_NOT_FOUND_CODE, MAX_MULTI_CATEGORIES, MONGODB_MAX_IDLE_TIME_MS, MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE, SEARCH_TAG, NewsRepository, QueryPlan, articles_by_id_plan, client_options,
+    date_cutoff, decode_cursor, dumps, fetch_news_plan, group_by_category, make_query_cache, mongo_uri,
+    multi_category_plan, normalize_category, paginate, plan_checks, plan_stages, rank_by_similarity,
+    run_plan_async, selected_fields, semantic_candidates, substring_search_plan, text_search_plan,
+    tool_time_budget, trend_keys, trends_plan
+)
+from semantic_index import VectorIndex, article_vectors, open_index  # noqa: E402
+from trends import rollup_unit, summarize_trends, trend_window, validate_trend_arguments  # noqa: E402
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
+# MongoDB connection (see query_engine.NewsRepository)
 db_client = None
 db = None
 news_collection = None
+article_collection = None
+category_stats_collection = None
+# Trend rollups by unit ("hour", "day"), maintained by scripts/news_rollups.py
+rollup_collections: Dict[str, Any] = {}
 
 # Asset URLs for widgets (you'll host these)
 ASSET_BASE_URL = os.getenv("ASSET_BASE_URL", "http://localhost:4444")
 
+# Vite build output (web/ builds to ../assets), also served by this app at /assets
+WIDGET_ASSETS_DIR = os.getenv(
+    "WIDGET_ASSETS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets")
+)
+
+# Embed the widget HTML in every tool result (older Apps SDK clients) instead of
+# only referencing the ui:// template, which clients fetch once and cache
+EMBED_WIDGET_HTML = os.getenv("EMBED_WIDGET_HTML", "false").lower() in ("1", "true", "yes")
+
+# Content-hashed build files (e.g. news-list-3f9a1c2b.js) can be cached forever
+HASHED_ASSET = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z]+$")
+
+# Background health check: interval while healthy, backoff bounds while not
+MONGODB_HEALTH_CHECK_INTERVAL = float(os.getenv("MONGODB_HEALTH_CHECK_INTERVAL", "15"))
+MONGODB_RECONNECT_MAX_BACKOFF = float(os.getenv("MONGODB_RECONNECT_MAX_BACKOFF", "60"))
+
+# "unknown" until the first health check, then "ready" or "unavailable"
+db_status = "unknown"
+db_last_error: Optional[str] = None
+db_last_ping_ms: Optional[float] = None
+
+# Create the query_engine.INDEX_MANIFEST indexes at startup
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+
+# Explain the tools' queries at startup: "warn" logs plans that scan the
+# collection or sort in memory, "fail" also fails /readyz, "off" skips it
+INDEX_SELF_CHECK = os.getenv("INDEX_SELF_CHECK", "warn").lower()
+index_status: Dict[str, Any] = {"ensured": False, "checked": False, "plan_issues": []}
+
+# Maximum number of tool calls allowed to query MongoDB at the same time.
+# Further calls wait here (not in the driver's pool wait queue), so a single
+# process can hold hundreds of open SSE sessions without timing out.
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", str(MONGODB_MAX_POOL_SIZE)))
+query_slots = asyncio.Semaphore(max(1, MAX_CONCURRENT_QUERIES))
+
+# Evict cached results as the news collection changes (needs a replica set);
+# the cache itself is configured in query_engine
+QUERY_CACHE_CHANGE_STREAM = os.getenv("QUERY_CACHE_CHANGE_STREAM", "false").lower() in ("1", "true", "yes")
+
+# Let concurrent identical tool calls share one in-flight MongoDB query
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "true").lower() in ("1", "true", "yes")
+
+# Semantic search index built by scripts/build_vector_index.py; articles
+# added since the build are embedded and indexed in memory every interval
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", ".semantic")
+SEMANTIC_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "32"))
+SEMANTIC_SYNC_INTERVAL = float(os.getenv("SEMANTIC_SYNC_INTERVAL", "30"))
+SEMANTIC_SYNC_BATCH = 1000
+semantic_index: Optional[VectorIndex] = None
+
+# In-memory hot window: articles of the last HOT_STORE_DAYS days are kept in
+# process, and fetch_news / fetch_news_multi / search_news calls within that
+# window are answered without MongoDB. "poll" picks up new articles every
+# HOT_STORE_POLL_INTERVAL seconds; "change_stream" (replica set only) also
+# sees updates and deletes. 0 days disables the store.
+HOT_STORE_DAYS = int(os.getenv("HOT_STORE_DAYS", "0"))
+HOT_STORE_SYNC = os.getenv("HOT_STORE_SYNC", "poll").lower()
+HOT_STORE_POLL_INTERVAL = float(os.getenv("HOT_STORE_POLL_INTERVAL", "5"))
+HOT_STORE_SYNC_BATCH = 1000
+hot_store = HotStore()
+
+# Per-tool metrics, labelled by tool name and the set of arguments supplied,
+# served in Prometheus text format at /metrics. Under server/serve.py with
+# several workers, PROMETHEUS_MULTIPROC_DIR is set and every worker writes its
+# values there, so /metrics adds up the whole host whichever worker answers.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Measuring a response means serializing it a second time, so only every Nth
+# call per tool is measured (1 measures every call, 0 none)
+RESPONSE_BYTES_SAMPLE_EVERY = int(os.getenv("RESPONSE_BYTES_SAMPLE_EVERY", "10"))
+metrics_registry = CollectorRegistry()
+TOOL_LATENCY = Histogram(
+    "news_tool_latency_seconds", "Total tool call latency",
+    ["tool", "args"], registry=metrics_registry
+)
+MONGO_QUERY_SECONDS = Histogram(
+    "news_mongo_query_seconds", "Time spent in MongoDB calls per tool call",
+    ["tool", "args"], registry=metrics_registry
+)
+DOCUMENTS_RETURNED = Histogram(
+    "news_documents_returned", "Documents returned by MongoDB per tool call",
+    ["tool", "args"], buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    registry=metrics_registry
+)
+RESPONSE_BYTES = Histogram(
+    "news_response_bytes", "Serialized tool response size, sampled every RESPONSE_BYTES_SAMPLE_EVERY calls",
+    ["tool", "args"], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    registry=metrics_registry
+)
+TOOL_ERRORS = Counter(
+    "news_tool_errors_total", "Tool calls that returned an error",
+    ["tool", "args"], registry=metrics_registry
+)
+COALESCED_REQUESTS = Counter(
+    "news_coalesced_requests_total", "Tool calls that shared an identical in-flight MongoDB query",
+    ["tool", "args"], registry=metrics_registry
+)
+HOT_STORE_HITS = Counter(
+    "news_hot_store_hits_total", "Tool calls answered from the in-memory hot store",
+    ["tool", "args"], registry=metrics_registry
+)
+tool_labels: ContextVar[Tuple[str, str]] = ContextVar("tool_labels", default=("none", "none"))
 
 def connect_to_mongodb():
-    """Establish connection to MongoDB"""
-    global db_client, db, news_collection
+    """
+    Create the async MongoDB client.
+    
+    No network I/O happens here: the driver connects on first use and the
+    background health check warms the pool, so startup never waits on MongoDB.
+    """
+    global db_client, db, news_collection, article_collection, category_stats_collection, rollup_collections
     
     try:
-        mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-        db_name = os.getenv("MONGODB_DATABASE", "news_db")
-        collection_name = os.getenv("MONGODB_COLLECTION", "news")
-        
-        logger.info(f"Connecting to MongoDB at {mongo_uri}")
-        db_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        
-        # Verify connection
-        db_client.admin.command('ping')
-        logger.info("Successfully connected to MongoDB")
-        
-        db = db_client[db_name]
-        news_collection = db[collection_name]
+        logger.info(
+            f"Configuring MongoDB client for {mongo_uri()} "
+            f"(pool {MONGODB_MIN_POOL_SIZE}-{MONGODB_MAX_POOL_SIZE}, maxIdleTimeMS={MONGODB_MAX_IDLE_TIME_MS})"
+        )
+        repository = NewsRepository(AsyncMongoClient(mongo_uri(), **client_options()), ARTICLE_CODEC_OPTIONS)
+        db_client, db = repository.client, repository.db
+        news_collection, article_collection = repository.news, repository.articles
+        category_stats_collection, rollup_collections = repository.category_stats, repository.rollups
         
         return True
     except Exception as e:
@@ -53,8 +189,406 @@ def connect_to_mongodb():
         return False
 
 
-# Initialize MongoDB connection
-connect_to_mongodb()
+def _database_available() -> bool:
+    """Create the client on demand, and fail fast while MongoDB is known to be down"""
+    if news_collection is None and not connect_to_mongodb():
+        return False
+    return db_status != "unavailable"
+
+
+async def monitor_mongodb() -> None:
+    """Ping MongoDB in the background, backing off exponentially while it is unreachable"""
+    global db_status, db_last_error, db_last_ping_ms
+    
+    backoff = 1.0
+    while True:
+        if news_collection is None and not connect_to_mongodb():
+            db_status, db_last_error = "unavailable", "client could not be created"
+        else:
+            started = time.perf_counter()
+            try:
+                await db_client.admin.command("ping")
+                db_last_ping_ms = (time.perf_counter() - started) * 1000
+                if db_status != "ready":
+                    logger.info("MongoDB is reachable")
+                db_status, db_last_error = "ready", None
+                backoff = 1.0
+                await asyncio.sleep(MONGODB_HEALTH_CHECK_INTERVAL)
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                db_status, db_last_error = "unavailable", str(e)
+        
+        logger.warning(f"MongoDB unavailable ({db_last_error}); retrying in {backoff:.0f}s")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, MONGODB_RECONNECT_MAX_BACKOFF)
+
+
+async def ensure_indexes() -> None:
+    """Create the INDEX_MANIFEST indexes; a conflicting existing index is reported, not replaced"""
+    for model in INDEX_MANIFEST:
+        try:
+            await news_collection.create_indexes([model])
+        except OperationFailure as e:
+            logger.warning(f"Could not create index {model.document['name']}: {e}")
+    index_status["ensured"] = True
+
+
+async def check_query_plans() -> List[str]:
+    """Explain each tool query and describe the ones that scan the collection or sort in memory"""
+    issues = []
+    for name, command, sort_allowed in plan_checks(news_collection.name):
+        try:
+            explain = await db.command("explain", command, verbosity="queryPlanner")
+        except OperationFailure as e:
+            issues.append(f"{name}: explain failed ({e})")
+            continue
+        stages = plan_stages(explain)
+        if "COLLSCAN" in stages:
+            issues.append(f"{name}: collection scan")
+        if "SORT" in stages and not sort_allowed:
+            issues.append(f"{name}: in-memory sort")
+    return issues
+
+
+async def maintain_indexes() -> None:
+    """Once MongoDB is reachable, ensure the manifest indexes and verify the tools' query plans"""
+    while db_status != "ready":
+        await asyncio.sleep(1)
+    
+    try:
+        if ENSURE_INDEXES:
+            await ensure_indexes()
+        if INDEX_SELF_CHECK != "off":
+            index_status["plan_issues"] = await check_query_plans()
+            index_status["checked"] = True
+            for issue in index_status["plan_issues"]:
+                logger.warning(f"Query plan check: {issue}")
+    except Exception as e:
+        logger.error(f"Index maintenance failed: {e}")
+
+
+def instrumented(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Record latency, sampled response size and errors for a tool, labelled by
+    the arguments it was given, and run it within its MongoDB time budget
+    """
+    signature = inspect.signature(func)
+    budget = tool_time_budget(func.__name__)
+    calls = itertools.count()
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind_partial(*args, **kwargs)
+        supplied = sorted(
+            name for name, value in bound.arguments.items()
+            if value != signature.parameters[name].default
+        )
+        labels = (func.__name__, "+".join(supplied) or "none")
+        tool_labels.set(labels)
+        started = time.perf_counter()
+        
+        # The deadline is a context variable, so coalesced loads started by
+        # this call (their own tasks) inherit it
+        with pymongo.timeout(budget):
+            result = await func(*args, **kwargs)
+        
+        TOOL_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+        if RESPONSE_BYTES_SAMPLE_EVERY and next(calls) % RESPONSE_BYTES_SAMPLE_EVERY == 0:
+            RESPONSE_BYTES.labels(*labels).observe(len(dumps(result)))
+        if "error" in result.get("data", {}):
+            TOOL_ERRORS.labels(*labels).inc()
+        return result
+    
+    return wrapper
+
+
+class _MongoTimer:
+    """Async context manager timing MongoDB work for the current tool call"""
+    
+    async def __aenter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        MONGO_QUERY_SECONDS.labels(*tool_labels.get()).observe(time.perf_counter() - self.started)
+        return False
+
+
+def _record_documents(count: int) -> None:
+    """Record how many documents the current tool call got back from MongoDB"""
+    DOCUMENTS_RETURNED.labels(*tool_labels.get()).observe(count)
+
+
+async def _run_plan(plan: QueryPlan, collection: Any = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Run a query_engine plan within the concurrency limit, timing it and
+    recording how many documents came back. Plans read articles (with
+    ARTICLE_CODEC_OPTIONS) unless given another collection.
+    Returns (documents, partial).
+    """
+    async with query_slots, _MongoTimer():
+        documents, partial = await run_plan_async(article_collection if collection is None else collection, plan)
+    _record_documents(len(documents))
+    return documents, partial
+
+
+async def _run_page(plan: QueryPlan) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+    """Run a paged plan; returns (articles, next_cursor, partial)"""
+    articles, partial = await _run_plan(plan)
+    return (*plan.page(articles, partial), partial)
+
+
+async def _semantic_search_page(
+    query: str,
+    limit: int,
+    category_key: Optional[str],
+    fields: Optional[List[str]],
+    preview_chars: int
+) -> List[Dict[str, Any]]:
+    """Rank articles by similarity to the query in the semantic index, then fetch them"""
+    similarity = await asyncio.to_thread(
+        semantic_candidates, semantic_index, query, limit, category_key, SEMANTIC_NPROBE
+    )
+    if not similarity:
+        return []
+    articles, _ = await _run_plan(articles_by_id_plan(list(similarity), category_key, fields, preview_chars))
+    return rank_by_similarity(similarity, articles, limit)
+
+
+async def keep_semantic_index_current() -> None:
+    """Open the semantic index, then add newly ingested articles to its in-memory part"""
+    global semantic_index
+    
+    while db_status != "ready":
+        await asyncio.sleep(1)
+    
+    semantic_index = await asyncio.to_thread(open_index, SEMANTIC_INDEX_DIR)
+    if semantic_index is None:
+        logger.info(
+            f"No semantic index in {SEMANTIC_INDEX_DIR}; semantic_search_news is unavailable "
+            f"until scripts/build_vector_index.py has been run"
+        )
+        return
+    logger.info(f"Loaded semantic index with {len(semantic_index):,} articles")
+    
+    while SEMANTIC_SYNC_INTERVAL > 0:
+        added = 0
+        try:
+            last_id = semantic_index.last_id
+            query = {"_id": {"$gt": ObjectId(last_id)}} if last_id else {"_id": {"$type": "objectId"}}
+            cursor = news_collection.find(query, {"title": 1, "content": 1, "embedding": 1})
+            articles = await cursor.sort("_id", 1).limit(SEMANTIC_SYNC_BATCH).to_list()
+            if articles:
+                ids, vectors = await asyncio.to_thread(article_vectors, semantic_index.model, articles)
+                semantic_index.add(ids, vectors)
+                added = len(articles)
+                logger.info(f"Added {added} articles to the semantic index")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Semantic index sync failed: {e}")
+        if added < SEMANTIC_SYNC_BATCH:
+            await asyncio.sleep(SEMANTIC_SYNC_INTERVAL)
+
+
+def _hot_store_cutoff() -> datetime:
+    return datetime.now() - timedelta(days=HOT_STORE_DAYS)
+
+
+def _hot_article(record: HotArticle, fields: List[str], preview_chars: int) -> Dict[str, Any]:
+    """A hot store article in the shape ARTICLE_CODEC_OPTIONS reads produce"""
+    article = record.to_dict(fields, preview_chars)
+    article["_id"] = str(article["_id"])
+    article["published_date"] = article["published_date"].isoformat()
+    return article
+
+
+def _hot_fetch_page(
+    category_key: Optional[str],
+    cutoff_date: datetime,
+    limit: int,
+    fields: List[str],
+    preview_chars: int,
+    after: Optional[List[Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Answer one newest-first page from the hot store"""
+    records = hot_store.fetch(category_key, cutoff_date, limit + 1, tuple(after) if after else None)
+    return paginate([_hot_article(record, fields, preview_chars) for record in records], limit, "date")
+
+
+def _hot_search_page(
+    query: str,
+    cutoff_date: datetime,
+    limit: int,
+    fields: List[str],
+    preview_chars: int,
+    after: Optional[List[Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Answer one page of keyword search from the hot store"""
+    matches = hot_store.search(query, cutoff_date, limit + 1, tuple(after) if after else None)
+    articles = [{**_hot_article(record, fields, preview_chars), "score": score} for score, record in matches]
+    return paginate(articles, limit, "hot_score")
+
+
+async def load_hot_store() -> None:
+    """Load the hot window from MongoDB"""
+    started = time.perf_counter()
+    # Polling resumes after the newest _id seen before the snapshot; articles
+    # inserted while it is read are simply upserted again
+    newest = await news_collection.find_one({"_id": {"$type": "objectId"}}, {"_id": 1}, sort=[("_id", -1)])
+    since = _hot_store_cutoff()
+    cursor = news_collection.find({"published_date": {"$gte": since}}, HOT_STORE_PROJECTION).batch_size(5000)
+    documents = await cursor.to_list()
+    await asyncio.to_thread(hot_store.load, documents, since, newest["_id"] if newest else None)
+    logger.info(
+        f"Loaded {len(hot_store):,} articles of the last {HOT_STORE_DAYS} days into the hot store "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+async def watch_hot_store() -> None:
+    """Load the hot store and apply every later write to it (needs a replica set)"""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    while True:
+        try:
+            # Open the stream before the snapshot so no write in between is missed
+            async with await news_collection.watch(pipeline, full_document="updateLookup") as stream:
+                await load_hot_store()
+                async for change in stream:
+                    hot_store.apply_change(change)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Writes are missed while the stream is down; serve from MongoDB until reloaded
+            hot_store.invalidate()
+            logger.warning(f"Hot store change stream unavailable ({e}); retrying in 30s")
+            await asyncio.sleep(30)
+
+
+async def keep_hot_store_current() -> None:
+    """Keep the hot store loaded, current and trimmed to the window"""
+    while db_status != "ready":
+        await asyncio.sleep(1)
+    
+    if HOT_STORE_SYNC == "change_stream":
+        watch_task = asyncio.create_task(watch_hot_store())
+    else:
+        watch_task = None
+        while not hot_store.ready:
+            try:
+                await load_hot_store()
+            except Exception as e:
+                logger.warning(f"Hot store load failed ({e}); retrying in 30s")
+                await asyncio.sleep(30)
+    
+    try:
+        while True:
+            added = 0
+            if watch_task is None:
+                try:
+                    query = {"_id": {"$gt": hot_store.last_id}} if hot_store.last_id else {"_id": {"$type": "objectId"}}
+                    cursor = news_collection.find(query, HOT_STORE_PROJECTION).sort("_id", 1)
+                    articles = await cursor.limit(HOT_STORE_SYNC_BATCH).to_list()
+                    for article in articles:
+                        hot_store.upsert(article)
+                    added = len(articles)
+                except Exception as e:
+                    logger.warning(f"Hot store poll failed: {e}")
+            hot_store.evict(_hot_store_cutoff())
+            if added < HOT_STORE_SYNC_BATCH:
+                await asyncio.sleep(HOT_STORE_POLL_INTERVAL)
+    finally:
+        if watch_task is not None:
+            watch_task.cancel()
+
+
+# Result cache for repeated tool calls (e.g. widget refreshes), see query_engine
+query_cache = make_query_cache()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical loads: the first caller for a key starts the
+    load, callers arriving while it runs await the same result.
+    
+    The load runs as its own task, so a caller that is cancelled (e.g. its
+    session closed) does not cancel it for the others. Once every caller is
+    gone, the load is cancelled too, which kills its MongoDB cursor.
+    """
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.coalesced = 0
+    
+    async def run(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Return load()'s result, sharing it with identical calls in flight"""
+        if not self.enabled:
+            return await load()
+        
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            COALESCED_REQUESTS.labels(*tool_labels.get()).inc()
+        else:
+            task = asyncio.ensure_future(load())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+    
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+in_flight = SingleFlight(QUERY_COALESCING)
+
+
+def _change_tags(change: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    """Cache tags affected by a change event, or None if everything may be stale"""
+    document = change.get("fullDocument") or {}
+    category_key = document.get("category_key")
+    if category_key is None:
+        return None
+    return frozenset({category_key, ALL_CATEGORIES_TAG, SEARCH_TAG})
+
+
+async def watch_news_changes() -> None:
+    """Evict cached results affected by writes to the news collection (needs a replica set)"""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    while True:
+        try:
+            async with await news_collection.watch(pipeline, full_document="updateLookup") as stream:
+                logger.info("Watching news collection for cache invalidation")
+                async for change in stream:
+                    tags = _change_tags(change)
+                    if tags is None:
+                        await query_cache.clear_async()
+                    else:
+                        await query_cache.invalidate_async(tags)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Entries written while the stream was down may be stale
+            await query_cache.clear_async()
+            logger.warning(f"Change stream unavailable ({e}); relying on cache TTL, retrying in 30s")
+            await asyncio.sleep(30)
+
 
 # Initialize FastMCP with HTTP transport for Apps SDK
 mcp = FastMCP(
@@ -64,8 +598,49 @@ mcp = FastMCP(
 )
 
 
+MIME_TYPE = "text/html+skybridge"
+
+
+def load_asset_manifest(assets_dir: str) -> Dict[str, str]:
+    """
+    Map widget bundle names (news-list.js, news-list.css) to the hashed file
+    names of the last Vite build, read from its manifest.json.
+    
+    Without a build, the unhashed names are used as-is.
+    """
+    try:
+        with open(os.path.join(assets_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"No Vite manifest in {assets_dir}; using unhashed widget asset names")
+        return {}
+    
+    files = {}
+    for chunk in manifest.values():
+        if not chunk.get("isEntry"):
+            continue
+        name = chunk.get("name") or HASHED_ASSET.sub("", os.path.basename(chunk["file"]))
+        files[f"{name}.js"] = chunk["file"]
+        for css_file in chunk.get("css", []):
+            files[f"{name}.css"] = css_file
+    return files
+
+
+ASSET_FILES = load_asset_manifest(WIDGET_ASSETS_DIR)
+
+
+def asset_url(name: str) -> str:
+    """Public URL of a widget bundle, hashed when a build manifest is available"""
+    return f"{ASSET_BASE_URL}/{ASSET_FILES.get(name, name)}"
+
+
 # Define widget templates
 class NewsWidget:
+    """
+    A widget template. Everything derived from it is computed once here, since
+    the HTML only changes with a new build (i.e. a restart).
+    """
+    
     def __init__(self, identifier: str, title: str, template_uri: str, html: str,
                  invoking: str = "Loading news...", invoked: str = "News loaded"):
         self.identifier = identifier
@@ -74,6 +649,17 @@ class NewsWidget:
         self.html = html
         self.invoking = invoking
         self.invoked = invoked
+        self.etag = '"' + hashlib.sha256(html.encode()).hexdigest()[:32] + '"'
+        
+        # Tool result metadata shared by every response; callers add the description
+        self.meta: Dict[str, Any] = {
+            "openai/outputTemplate": template_uri,
+            "openai/toolInvocation/invoking": invoking,
+            "openai/toolInvocation/invoked": invoked,
+            "openai/widgetAccessible": True,
+        }
+        if EMBED_WIDGET_HTML:
+            self.meta["openai.com/widget"] = {"uri": template_uri, "mimeType": MIME_TYPE, "text": html}
 
 
 # Widget definitions
@@ -84,8 +670,8 @@ widgets = [
         template_uri="ui://widget/news-list.html",
         html=(
             '<div id="news-list-root"></div>\n'
-            f'<link rel="stylesheet" href="{ASSET_BASE_URL}/news-list.css">\n'
-            f'<script type="module" src="{ASSET_BASE_URL}/news-list.js"></script>'
+            f'<link rel="stylesheet" href="{asset_url("news-list.css")}">\n'
+            f'<script type="module" src="{asset_url("news-list.js")}"></script>'
         ),
         invoking="Fetching news articles...",
         invoked="Here are your news articles"
@@ -96,8 +682,8 @@ widgets = [
         template_uri="ui://widget/news-search.html",
         html=(
             '<div id="news-search-root"></div>\n'
-            f'<link rel="stylesheet" href="{ASSET_BASE_URL}/news-search.css">\n'
-            f'<script type="module" src="{ASSET_BASE_URL}/news-search.js"></script>'
+            f'<link rel="stylesheet" href="{asset_url("news-search.css")}">\n'
+            f'<script type="module" src="{asset_url("news-search.js")}"></script>'
         ),
         invoking="Searching news...",
         invoked="Search complete"
@@ -107,15 +693,13 @@ widgets = [
 WIDGETS_BY_ID: Dict[str, NewsWidget] = {widget.identifier: widget for widget in widgets}
 WIDGETS_BY_URI: Dict[str, NewsWidget] = {widget.template_uri: widget for widget in widgets}
 
-MIME_TYPE = "text/html+skybridge"
-
 
 # Pydantic models for tool inputs
 class FetchNewsInput(BaseModel):
     """Schema for fetch_news tool."""
     category: str = Field(
         default="",
-        description="Filter news by category (e.g., Technology, Business, Sports)"
+        description="Filter news by category, case-insensitive exact match (e.g., Technology, Business, Sports)"
     )
     limit: int = Field(
         default=10,
@@ -126,6 +710,49 @@ class FetchNewsInput(BaseModel):
         alias="daysBack",
         description="Fetch news from last N days"
     )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Article fields to return (default: the fields the widget displays)"
+    )
+    preview_chars: int = Field(
+        default=DEFAULT_PREVIEW_CHARS,
+        alias="previewChars",
+        description="Maximum characters of content per article; 0 returns the full content"
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        description="Opaque next_cursor from a previous response, to fetch the following page"
+    )
+    
+    model_config = ConfigDict(populate_by_name=True, extra="forbid")
+
+
+class FetchNewsMultiInput(BaseModel):
+    """Schema for fetch_news_multi tool."""
+    categories: List[str] = Field(
+        ...,
+        max_length=MAX_MULTI_CATEGORIES,
+        description="Categories to fetch, case-insensitive exact match"
+    )
+    per_category: int = Field(
+        default=5,
+        alias="perCategory",
+        description="Maximum number of articles per category"
+    )
+    days_back: int = Field(
+        default=7,
+        alias="daysBack",
+        description="Fetch news from last N days"
+    )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Article fields to return (default: the fields the widget displays)"
+    )
+    preview_chars: int = Field(
+        default=DEFAULT_PREVIEW_CHARS,
+        alias="previewChars",
+        description="Maximum characters of content per article; 0 returns the full content"
+    )
     
     model_config = ConfigDict(populate_by_name=True, extra="forbid")
 
@@ -136,6 +763,28 @@ class SearchNewsInput(BaseModel):
         ...,
         description="Search query to find in news title or content"
     )
+    mode: str = Field(
+        default="text",
+        description="'text' for ranked full-text search, 'substring' for a literal match"
+    )
+    days_back: int = Field(
+        default=0,
+        alias="daysBack",
+        description="Only search news from the last N days; 0 searches all news"
+    )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Article fields to return (default: the fields the widget displays)"
+    )
+    preview_chars: int = Field(
+        default=DEFAULT_PREVIEW_CHARS,
+        alias="previewChars",
+        description="Maximum characters of content per article; 0 returns the full content"
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        description="Opaque next_cursor from a previous response, to fetch the following page"
+    )
     limit: int = Field(
         default=10,
         description="Maximum number of results to return"
@@ -145,74 +794,87 @@ class SearchNewsInput(BaseModel):
 
 
 # Register resources (widgets)
-@mcp.resource("ui://widget/news-list.html")
+@mcp.resource("ui://widget/news-list.html", mime_type=MIME_TYPE)
 def news_list_widget() -> str:
     """News list widget resource"""
     widget = WIDGETS_BY_URI["ui://widget/news-list.html"]
     return widget.html
 
 
-@mcp.resource("ui://widget/news-search.html")
+@mcp.resource("ui://widget/news-search.html", mime_type=MIME_TYPE)
 def news_search_widget() -> str:
     """News search widget resource"""
     widget = WIDGETS_BY_URI["ui://widget/news-search.html"]
     return widget.html
 
 
-def _embedded_widget_resource(widget: NewsWidget) -> Dict[str, Any]:
-    """Create embedded widget resource for metadata"""
-    return {
-        "uri": widget.template_uri,
-        "mimeType": MIME_TYPE,
-        "text": widget.html
-    }
-
-
 @mcp.tool()
-def fetch_news(
+@instrumented
+async def fetch_news(
     category: str = "",
     limit: int = 10,
-    days_back: int = 7
+    days_back: int = 7,
+    fields: Optional[List[str]] = None,
+    preview_chars: int = DEFAULT_PREVIEW_CHARS,
+    cursor: Optional[str] = None
 ) -> dict:
     """
     Fetch news articles from MongoDB.
     
     Args:
-        category: Filter by category (optional)
+        category: Filter by category, case-insensitive exact match (optional)
         limit: Maximum number of articles (default 10)
         days_back: Fetch news from last N days (default 7)
+        fields: Article fields to return (default: title, content, category,
+            source, url, published_date)
+        preview_chars: Maximum characters of content per article; 0 returns
+            the full content (default 200)
+        cursor: next_cursor from a previous response, to fetch the next page
     
     Returns:
         Structured news data with widget metadata
     """
-    if not news_collection:
+    if not _database_available():
         return {
             "text": "Error: MongoDB connection not established",
             "data": {"error": "Database not connected"}
         }
     
     try:
-        # Build query
-        query = {}
-        if category:
-            query["category"] = {"$regex": category, "$options": "i"}
-        
-        # Add date filter
+        category_key = normalize_category(category) if category else None
         cutoff_date = datetime.now() - timedelta(days=days_back)
-        query["published_date"] = {"$gte": cutoff_date}
+        cache_key = (
+            "fetch_news", category_key, limit, days_back,
+            tuple(fields or ()), preview_chars, cursor
+        )
+        
+        after = None
+        if cursor:
+            cursor_sort_key, after = decode_cursor(cursor)
+            if cursor_sort_key != "date":
+                raise ValueError("Pagination cursor does not belong to fetch_news")
         
-        # Fetch from MongoDB
-        cursor = news_collection.find(query).sort("published_date", -1).limit(limit)
-        articles = list(cursor)
+        async def load() -> Tuple[List[Dict[str, Any]], Optional[str]]:
+            # Fetch from MongoDB
+            plan = fetch_news_plan(category_key, cutoff_date, "date", limit, fields, preview_chars, after)
+            articles, next_cursor, _ = await _run_page(plan)
+            page = (articles, next_cursor)
+            await query_cache.set_async(cache_key, page, frozenset({category_key or ALL_CATEGORIES_TAG}))
+            return page
         
-        # Convert ObjectId to string
-        for article in articles:
-            article["_id"] = str(article["_id"])
-            if isinstance(article.get("published_date"), datetime):
-                article["published_date"] = article["published_date"].isoformat()
+        if hot_store.covers(cutoff_date):
+            articles, next_cursor = _hot_fetch_page(
+                category_key, cutoff_date, limit, selected_fields(fields), preview_chars, after
+            )
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            cached = await query_cache.get_async(cache_key)
+            if cached is not None:
+                articles, next_cursor = cached
+            else:
+                articles, next_cursor = await in_flight.run(cache_key, load)
         
         widget = WIDGETS_BY_ID["news-list"]
-        widget_resource = _embedded_widget_resource(widget)
         
         # Build response with widget metadata
         result = {
@@ -221,14 +883,12 @@ def fetch_news(
                 "articles": articles,
                 "category": category or "All",
                 "count": len(articles),
-                "days_back": days_back
+                "days_back": days_back,
+                "cursor": cursor,
+                "next_cursor": next_cursor
             },
             "_meta": {
-                "openai.com/widget": widget_resource,
-                "openai/outputTemplate": widget.template_uri,
-                "openai/toolInvocation/invoking": widget.invoking,
-                "openai/toolInvocation/invoked": widget.invoked,
-                "openai/widgetAccessible": True,
+                **widget.meta,
                 "openai/widgetDescription": f"Displays {len(articles)} news articles" + (f" from {category}" if category else "")
             }
         }
@@ -244,18 +904,143 @@ def fetch_news(
 
 
 @mcp.tool()
-def search_news(query: str, limit: int = 10) -> dict:
+@instrumented
+async def fetch_news_multi(
+    categories: List[str],
+    per_category: int = 5,
+    days_back: int = 7,
+    fields: Optional[List[str]] = None,
+    preview_chars: int = DEFAULT_PREVIEW_CHARS
+) -> dict:
+    """
+    Fetch the latest news for several categories at once, e.g. a front page.
+    
+    All categories are fetched in a single database round trip.
+    
+    Args:
+        categories: Categories to fetch, case-insensitive exact match
+        per_category: Maximum number of articles per category (default 5)
+        days_back: Fetch news from last N days (default 7)
+        fields: Article fields to return (default: title, content, category,
+            source, url, published_date)
+        preview_chars: Maximum characters of content per article; 0 returns
+            the full content (default 200)
+    
+    Returns:
+        Articles grouped into one section per category, in the order requested
+    """
+    if not _database_available():
+        return {
+            "text": "Error: MongoDB connection not established",
+            "data": {"error": "Database not connected"}
+        }
+    
+    # One section per distinct category_key, in the order requested
+    sections: Dict[str, str] = {}
+    for category in categories or []:
+        sections.setdefault(normalize_category(category), category)
+    if not sections:
+        return {
+            "text": "Please provide at least one category",
+            "data": {"error": "No categories provided"}
+        }
+    if len(sections) > MAX_MULTI_CATEGORIES:
+        return {
+            "text": f"Error: at most {MAX_MULTI_CATEGORIES} categories can be fetched at once",
+            "data": {"error": "Too many categories"}
+        }
+    
+    try:
+        category_keys = list(sections)
+        cache_key = (
+            "fetch_news_multi", tuple(category_keys), per_category, days_back,
+            tuple(fields or ()), preview_chars
+        )
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        
+        async def load() -> Dict[str, List[Dict[str, Any]]]:
+            plan = multi_category_plan(
+                news_collection.name, category_keys, cutoff_date, per_category, fields, preview_chars
+            )
+            articles, _ = await _run_plan(plan)
+            grouped = group_by_category(articles, category_keys)
+            await query_cache.set_async(cache_key, grouped, frozenset(category_keys))
+            return grouped
+        
+        if hot_store.covers(cutoff_date):
+            selected = selected_fields(fields)
+            grouped = {
+                key: [
+                    _hot_article(record, selected, preview_chars)
+                    for record in hot_store.fetch(key, cutoff_date, per_category)
+                ]
+                for key in category_keys
+            }
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            grouped = await query_cache.get_async(cache_key)
+            if grouped is None:
+                grouped = await in_flight.run(cache_key, load)
+        
+        sections_data = [
+            {"category": category, "articles": grouped[key], "count": len(grouped[key])}
+            for key, category in sections.items()
+        ]
+        total = sum(section["count"] for section in sections_data)
+        return {
+            "text": f"Found {total} news articles in {len(sections_data)} categories",
+            "data": {
+                "sections": sections_data,
+                "count": total,
+                "per_category": per_category,
+                "days_back": days_back
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching news: {e}")
+        return {
+            "text": f"Error fetching news: {str(e)}",
+            "data": {"error": str(e)}
+        }
+
+
+@mcp.tool()
+@instrumented
+async def search_news(
+    query: str,
+    limit: int = 10,
+    mode: str = "text",
+    days_back: int = 0,
+    fields: Optional[List[str]] = None,
+    preview_chars: int = DEFAULT_PREVIEW_CHARS,
+    cursor: Optional[str] = None,
+    allow_partial: bool = False
+) -> dict:
     """
     Search news articles by keywords.
     
+    Results are ranked by relevance, with title matches weighted above
+    content. Use "quotes" for exact phrases and -word to exclude a word.
+    
     Args:
         query: Search query for title or content
         limit: Maximum number of results (default 10)
+        mode: "text" for ranked full-text search (default) or "substring"
+            for a literal case-insensitive match
+        days_back: Only search news from the last N days (default 0: all news)
+        fields: Article fields to return (default: title, content, category,
+            source, url, published_date)
+        preview_chars: Maximum characters of content per article; 0 returns
+            the full content (default 200)
+        cursor: next_cursor from a previous response, to fetch the next page
+        allow_partial: If the search runs out of time, return the articles
+            found so far, marked partial, instead of an error (default false)
     
     Returns:
         Structured search results with widget metadata
     """
-    if not news_collection:
+    if not _database_available():
         return {
             "text": "Error: MongoDB connection not established",
             "data": {"error": "Database not connected"}
@@ -268,39 +1053,75 @@ def search_news(query: str, limit: int = 10) -> dict:
         }
     
     try:
-        # Search in title and content
-        search_query = {
-            "$or": [
-                {"title": {"$regex": query, "$options": "i"}},
-                {"content": {"$regex": query, "$options": "i"}}
-            ]
-        }
+        cache_key = (
+            "search_news", query, limit, mode, days_back, tuple(fields or ()), preview_chars, cursor, allow_partial
+        )
+        
+        # A cursor carries the sort order of the page it came from, so a
+        # search that fell back to substring mode keeps paging that way
+        after = None
+        sort_key = "score" if mode == "text" else "date"
+        if cursor:
+            sort_key, after = decode_cursor(cursor)
+            if sort_key not in ("score", "date", "hot_score"):
+                raise ValueError("Pagination cursor does not belong to search_news")
+        cutoff_date = date_cutoff(days_back)
+        if sort_key == "score" and not cursor and hot_store.covers(cutoff_date):
+            sort_key = "hot_score"
         
-        cursor = news_collection.find(search_query).sort("published_date", -1).limit(limit)
-        articles = list(cursor)
+        async def load() -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+            # Search in title and content
+            search_plan = text_search_plan if sort_key == "score" else substring_search_plan
+            try:
+                page = await _run_page(
+                    search_plan(query, limit, fields, preview_chars, after, cutoff_date, allow_partial)
+                )
+            except OperationFailure as e:
+                if sort_key != "score" or e.code != INDEX_NOT_FOUND_CODE:
+                    raise
+                logger.warning("No text index on news collection; falling back to substring search")
+                page = await _run_page(
+                    substring_search_plan(query, limit, fields, preview_chars, None, cutoff_date, allow_partial)
+                )
+            
+            # A partial page only reflects how far this call got in time
+            if not page[2]:
+                await query_cache.set_async(cache_key, page, frozenset({SEARCH_TAG}))
+            return page
         
-        # Convert ObjectId to string
-        for article in articles:
-            article["_id"] = str(article["_id"])
-            if isinstance(article.get("published_date"), datetime):
-                article["published_date"] = article["published_date"].isoformat()
+        if sort_key == "hot_score":
+            if not hot_store.covers(cutoff_date):
+                raise ValueError("Pagination cursor has expired; repeat the search without it")
+            articles, next_cursor = await asyncio.to_thread(
+                _hot_search_page, query, cutoff_date, limit, selected_fields(fields), preview_chars, after
+            )
+            partial = False
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            cached = await query_cache.get_async(cache_key)
+            if cached is not None:
+                articles, next_cursor, partial = cached
+            else:
+                articles, next_cursor, partial = await in_flight.run(cache_key, load)
         
         widget = WIDGETS_BY_ID["news-search"]
-        widget_resource = _embedded_widget_resource(widget)
         
+        text = f"Found {len(articles)} articles matching '{query}'"
+        if partial:
+            text += " before the search ran out of time (partial results)"
         result = {
-            "text": f"Found {len(articles)} articles matching '{query}'",
+            "text": text,
             "data": {
                 "articles": articles,
                 "query": query,
-                "count": len(articles)
+                "mode": mode,
+                "count": len(articles),
+                "cursor": cursor,
+                "next_cursor": next_cursor,
+                "partial": partial
             },
             "_meta": {
-                "openai.com/widget": widget_resource,
-                "openai/outputTemplate": widget.template_uri,
-                "openai/toolInvocation/invoking": widget.invoking,
-                "openai/toolInvocation/invoked": widget.invoked,
-                "openai/widgetAccessible": True,
+                **widget.meta,
                 "openai/widgetDescription": f"Search results for '{query}' - {len(articles)} articles found"
             }
         }
@@ -309,6 +1130,90 @@ def search_news(query: str, limit: int = 10) -> dict:
         
     except Exception as e:
         logger.error(f"Error searching news: {e}")
+        message = str(e)
+        if isinstance(e, PyMongoError) and e.timeout:
+            message = f"Search ran out of time ({e}); narrow it with days_back, or pass allow_partial"
+        return {
+            "text": f"Error searching news: {message}",
+            "data": {"error": message}
+        }
+
+
+@mcp.tool()
+@instrumented
+async def semantic_search_news(
+    query: str,
+    limit: int = 10,
+    category: str = "",
+    fields: Optional[List[str]] = None,
+    preview_chars: int = DEFAULT_PREVIEW_CHARS
+) -> dict:
+    """
+    Search news by meaning rather than exact keywords.
+    
+    Paraphrases match, e.g. "chip maker" finds articles about semiconductor
+    companies. Results are ordered by similarity.
+    
+    Args:
+        query: What to look for, in natural language
+        limit: Maximum number of results (default 10)
+        category: Only return articles in this category (optional)
+        fields: Article fields to return (default: title, content, category,
+            source, url, published_date)
+        preview_chars: Maximum characters of content per article; 0 returns
+            the full content (default 200)
+    
+    Returns:
+        Search results ordered by similarity, with widget metadata
+    """
+    if not _database_available():
+        return {
+            "text": "Error: MongoDB connection not established",
+            "data": {"error": "Database not connected"}
+        }
+    
+    if not query:
+        return {
+            "text": "Please provide a search query",
+            "data": {"error": "No query provided"}
+        }
+    
+    if semantic_index is None:
+        return {
+            "text": "Error: semantic search is not available",
+            "data": {"error": "Semantic index not built (run scripts/build_vector_index.py)"}
+        }
+    
+    try:
+        category_key = normalize_category(category) if category else None
+        cache_key = ("semantic_search_news", query, limit, category_key, tuple(fields or ()), preview_chars)
+        
+        async def load() -> List[Dict[str, Any]]:
+            articles = await _semantic_search_page(query, limit, category_key, fields, preview_chars)
+            await query_cache.set_async(cache_key, articles, frozenset({SEARCH_TAG}))
+            return articles
+        
+        articles = await query_cache.get_async(cache_key)
+        if articles is None:
+            articles = await in_flight.run(cache_key, load)
+        
+        widget = WIDGETS_BY_ID["news-search"]
+        return {
+            "text": f"Found {len(articles)} articles related to '{query}'",
+            "data": {
+                "articles": articles,
+                "query": query,
+                "mode": "semantic",
+                "count": len(articles)
+            },
+            "_meta": {
+                **widget.meta,
+                "openai/widgetDescription": f"Articles related to '{query}' - {len(articles)} found"
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in semantic search: {e}")
         return {
             "text": f"Error searching news: {str(e)}",
             "data": {"error": str(e)}
@@ -316,28 +1221,36 @@ def search_news(query: str, limit: int = 10) -> dict:
 
 
 @mcp.tool()
-def get_news_categories() -> dict:
+@instrumented
+async def get_news_categories() -> dict:
     """
     Get list of available news categories.
     
     Returns:
         List of categories with article counts
     """
-    if not news_collection:
+    if not _database_available():
         return {
             "text": "Error: MongoDB connection not established",
             "data": {"error": "Database not connected"}
         }
     
     try:
-        # Get distinct categories with counts
-        pipeline = [
-            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
+        async def load() -> List[Dict[str, Any]]:
+            results, _ = await _run_plan(CATEGORY_STATS_PLAN, category_stats_collection)
+            if not results:
+                logger.warning("category_stats is empty; falling back to $group over the news collection")
+                results, _ = await _run_plan(CATEGORY_SCAN_PLAN, news_collection)
+            
+            categories = []
+            for r in results:
+                category = {"name": r["name"], "count": r["count"]}
+                if isinstance(r.get("latest_published_date"), datetime):
+                    category["latest_published_date"] = r["latest_published_date"].isoformat()
+                categories.append(category)
+            return categories
         
-        results = list(news_collection.aggregate(pipeline))
-        categories = [{"name": r["_id"], "count": r["count"]} for r in results]
+        categories = await in_flight.run(("get_news_categories",), load)
         
         return {
             "text": f"Found {len(categories)} categories",
@@ -355,9 +1268,264 @@ def get_news_categories() -> dict:
         }
 
 
+@mcp.tool()
+@instrumented
+async def news_trends(
+    dimension: str = "category",
+    values: Optional[List[str]] = None,
+    interval: str = "hour",
+    bin_size: int = 1,
+    days_back: int = 1,
+    top: int = 5,
+    rank_by: str = "count"
+) -> dict:
+    """
+    Count articles over time per category or per source.
+    
+    Answers questions like "how many Technology stories per hour today" or
+    "which sources are surging". Reads precomputed hourly/daily counts, so
+    long ranges are cheap.
+    
+    Args:
+        dimension: "category" (default) or "source"
+        values: Categories or sources to chart (default: the top ones)
+        interval: Bucket width: "hour" (default), "day", "week" or "month"
+        bin_size: Intervals per bucket, e.g. 6 with "hour" for 6-hour buckets (default 1)
+        days_back: Length of the window in days, ending now (default 1); growth
+            compares with the window before it
+        top: Series returned when values is not given, at most 20 (default 5)
+        rank_by: "count" for the busiest first (default) or "growth" for the
+            fastest growing first
+    
+    Returns:
+        One series per category or source with UTC buckets, totals and growth
+    """
+    if not _database_available():
+        return {
+            "text": "Error: MongoDB connection not established",
+            "data": {"error": "Database not connected"}
+        }
+    
+    try:
+        validate_trend_arguments(dimension, interval, bin_size, days_back, top)
+        keys = trend_keys(dimension, values)
+        
+        previous_start, start, end = trend_window(interval, days_back)
+        cache_key = ("news_trends", dimension, tuple(keys), interval, bin_size, days_back, rank_by, top, start)
+        
+        async def load() -> List[Dict[str, Any]]:
+            plan = trends_plan(dimension, keys, interval, bin_size, previous_start, start, end)
+            rows, _ = await _run_plan(plan, rollup_collections[rollup_unit(interval)])
+            series = summarize_trends(rows, len(keys) or top, rank_by)
+            await query_cache.set_async(cache_key, series, frozenset({ALL_CATEGORIES_TAG}))
+            return series
+        
+        series = await query_cache.get_async(cache_key)
+        if series is None:
+            series = await in_flight.run(cache_key, load)
+        
+        return {
+            "text": f"Article counts per {interval} for {len(series)} {dimension} series over the last {days_back} day(s)",
+            "data": {
+                "series": series,
+                "dimension": dimension,
+                "interval": interval,
+                "bin_size": bin_size,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "rank_by": rank_by
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Error computing trends: {e}")
+        return {
+            "text": f"Error computing trends: {str(e)}",
+            "data": {"error": str(e)}
+        }
+
+
 # Get the FastAPI app for deployment
 app = mcp.get_app()
 
+# Background tasks started with the app
+db_monitor_task: Optional[asyncio.Task] = None
+index_task: Optional[asyncio.Task] = None
+semantic_index_task: Optional[asyncio.Task] = None
+hot_store_task: Optional[asyncio.Task] = None
+cache_watch_task: Optional[asyncio.Task] = None
+
+# Set once the worker starts shutting down; see begin_drain()
+draining = False
+drain_event = asyncio.Event()
+
+
+async def metrics(request):
+    """Expose per-tool metrics in Prometheus text format, summed over all workers"""
+    registry = metrics_registry
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+async def cache_stats(request):
+    """Expose result cache hit/miss metrics, how many calls were coalesced and the hot store size"""
+    stats = await query_cache.stats_async()
+    stats["coalesced"] = in_flight.coalesced
+    if HOT_STORE_DAYS > 0:
+        stats["hot_store"] = hot_store.stats()
+    return JSONResponse(stats)
+
+
+async def widget_html(request):
+    """Widget template over HTTP, revalidated by ETag so unchanged HTML costs a 304"""
+    widget = WIDGETS_BY_URI.get(f"ui://widget/{request.path_params['name']}")
+    if widget is None:
+        return Response(status_code=404)
+    
+    headers = {"ETag": widget.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == widget.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(widget.html, media_type="text/html", headers=headers)
+
+
+class WidgetAssets(StaticFiles):
+    """Built widget bundles with ETags; hashed file names are cached as immutable"""
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if HASHED_ASSET.search(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+async def healthz(request):
+    """Liveness: the process is up, whether or not MongoDB is"""
+    return JSONResponse({"status": "ok"})
+
+
+async def readyz(request):
+    """
+    Readiness: 200 once MongoDB answered the last health check, 503 otherwise
+    and while the worker drains for shutdown.
+    
+    With INDEX_SELF_CHECK=fail, query plans that scan the collection or sort
+    in memory also make the server not ready.
+    """
+    ready = db_status == "ready" and not draining
+    if INDEX_SELF_CHECK == "fail" and index_status["plan_issues"]:
+        ready = False
+    body = {
+        "status": "draining" if draining else "ready" if ready else "not ready",
+        "mongodb": db_status,
+        "last_ping_ms": db_last_ping_ms,
+        "last_error": db_last_error,
+        "indexes": index_status,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+def begin_drain() -> None:
+    """
+    Start draining for shutdown (called by server/serve.py on SIGTERM/SIGINT):
+    /readyz turns 503 and event streams end, while tool calls in flight finish
+    """
+    global draining
+    if draining:
+        return
+    draining = True
+    logger.info("Draining: closing event streams, finishing tool calls in flight")
+    try:
+        asyncio.get_running_loop().call_soon(drain_event.set)
+    except RuntimeError:
+        drain_event.set()
+
+
+class EventStreamDrain:
+    """
+    ASGI middleware ending long-lived GET event streams (MCP SSE sessions)
+    once the worker drains, so clients reconnect to a live worker instead of
+    holding shutdown open until the grace period runs out.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or \
+                b"text/event-stream" not in dict(scope["headers"]).get(b"accept", b""):
+            await self.app(scope, receive, send)
+            return
+        
+        response = {"started": False, "finished": False}
+        
+        async def tracked_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["finished"] = True
+            await send(message)
+        
+        stream = asyncio.ensure_future(self.app(scope, receive, tracked_send))
+        drained = asyncio.ensure_future(drain_event.wait())
+        try:
+            await asyncio.wait({stream, drained}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            drained.cancel()
+            if not stream.done():
+                stream.cancel()
+                await asyncio.gather(stream, return_exceptions=True)
+        
+        if stream.cancelled():
+            # Drained: close the response cleanly so the client sees the stream end
+            if not response["started"]:
+                await send({"type": "http.response.start", "status": 503, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+            elif not response["finished"]:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        stream.result()
+
+
+async def start_background_tasks():
+    """
+    Start the MongoDB health check, index maintenance, semantic index loading
+    and, when enabled, the hot store and change-stream cache invalidation
+    """
+    global db_monitor_task, index_task, semantic_index_task, hot_store_task, cache_watch_task
+    
+    # Each worker creates its own client once it runs, never before a fork
+    if news_collection is None:
+        connect_to_mongodb()
+    db_monitor_task = asyncio.create_task(monitor_mongodb())
+    if ENSURE_INDEXES or INDEX_SELF_CHECK != "off":
+        index_task = asyncio.create_task(maintain_indexes())
+    semantic_index_task = asyncio.create_task(keep_semantic_index_current())
+    if HOT_STORE_DAYS > 0 and news_collection is not None:
+        hot_store_task = asyncio.create_task(keep_hot_store_current())
+    if QUERY_CACHE_CHANGE_STREAM and query_cache.enabled and news_collection is not None:
+        cache_watch_task = asyncio.create_task(watch_news_changes())
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live metric files on exit (multiprocess mode only)"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid(), PROMETHEUS_MULTIPROC_DIR)
+
+
+app.add_route("/metrics", metrics, methods=["GET"])
+app.add_route("/cache/stats", cache_stats, methods=["GET"])
+app.add_route("/widgets/{name}", widget_html, methods=["GET"])
+app.mount("/assets", WidgetAssets(directory=WIDGET_ASSETS_DIR, check_dir=False), name="assets")
+app.add_route("/healthz", healthz, methods=["GET"])
+app.add_route("/readyz", readyz, methods=["GET"])
+app.add_event_handler("startup", start_background_tasks)
+app.add_event_handler("shutdown", mark_worker_dead)
+app.add_middleware(EventStreamDrain)
+
 # Add CORS middleware for development
 try:
     from starlette.middleware.cors import CORSMiddleware
@@ -375,5 +1543,6 @@ except Exception:
 
 if __name__ == "__main__":
     import uvicorn
-    logger.info("Starting MongoDB News MCP Server with Apps SDK...")
+    logger.info("Starting MongoDB News MCP Server with Apps SDK (development, auto-reload)...")
+    logger.info("For production, run server/serve.py (multiple workers, graceful shutdown)")
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
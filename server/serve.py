@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the HTTP MCP server
+
+Serves main:app from WEB_WORKERS processes (default: one per available CPU)
+sharing one listening socket. The supervisor never imports the app: every
+worker imports it and creates its own MongoDB client once it runs, so no
+client, pool or background task crosses a fork.
+
+On SIGTERM or SIGINT each worker drains: /readyz answers 503, MCP event
+streams are closed so clients reconnect to another instance, and tool calls
+in flight get up to SHUTDOWN_GRACE_SECONDS to finish before it exits.
+
+Set QUERY_CACHE_SHARED=true to let the workers share one result cache.
+
+With several workers, Prometheus metrics run in prometheus_client's
+multiprocess mode: every worker writes its values to PROMETHEUS_MULTIPROC_DIR
+(a fresh temporary directory unless set) and /metrics sums them.
+
+Usage:
+    python server/serve.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import logging
+import tempfile
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that tells the app to drain before shutting down"""
+    
+    def handle_exit(self, sig, frame):
+        app_module = sys.modules.get("main")
+        if app_module is not None and not self.should_exit:
+            app_module.begin_drain()
+        super().handle_exit(sig, frame)
+
+
+def default_workers() -> int:
+    """CPUs this process may run on (respects affinity and cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def prepare_metrics_dir() -> bool:
+    """
+    Point the workers at a PROMETHEUS_MULTIPROC_DIR with no files from an
+    earlier run. Returns whether the directory was created here.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    created = not path
+    if created:
+        path = tempfile.mkdtemp(prefix="mongodb-news-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    # Values left by a previous run would be added to this run's
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the HTTP MCP server with multiple workers")
+    parser.add_argument("--host", default=os.getenv("WEB_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEB_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "0")),
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--grace", type=float, default=float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30")),
+                        help="Seconds tool calls in flight get to finish on shutdown")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    workers = args.workers or default_workers()
+    
+    # Workers import "main" from this directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.grace,
+        proxy_headers=True,
+    )
+    server = DrainingServer(config)
+    
+    logger.info(f"Starting MongoDB News MCP Server with {workers} worker(s) on {args.host}:{args.port}...")
+    if workers > 1:
+        # Set before any worker imports prometheus_client
+        created_metrics_dir = prepare_metrics_dir()
+        try:
+            Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+        finally:
+            if created_metrics_dir:
+                shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+In-memory store of recent articles (the "hot window")
+
+Nearly every call asks for the last few days of news, so the servers can
+keep those articles in process and answer without a MongoDB round trip.
+The store holds one HotArticle (a __slots__ record) per article published
+in the last N days and indexes them two ways:
+
+- lists sorted by (published_date, _id), one per category plus one for all
+  articles, so a newest-first page is two bisects and a slice
+- an inverted index from title/content tokens to posting arrays of (record
+  slot, term weight), for keyword search
+
+Search approximates the news_text index: title terms weigh 5x content
+terms, "quoted phrases" must appear verbatim and -terms exclude articles.
+Tokens are stemmed by stripping common English suffixes. Scores are not
+MongoDB textScores, so in-memory and MongoDB search pages do not share
+cursors; date-ordered cursors are interchangeable.
+
+The store is filled by load(), kept current by upsert() / remove() /
+apply_change() and trimmed by evict(). All methods are thread-safe.
+"""
+
+import math
+import re
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Optional, Tuple
+
+from bson.objectid import ObjectId
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+PHRASE_RE = re.compile(r'"([^"]*)"')
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his in into is it its "
+    "of on or our said she that the their they this to was were which will with".split()
+)
+
+# Same weights as the news_text index
+TITLE_WEIGHT = 10
+CONTENT_WEIGHT = 2
+
+# Fields read from MongoDB for each article in the store
+PROJECTION = {
+    field: 1 for field in (
+        "title", "content", "category", "category_key", "source", "url",
+        "published_date", "author", "image_url", "tags",
+    )
+}
+
+# Rebuild the posting arrays once they hold more dead entries than live articles
+COMPACT_MIN_DEAD = 10_000
+
+
+def stem(token: str) -> str:
+    """Strip common English inflections so "markets" matches "market" """
+    if len(token) <= 3:
+        return token
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("s"):
+        return token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 4:
+        return token[:-2]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(word) for word in TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Compare dates as MongoDB returns them: naive UTC"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _sort_key(values: Optional[Tuple[Any, ...]]) -> Optional[Tuple[Any, ...]]:
+    if values is None:
+        return None
+    return tuple(_naive_utc(value) if isinstance(value, datetime) else value for value in values)
+
+
+class HotArticle:
+    """One article of the hot window"""
+
+    __slots__ = (
+        "slot", "id", "published_date", "category_key", "title", "content",
+        "category", "source", "url", "author", "image_url", "tags",
+    )
+
+    def __init__(self, slot: int, document: dict):
+        self.slot = slot
+        self.id = document["_id"]
+        self.published_date = _naive_utc(document["published_date"])
+        self.category_key = document.get("category_key")
+        self.title = document.get("title")
+        self.content = document.get("content")
+        self.category = document.get("category")
+        self.source = document.get("source")
+        self.url = document.get("url")
+        self.author = document.get("author")
+        self.image_url = document.get("image_url")
+        self.tags = document.get("tags")
+
+    @property
+    def key(self) -> Tuple[datetime, ObjectId]:
+        return (self.published_date, self.id)
+
+    def to_dict(self, fields: Iterable[str], preview_chars: int) -> dict:
+        """
+        The article as a MongoDB find with the tools' projection would return
+        it: the requested fields plus _id and published_date, with content cut
+        to preview_chars and flagged with content_truncated.
+        """
+        article = {"_id": self.id, "published_date": self.published_date}
+        for field in fields:
+            value = getattr(self, field)
+            if field == "content" and preview_chars > 0:
+                value = value or ""
+                article["content_truncated"] = len(value) > preview_chars
+                value = value[:preview_chars]
+            if value is not None:
+                article[field] = value
+        return article
+
+
+class _DateList:
+    """Articles kept sorted by (published_date, _id)"""
+
+    __slots__ = ("keys", "records")
+
+    def __init__(self):
+        self.keys: list = []
+        self.records: List[HotArticle] = []
+
+    def add(self, record: HotArticle) -> None:
+        key = record.key
+        # New articles almost always sort last
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+            self.records.append(record)
+            return
+        idx = bisect_left(self.keys, key)
+        self.keys.insert(idx, key)
+        self.records.insert(idx, record)
+
+    def remove(self, record: HotArticle) -> None:
+        key = record.key
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            del self.keys[idx]
+            del self.records[idx]
+
+    def newest(self, cutoff: datetime, limit: int, before: Optional[tuple]) -> List[HotArticle]:
+        """Up to limit articles from cutoff on and strictly before the key, newest first"""
+        lo = bisect_left(self.keys, (cutoff,))
+        hi = len(self.keys) if before is None else bisect_left(self.keys, before)
+        return self.records[max(lo, hi - limit):hi][::-1]
+
+    def drop_before(self, cutoff: datetime) -> List[HotArticle]:
+        idx = bisect_left(self.keys, (cutoff,))
+        dropped = self.records[:idx]
+        del self.keys[:idx]
+        del self.records[:idx]
+        return dropped
+
+
+class HotStore:
+    """Articles published since a cutoff, indexed by category, date and token"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.since: Optional[datetime] = None
+        self.last_id: Optional[ObjectId] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._next_slot = 0
+        self._records: dict = {}
+        self._by_id: dict = {}
+        self._all = _DateList()
+        self._by_category: dict = {}
+        # token -> (record slots, term weights)
+        self._postings: dict = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "articles": len(self._records),
+                "since": self.since.isoformat() if self.since else None,
+                "tokens": len(self._postings),
+            }
+
+    def covers(self, cutoff: datetime) -> bool:
+        """Whether every article published since cutoff is in the store"""
+        return self.ready and cutoff is not None and _naive_utc(cutoff) >= self.since
+
+    def invalidate(self) -> None:
+        """Stop serving until the next load, e.g. when writes may have been missed"""
+        self.ready = False
+
+    def load(self, documents: Iterable[dict], since: datetime, last_id: Optional[ObjectId] = None) -> None:
+        """Replace the contents with documents published since the cutoff"""
+        with self._lock:
+            self.ready = False
+            self._reset()
+            self.since = _naive_utc(since)
+            self.last_id = last_id
+            records = []
+            for document in documents:
+                record = self._new_record(document)
+                if record is not None:
+                    records.append(record)
+            # One sort instead of an insertion per article
+            records.sort(key=lambda record: record.key)
+            for record in records:
+                self._all.keys.append(record.key)
+                self._all.records.append(record)
+                by_category = self._by_category.setdefault(record.category_key, _DateList())
+                by_category.keys.append(record.key)
+                by_category.records.append(record)
+            self.ready = True
+
+    def upsert(self, document: dict) -> None:
+        """Add or replace an article; one now older than the window is dropped"""
+        with self._lock:
+            self.remove(document["_id"])
+            record = self._new_record(document)
+            if record is not None:
+                self._all.add(record)
+                self._by_category.setdefault(record.category_key, _DateList()).add(record)
+
+    def remove(self, article_id: Any) -> None:
+        with self._lock:
+            record = self._by_id.pop(article_id, None)
+            if record is None:
+                return
+            del self._records[record.slot]
+            self._all.remove(record)
+            self._by_category[record.category_key].remove(record)
+            self._dead += 1
+
+    def apply_change(self, change: dict) -> None:
+        """Apply a change stream event opened with full_document="updateLookup" """
+        document = change.get("fullDocument")
+        if change["operationType"] == "delete" or document is None:
+            self.remove(change["documentKey"]["_id"])
+        else:
+            self.upsert(document)
+
+    def evict(self, cutoff: datetime) -> int:
+        """Drop articles published before cutoff and move the window start there"""
+        cutoff = _naive_utc(cutoff)
+        with self._lock:
+            if self.since is not None and cutoff <= self.since:
+                return 0
+            dropped = self._all.drop_before(cutoff)
+            for by_category in self._by_category.values():
+                by_category.drop_before(cutoff)
+            for record in dropped:
+                del self._records[record.slot]
+                del self._by_id[record.id]
+            self._dead += len(dropped)
+            self.since = cutoff
+            if self._dead > max(len(self._records), COMPACT_MIN_DEAD):
+                self._compact()
+            return len(dropped)
+
+    def fetch(self, category_key: Optional[str], cutoff: datetime, limit: int,
+              before: Optional[tuple] = None) -> List[HotArticle]:
+        """
+        Up to limit articles published since cutoff, newest first, optionally
+        in one category and strictly after the (published_date, _id) key of
+        the previous page
+        """
+        with self._lock:
+            articles = self._all if category_key is None else self._by_category.get(category_key)
+            if articles is None:
+                return []
+            return articles.newest(_naive_utc(cutoff), limit, _sort_key(before))
+
+    def search(self, query: str, cutoff: datetime, limit: int,
+               after: Optional[tuple] = None) -> List[Tuple[float, HotArticle]]:
+        """
+        Up to limit (score, article) pairs matching the query among articles
+        published since cutoff, best first, strictly after the (score,
+        published_date, _id) key of the previous page
+        """
+        phrases = [phrase.lower() for phrase in PHRASE_RE.findall(query) if phrase.strip()]
+        words = PHRASE_RE.sub(" ", query).split()
+        negated = set(tokenize(" ".join(word[1:] for word in words if word.startswith("-"))))
+        terms = set(tokenize(" ".join([word for word in words if not word.startswith("-")] + phrases)))
+        cutoff = _naive_utc(cutoff)
+        after = _sort_key(after)
+
+        # Copy the posting arrays under the lock and score outside it, so
+        # fetch() and upsert() on the event loop never wait for a search
+        with self._lock:
+            postings = [
+                (slots[:], weights[:])
+                for slots, weights in (self._postings.get(term, ((), ())) for term in terms)
+            ]
+            excluded_postings = [self._postings.get(term, ((), ()))[0][:] for term in negated]
+
+        scores: dict = {}
+        for slots, weights in postings:
+            for slot, weight in zip(slots, weights):
+                scores[slot] = scores.get(slot, 0.0) + weight
+        excluded = set()
+        for slots in excluded_postings:
+            excluded.update(slots)
+        candidates = [slot for slot in scores if slot not in excluded]
+
+        # Slots are never reused, and a replaced article gets a new record, so
+        # records looked up now can be read without the lock
+        with self._lock:
+            records = [(self._records.get(slot), scores[slot]) for slot in candidates]
+
+        matches = []
+        for record, score in records:
+            if record is None or record.published_date < cutoff:
+                continue
+            if phrases:
+                text = f"{record.title or ''}\n{record.content or ''}".lower()
+                if not all(phrase in text for phrase in phrases):
+                    continue
+            key = (round(score, 6), record.published_date, record.id)
+            if after is None or key < after:
+                matches.append((key, record))
+
+        best = heapq.nlargest(limit, matches, key=lambda match: match[0])
+        return [(key[0], record) for key, record in best]
+
+    def _new_record(self, document: dict) -> Optional[HotArticle]:
+        """Register and index a document, or return None if it is outside the window"""
+        article_id = document.get("_id")
+        if isinstance(article_id, ObjectId) and (self.last_id is None or article_id > self.last_id):
+            self.last_id = article_id
+        if self.since is None or not isinstance(article_id, ObjectId):
+            return None
+        published_date = document.get("published_date")
+        if not isinstance(published_date, datetime) or _naive_utc(published_date) < self.since:
+            return None
+
+        record = HotArticle(self._next_slot, document)
+        self._next_slot += 1
+        self._records[record.slot] = record
+        self._by_id[record.id] = record
+        self._index(record)
+        return record
+
+    def _index(self, record: HotArticle) -> None:
+        title_counts: dict = {}
+        for token in tokenize(record.title or ""):
+            title_counts[token] = title_counts.get(token, 0) + 1
+        content_counts: dict = {}
+        for token in tokenize(record.content or ""):
+            content_counts[token] = content_counts.get(token, 0) + 1
+
+        for token in title_counts.keys() | content_counts.keys():
+            weight = 0.0
+            if token in title_counts:
+                weight += TITLE_WEIGHT * (1 + math.log(title_counts[token]))
+            if token in content_counts:
+                weight += CONTENT_WEIGHT * (1 + math.log(content_counts[token]))
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = (array("L"), array("f"))
+            posting[0].append(record.slot)
+            posting[1].append(weight)
+
+    def _compact(self) -> None:
+        """Drop posting entries of removed articles"""
+        postings = {}
+        for token, (slots, weights) in self._postings.items():
+            live = [(slot, weight) for slot, weight in zip(slots, weights) if slot in self._records]
+            if live:
+                postings[token] = (array("L", [slot for slot, _ in live]), array("f", [weight for _, weight in live]))
+        self._postings = postings
+        self._dead = 0
@@ -0,0 +1,1005 @@
+"""
+Query engine shared by both servers
+
+src/server.py (stdio, PyMongo) and server/main.py (FastMCP, AsyncMongoClient)
+serve the same tools, and this module holds everything about how they query
+MongoDB:
+
+- client settings (pool sizes, timeouts) and the collections the tools read
+  (NewsRepository), for either driver
+- the indexes the queries rely on and the explain checks that verify them
+- compiling tool arguments into QueryPlans (filter, projection and sort, or
+  a pipeline) and running them with run_plan() (PyMongo) or run_plan_async()
+  (AsyncMongoClient), with keyset pagination, time budgets, cancellation and
+  partial results
+- the result caches
+
+Plans are compiled in two steps. The parts that depend only on the shape of
+a call are memoized, so repeated calls reuse the same documents: the fields
+and preview length, the sort order and the page size. Values such as the
+date cutoff, the search text or a pagination key are bound per call. The
+memoized documents are shared, so plan contents are read-only.
+
+Each server keeps only its transport-specific parts: how plans are
+scheduled, request coalescing, metrics, the hot store and rendering.
+"""
+
+import os
+import re
+import json
+import asyncio
+import time
+import base64
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import functools
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from bson import json_util
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+from bson.objectid import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
+
+from trends import trend_pipeline
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Connection pool and timeouts, the same for both drivers
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+
+# MongoDB error code raised when $text is used without a text index
+INDEX_NOT_FOUND_CODE = 27
+
+# Indexes the tools rely on, created at startup unless ENSURE_INDEXES=false.
+# Creating an index that already exists with the same spec is a no-op.
+INDEX_MANIFEST = [
+    # fetch_news without a category, substring search
+    IndexModel([("published_date", -1), ("_id", -1)]),
+    # fetch_news / fetch_news_multi with a category
+    IndexModel([("category_key", 1), ("published_date", -1), ("_id", -1)]),
+    # sort_by="relevance" (stdio server)
+    IndexModel([("relevance_score", -1), ("published_date", -1), ("_id", -1)]),
+    IndexModel([("category_key", 1), ("relevance_score", -1), ("published_date", -1), ("_id", -1)]),
+    # search_news
+    IndexModel(
+        [("title", "text"), ("content", "text")],
+        name="news_text", weights={"title": 10, "content": 2}, default_language="english"
+    ),
+]
+
+# Article fields a tool may request, and the ones returned by default
+ARTICLE_FIELDS = ("title", "content", "category", "source", "url", "published_date", "author", "image_url", "tags")
+DEFAULT_FIELDS = ("title", "content", "category", "source", "url", "published_date")
+DEFAULT_PREVIEW_CHARS = 200
+
+# Most categories one fetch_news_multi call may request
+MAX_MULTI_CATEGORIES = 20
+
+# Keyset pagination: every sort order ends with _id so the key is unique, and
+# each has a matching descending index, so a page is an index seek, never a skip
+SORT_KEYS = {
+    "date": ["published_date", "_id"],
+    "relevance": ["relevance_score", "published_date", "_id"],
+    "score": ["score", "published_date", "_id"],
+    # search_news answered by the hot store, whose scores are not textScores
+    "hot_score": ["score", "published_date", "_id"],
+}
+
+# Time budget of a tool call's MongoDB work in milliseconds (0: unlimited).
+# The servers run each call under pymongo.timeout(), so each operation is
+# sent with the remaining budget as maxTimeMS and the budget also bounds the
+# cursor's getMores. QUERY_TIME_BUDGETS overrides it per tool, e.g.
+# "search_news=3000,news_trends=5000".
+QUERY_TIME_BUDGET_MS = int(os.getenv("QUERY_TIME_BUDGET_MS", "10000"))
+QUERY_TIME_BUDGETS = {
+    name.strip(): int(budget_ms)
+    for name, _, budget_ms in (
+        item.partition("=") for item in os.getenv("QUERY_TIME_BUDGETS", "").split(",") if item.strip()
+    )
+}
+# Cursors read with allow_partial fetch small batches, so results arrive
+# while the budget lasts instead of all at once at the end
+PARTIAL_RESULTS_BATCH_SIZE = 10
+
+# Distinct call shapes whose compiled projection, sort and stages are kept
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "512"))
+
+# Result cache for repeated tool calls (e.g. widget refreshes)
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "30"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Share the result cache between the workers of one host (server/serve.py)
+# through a SQLite file on tmpfs instead of keeping one cache per process
+QUERY_CACHE_SHARED = os.getenv("QUERY_CACHE_SHARED", "false").lower() in ("1", "true", "yes")
+QUERY_CACHE_SHARED_PATH = os.getenv(
+    "QUERY_CACHE_SHARED_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "mongodb-news-query-cache.sqlite")
+)
+
+# Cache tags: category_key for category queries, plus these for the rest
+ALL_CATEGORIES_TAG = "*"
+SEARCH_TAG = "search"
+
+# Serialize responses (metrics, cache sizing) with orjson when it is installed
+FAST_JSON = os.getenv("FAST_JSON", "true").lower() in ("1", "true", "yes") and orjson is not None
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a tool result to compact JSON bytes"""
+    if FAST_JSON:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if FAST_JSON else json.loads(data)
+
+
+# Connection
+
+def mongo_uri() -> str:
+    return os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+
+
+def client_options(max_pool_size: Optional[int] = None) -> Dict[str, Any]:
+    """Pool and timeout settings for a MongoClient or AsyncMongoClient"""
+    pool_size = max(1, max_pool_size or MONGODB_MAX_POOL_SIZE)
+    return {
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "maxPoolSize": pool_size,
+        "minPoolSize": min(MONGODB_MIN_POOL_SIZE, pool_size),
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+    }
+
+
+class NewsRepository:
+    """
+    The collections the tools read, on one client of either driver.
+
+    articles is the news collection read with codec_options when given (the
+    HTTP server decodes ids and dates straight to strings), else news itself.
+    """
+
+    def __init__(self, client: Any, codec_options: Optional[CodecOptions] = None):
+        self.client = client
+        self.db = client[os.getenv("MONGODB_DATABASE", "news_db")]
+        self.news = self.db[os.getenv("MONGODB_COLLECTION", "news")]
+        self.articles = self.news.with_options(codec_options=codec_options) if codec_options else self.news
+        self.category_stats = self.db[os.getenv("MONGODB_CATEGORY_STATS_COLLECTION", "category_stats")]
+        # Trend rollups by unit ("hour", "day"), maintained by scripts/news_rollups.py
+        self.rollups = {
+            "hour": self.db[os.getenv("MONGODB_ROLLUP_HOURLY_COLLECTION", "news_rollups_hourly")],
+            "day": self.db[os.getenv("MONGODB_ROLLUP_DAILY_COLLECTION", "news_rollups_daily")],
+        }
+
+
+class _ObjectIdAsString(TypeDecoder):
+    bson_type = ObjectId
+
+    def transform_bson(self, value: ObjectId) -> str:
+        return str(value)
+
+
+class _DatetimeAsISOString(TypeDecoder):
+    bson_type = datetime
+
+    def transform_bson(self, value: datetime) -> str:
+        return value.isoformat()
+
+
+# Article reads decode _id and dates straight to JSON-ready strings while the
+# BSON is parsed, so results need no second pass before they are returned
+ARTICLE_CODEC_OPTIONS = CodecOptions(
+    type_registry=TypeRegistry([_ObjectIdAsString(), _DatetimeAsISOString()])
+)
+
+
+# Arguments
+
+def tool_time_budget(name: str) -> Optional[float]:
+    """Seconds a tool call's MongoDB work may take, or None for no limit"""
+    budget_ms = QUERY_TIME_BUDGETS.get(name, QUERY_TIME_BUDGET_MS)
+    return budget_ms / 1000 if budget_ms > 0 else None
+
+
+def normalize_category(category: str) -> str:
+    """Normalize a category name to the indexed category_key form"""
+    return category.strip().lower()
+
+
+def trend_keys(dimension: str, values: Optional[List[str]]) -> List[str]:
+    """The series news_trends was asked for, as rollup keys"""
+    if dimension == "category":
+        return sorted({normalize_category(value) for value in values or []})
+    return sorted(set(values or []))
+
+
+def date_cutoff(days_back: Optional[int]) -> Optional[datetime]:
+    """Start of the last days_back days, or None for no limit"""
+    return datetime.now() - timedelta(days=days_back) if days_back else None
+
+
+def substring_filter(query_text: str, cutoff_date: Optional[datetime] = None) -> Dict[str, Any]:
+    """Match the literal query anywhere in title or content"""
+    pattern = re.escape(query_text)
+    match: Dict[str, Any] = {
+        "$or": [
+            {"title": {"$regex": pattern, "$options": "i"}},
+            {"content": {"$regex": pattern, "$options": "i"}}
+        ]
+    }
+    if cutoff_date is not None:
+        match["published_date"] = {"$gte": cutoff_date}
+    return match
+
+
+def selected_fields(fields: Optional[List[str]] = None) -> List[str]:
+    """The known article fields among those requested, or the defaults"""
+    selected = [field for field in (fields or DEFAULT_FIELDS) if field in ARTICLE_FIELDS]
+    return selected or list(DEFAULT_FIELDS)
+
+
+def build_projection(fields: Optional[List[str]] = None, preview_chars: int = DEFAULT_PREVIEW_CHARS) -> Dict[str, Any]:
+    """
+    Projection returning only the requested article fields (memoized, read-only).
+
+    content is cut to preview_chars code points by MongoDB itself ($substrCP)
+    and flagged with content_truncated, so full article bodies never cross
+    the wire; preview_chars=0 keeps it whole.
+    """
+    return _projection(tuple(fields or ()), preview_chars)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _projection(fields: Tuple[str, ...], preview_chars: int) -> Dict[str, Any]:
+    projection: Dict[str, Any] = {field: 1 for field in selected_fields(list(fields))}
+    if "content" in projection and preview_chars > 0:
+        content = {"$ifNull": ["$content", ""]}
+        projection["content"] = {"$substrCP": [content, 0, preview_chars]}
+        projection["content_truncated"] = {"$gt": [{"$strLenCP": content}, preview_chars]}
+    return projection
+
+
+# Pagination
+
+def encode_cursor(sort_key: str, values: List[Any]) -> str:
+    """Encode the sort key values of the last returned article as an opaque token"""
+    payload = json_util.dumps({"s": sort_key, "v": values})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, List[Any]]:
+    """Decode a pagination token into (sort key name, values)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded))
+        sort_key, values = payload["s"], payload["v"]
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+    if sort_key not in SORT_KEYS or len(values) != len(SORT_KEYS[sort_key]):
+        raise ValueError("Invalid pagination cursor")
+    return sort_key, values
+
+
+def keyset_filter(fields: List[str], values: List[Any]) -> Dict[str, Any]:
+    """Match articles strictly after the given key in a descending sort on fields"""
+    branches = []
+    for idx, field in enumerate(fields):
+        branch = dict(zip(fields[:idx], values[:idx]))
+        branch[field] = {"$lt": values[idx]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def sort_value(field: str, value: Any) -> Any:
+    """Restore the BSON type of a sort key value decoded with ARTICLE_CODEC_OPTIONS"""
+    if field == "_id" and isinstance(value, str):
+        return ObjectId(value)
+    if field == "published_date" and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def paginate(
+    articles: List[Dict[str, Any]], limit: int, sort_key: str, partial: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Trim a limit+1 result to a page and build the cursor for the next one.
+    A partial page (cut short by the time budget) continues after its last article.
+    """
+    if len(articles) <= limit and not (partial and articles):
+        return articles, None
+
+    page = articles[:limit]
+    last = page[-1]
+    return page, encode_cursor(sort_key, [sort_value(field, last.get(field)) for field in SORT_KEYS[sort_key]])
+
+
+# Query plans
+
+class QueryPlan:
+    """
+    One MongoDB query compiled from tool arguments, independent of the driver.
+
+    kind "find" uses filter, projection, sort and limit; kind "aggregate"
+    uses pipeline. Paged plans know their sort key and page size, so page()
+    turns what they read into (articles, next_cursor).
+    """
+
+    __slots__ = ("kind", "filter", "projection", "sort", "limit", "pipeline",
+                 "sort_key", "page_size", "allow_partial")
+
+    def __init__(self, kind: str, filter: Optional[Dict[str, Any]] = None,
+                 projection: Optional[Dict[str, Any]] = None, sort: Optional[List[Tuple[str, int]]] = None,
+                 limit: int = 0, pipeline: Optional[List[Dict[str, Any]]] = None,
+                 sort_key: Optional[str] = None, page_size: int = 0, allow_partial: bool = False):
+        self.kind = kind
+        self.filter = filter or {}
+        self.projection = projection
+        self.sort = sort
+        self.limit = limit
+        self.pipeline = pipeline
+        self.sort_key = sort_key
+        self.page_size = page_size
+        self.allow_partial = allow_partial
+
+    @property
+    def batch_size(self) -> int:
+        return PARTIAL_RESULTS_BATCH_SIZE if self.allow_partial else 0
+
+    def page(self, documents: List[Dict[str, Any]],
+             partial: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return paginate(documents, self.page_size, self.sort_key, partial)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _page_shape(sort_key: str, fields: Tuple[str, ...],
+                preview_chars: int) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """Projection (with the sort key fields, needed for the next cursor) and sort of a paged find"""
+    sort_fields = SORT_KEYS[sort_key]
+    projection = _projection(fields, preview_chars)
+    projection = {**projection, **{field: 1 for field in sort_fields if field not in projection}}
+    return projection, [(field, -1) for field in sort_fields]
+
+
+def page_plan(query: Dict[str, Any], sort_key: str, limit: int, fields: Optional[List[str]] = None,
+              preview_chars: int = DEFAULT_PREVIEW_CHARS, after: Optional[List[Any]] = None,
+              allow_partial: bool = False) -> QueryPlan:
+    """One newest-first (or relevance-first) keyset page of a find"""
+    if after is not None:
+        query = {"$and": [query, keyset_filter(SORT_KEYS[sort_key], after)]}
+    projection, sort = _page_shape(sort_key, tuple(fields or ()), preview_chars)
+    return QueryPlan("find", query, projection, sort, limit + 1,
+                     sort_key=sort_key, page_size=limit, allow_partial=allow_partial)
+
+
+def fetch_news_plan(category_key: Optional[str], cutoff_date: datetime, sort_key: str, limit: int,
+                    fields: Optional[List[str]] = None, preview_chars: int = DEFAULT_PREVIEW_CHARS,
+                    after: Optional[List[Any]] = None) -> QueryPlan:
+    """
+    fetch_news: exact match on the normalized category_key, so the
+    (category_key, published_date) or (category_key, relevance_score) index is used
+    """
+    query: Dict[str, Any] = {}
+    if category_key:
+        query["category_key"] = category_key
+    query["published_date"] = {"$gte": cutoff_date}
+    return page_plan(query, sort_key, limit, fields, preview_chars, after)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _text_search_tail(limit: int, fields: Tuple[str, ...], preview_chars: int) -> Tuple[Dict[str, Any], ...]:
+    return (
+        {"$sort": {field: -1 for field in SORT_KEYS["score"]}},
+        {"$limit": limit + 1},
+        {"$project": {**_projection(fields, preview_chars), "score": 1, "published_date": 1}},
+    )
+
+
+def text_search_plan(query_text: str, limit: int, fields: Optional[List[str]] = None,
+                     preview_chars: int = DEFAULT_PREVIEW_CHARS, after: Optional[List[Any]] = None,
+                     cutoff_date: Optional[datetime] = None, allow_partial: bool = False) -> QueryPlan:
+    """
+    One page of ranked full-text search.
+
+    Uses the title/content text index; $text understands "quoted phrases"
+    and -negated terms natively. textScore is materialized as "score" so the
+    keyset filter can compare against it. Ranking sorts every match before
+    the first result, so a search that runs out of budget has usually
+    gathered nothing.
+    """
+    match: Dict[str, Any] = {"$text": {"$search": query_text}}
+    if cutoff_date is not None:
+        match["published_date"] = {"$gte": cutoff_date}
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after is not None:
+        pipeline.append({"$match": keyset_filter(SORT_KEYS["score"], after)})
+    pipeline += _text_search_tail(limit, tuple(fields or ()), preview_chars)
+    return QueryPlan("aggregate", pipeline=pipeline, sort_key="score", page_size=limit, allow_partial=allow_partial)
+
+
+def substring_search_plan(query_text: str, limit: int, fields: Optional[List[str]] = None,
+                          preview_chars: int = DEFAULT_PREVIEW_CHARS, after: Optional[List[Any]] = None,
+                          cutoff_date: Optional[datetime] = None, allow_partial: bool = False) -> QueryPlan:
+    """One newest-first page of articles containing the literal query"""
+    return page_plan(substring_filter(query_text, cutoff_date), "date", limit, fields, preview_chars,
+                     after, allow_partial)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _category_branch_tail(per_category: int, fields: Tuple[str, ...], preview_chars: int) -> Tuple[Dict[str, Any], ...]:
+    return (
+        {"$sort": {"published_date": -1, "_id": -1}},
+        {"$limit": per_category},
+        {"$project": {**_projection(fields, preview_chars), "category_key": 1}},
+    )
+
+
+def multi_category_plan(collection_name: str, category_keys: List[str], cutoff_date: datetime,
+                        per_category: int, fields: Optional[List[str]] = None,
+                        preview_chars: int = DEFAULT_PREVIEW_CHARS) -> QueryPlan:
+    """
+    The newest per_category articles of each category in one aggregation.
+
+    Each category is its own $match/$sort/$limit branch, chained with
+    $unionWith, so every branch is a bounded scan of the
+    (category_key, published_date) index. Read with group_by_category().
+    """
+    tail = list(_category_branch_tail(per_category, tuple(fields or ()), preview_chars))
+    branches = [
+        [{"$match": {"category_key": key, "published_date": {"$gte": cutoff_date}}}] + tail
+        for key in category_keys
+    ]
+    pipeline = branches[0] + [
+        {"$unionWith": {"coll": collection_name, "pipeline": branch}}
+        for branch in branches[1:]
+    ]
+    return QueryPlan("aggregate", pipeline=pipeline)
+
+
+def group_by_category(articles: List[Dict[str, Any]], category_keys: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """{category_key: [articles]} from the rows of a multi_category_plan"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {key: [] for key in category_keys}
+    for article in articles:
+        grouped[article.pop("category_key")].append(article)
+    return grouped
+
+
+def semantic_candidates(index: Any, query_text: str, limit: int, category_key: Optional[str],
+                        nprobe: int) -> Dict[ObjectId, float]:
+    """
+    Ids of the articles nearest to the query in the semantic index, with
+    their similarity, best first. CPU-bound: call it off the event loop.
+    """
+    query_vector = index.model.embed(query_text)
+    if not query_vector.any():
+        return {}
+    # Over-fetch when filtering by category so the page can still be filled
+    ids, scores = index.search(query_vector, limit * 5 if category_key else limit, nprobe)
+    similarity: Dict[ObjectId, float] = {}
+    for id_bytes, score in zip(ids, scores):
+        similarity.setdefault(ObjectId(id_bytes), score)
+    return similarity
+
+
+def articles_by_id_plan(ids: List[ObjectId], category_key: Optional[str], fields: Optional[List[str]] = None,
+                        preview_chars: int = DEFAULT_PREVIEW_CHARS) -> QueryPlan:
+    """The given articles, optionally only those in one category"""
+    query: Dict[str, Any] = {"_id": {"$in": ids}}
+    if category_key:
+        query["category_key"] = category_key
+    return QueryPlan("find", query, build_projection(fields, preview_chars))
+
+
+def rank_by_similarity(similarity: Dict[ObjectId, float], articles: List[Dict[str, Any]],
+                       limit: int) -> List[Dict[str, Any]]:
+    """Order fetched articles by similarity, each with its "similarity" score"""
+    # _id is an ObjectId or, read with ARTICLE_CODEC_OPTIONS, its string
+    found = {str(article["_id"]): article for article in articles}
+    ranked = []
+    for article_id, score in similarity.items():
+        article = found.get(str(article_id))
+        if article is not None:
+            ranked.append({**article, "similarity": round(score, 4)})
+    return ranked[:limit]
+
+
+# Materialized per-category counts: O(#categories), no collection scan
+CATEGORY_STATS_PLAN = QueryPlan("find", sort=[("count", -1), ("_id", 1)])
+
+# category_stats not built yet (run scripts/category_stats.py): count by scanning
+CATEGORY_SCAN_PLAN = QueryPlan("aggregate", pipeline=[
+    {"$group": {"_id": "$category", "name": {"$first": "$category"}, "count": {"$sum": 1}}},
+    {"$sort": {"count": -1, "_id": 1}},
+])
+
+
+def trends_plan(dimension: str, keys: List[str], interval: str, bin_size: int,
+                previous_start: datetime, start: datetime, end: datetime) -> QueryPlan:
+    """news_trends over the rollup collection of rollup_unit(interval)"""
+    return QueryPlan("aggregate", pipeline=trend_pipeline(
+        dimension, keys, interval, bin_size, previous_start, start, end
+    ))
+
+
+_MEMOIZED_PARTS = (_projection, _page_shape, _text_search_tail, _category_branch_tail)
+
+
+def plan_cache_info() -> Dict[str, Any]:
+    """Hits and misses of the memoized plan parts"""
+    return {cached.__name__.lstrip("_"): cached.cache_info()._asdict() for cached in _MEMOIZED_PARTS}
+
+
+def clear_plan_cache() -> None:
+    for cached in _MEMOIZED_PARTS:
+        cached.cache_clear()
+
+
+# Running plans
+
+# Set by the stdio server when the tool call waiting for an executor thread
+# is cancelled; read_cursor() then stops and kills the cursor
+query_cancelled: ContextVar[Optional[threading.Event]] = ContextVar("query_cancelled", default=None)
+
+
+def read_cursor(cursor: Any, length: Optional[int] = None,
+                allow_partial: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Read a PyMongo cursor; returns (documents, partial).
+
+    The cursor is always closed. If the tool call is cancelled meanwhile
+    (query_cancelled), reading stops, so the server-side cursor is killed
+    instead of left open. With allow_partial, running out of the time budget
+    returns the documents read so far, with partial True, instead of raising.
+    """
+    cancelled = query_cancelled.get()
+    documents = []
+    try:
+        for document in cursor:
+            if cancelled is not None and cancelled.is_set():
+                # Nobody is waiting for the result any more
+                break
+            documents.append(document)
+            if length is not None and len(documents) >= length:
+                break
+    except PyMongoError as e:
+        if not (allow_partial and e.timeout):
+            raise
+        return documents, True
+    finally:
+        cursor.close()
+    return documents, False
+
+
+# Cursor closes still running after their caller was cancelled
+_closing_cursors: set = set()
+
+
+def _closed(close: "asyncio.Task") -> None:
+    _closing_cursors.discard(close)
+    # A failed close leaves the cursor to time out on the server; nothing to report
+    if not close.cancelled():
+        close.exception()
+
+
+async def _close_cursor(cursor: Any) -> None:
+    """
+    Close a cursor even while the caller is being cancelled.
+
+    MCP cancels a request through an anyio cancel scope, which cancels every
+    await inside it again until the scope exits, so awaiting close() directly
+    would be cancelled at its first await and leave the server-side cursor
+    open. The close runs as a task of its own instead: the caller waits for
+    it unless cancelled, in which case it still runs to completion.
+    """
+    close = asyncio.ensure_future(cursor.close())
+    _closing_cursors.add(close)
+    close.add_done_callback(_closed)
+    try:
+        await asyncio.shield(close)
+    except PyMongoError:
+        pass
+
+
+async def read_cursor_async(cursor: Any, length: Optional[int] = None,
+                            allow_partial: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    read_cursor() for AsyncMongoClient cursors. Cancelling the awaiting task
+    (an MCP cancellation, or every coalesced caller gone) closes the cursor.
+    """
+    try:
+        if not allow_partial:
+            return await cursor.to_list(length), False
+        documents: List[Dict[str, Any]] = []
+        try:
+            async for document in cursor:
+                documents.append(document)
+                if length is not None and len(documents) >= length:
+                    break
+        except PyMongoError as e:
+            if not e.timeout:
+                raise
+            return documents, True
+        return documents, False
+    finally:
+        await _close_cursor(cursor)
+
+
+def _find_cursor(collection: Any, plan: QueryPlan) -> Any:
+    cursor = collection.find(plan.filter, plan.projection)
+    if plan.sort:
+        cursor = cursor.sort(plan.sort)
+    if plan.limit:
+        cursor = cursor.limit(plan.limit)
+    if plan.batch_size:
+        cursor = cursor.batch_size(plan.batch_size)
+    return cursor
+
+
+def _aggregate_options(plan: QueryPlan) -> Dict[str, Any]:
+    return {"batchSize": plan.batch_size} if plan.batch_size else {}
+
+
+def run_plan(collection: Any, plan: QueryPlan) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run a plan with PyMongo (blocking); returns (documents, partial)"""
+    if plan.kind == "find":
+        cursor = _find_cursor(collection, plan)
+    else:
+        cursor = collection.aggregate(plan.pipeline, **_aggregate_options(plan))
+    return read_cursor(cursor, plan.limit or None, plan.allow_partial)
+
+
+async def run_plan_async(collection: Any, plan: QueryPlan) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run a plan with AsyncMongoClient; returns (documents, partial)"""
+    if plan.kind == "find":
+        cursor = _find_cursor(collection, plan)
+    else:
+        cursor = await collection.aggregate(plan.pipeline, **_aggregate_options(plan))
+    return await read_cursor_async(cursor, plan.limit or None, plan.allow_partial)
+
+
+# Index self-check
+
+def plan_stages(explain: Dict[str, Any]) -> set:
+    """Stage names in every winning plan of an explain result (classic and SBE layouts)"""
+    stages = set()
+
+    def walk(node: Any, in_plan: bool) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "stage" and in_plan and isinstance(value, str):
+                    stages.add(value)
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+def plan_checks(collection_name: str) -> List[Tuple[str, Dict[str, Any], bool]]:
+    """(name, explainable command, in-memory sort allowed) for each tool query shape"""
+    cutoff_date = datetime.now() - timedelta(days=7)
+    checks = []
+    for name, category_key, sort_key in (
+        ("fetch_news", None, "date"),
+        ("fetch_news(category)", "technology", "date"),
+        ("fetch_news(relevance)", None, "relevance"),
+        ("fetch_news(category, relevance)", "technology", "relevance"),
+    ):
+        plan = fetch_news_plan(category_key, cutoff_date, sort_key, 10)
+        checks.append((name, {
+            "find": collection_name, "filter": plan.filter, "sort": dict(plan.sort), "limit": plan.limit
+        }, False))
+    # textScore is not indexable, so ranking always sorts the matches in memory
+    plan = text_search_plan("news", 10)
+    checks.append(("search_news", {"aggregate": collection_name, "pipeline": plan.pipeline, "cursor": {}}, True))
+    return checks
+
+
+# Result caches
+
+class _AsyncCacheMethods:
+    """Awaitable versions of a result cache's methods, for the event loop"""
+
+    # Whether the methods do blocking I/O and must run on a worker thread
+    blocking = False
+
+    async def _call(self, method, *args) -> Any:
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get_async(self, key: Hashable) -> Optional[Any]:
+        return await self._call(self.get, key)
+
+    async def set_async(self, key: Hashable, value: Any, tags: FrozenSet[str]) -> None:
+        await self._call(self.set, key, value, tags)
+
+    async def invalidate_async(self, tags: FrozenSet[str]) -> int:
+        return await self._call(self.invalidate, tags)
+
+    async def clear_async(self) -> None:
+        await self._call(self.clear)
+
+    async def stats_async(self) -> Dict[str, Any]:
+        return await self._call(self.stats)
+
+
+class QueryCache(_AsyncCacheMethods):
+    """
+    In-process LRU cache of tool results with TTL expiry and a memory cap.
+
+    Entries are keyed by the normalized tool arguments and tagged with the
+    category keys they depend on, so a change to one category only evicts
+    the entries that could contain it.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size, tags, value), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, FrozenSet[str], Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value, or None on a miss or expired entry"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[3]
+
+    def set(self, key: Hashable, value: Any, tags: FrozenSet[str]) -> None:
+        """Store a value, evicting least recently used entries to stay within limits"""
+        if not self.enabled:
+            return
+
+        size = len(dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, tags, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tags: FrozenSet[str]) -> int:
+        """Drop every entry tagged with any of the given tags"""
+        stale = [key for key, entry in self._entries.items() if entry[2] & tags]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
+
+
+class SharedQueryCache(_AsyncCacheMethods):
+    """
+    Result cache shared by every worker on the host, with QueryCache's interface.
+
+    Entries live in a SQLite database in WAL mode on tmpfs, so a result one
+    worker loaded from MongoDB serves the others, and an invalidation seen by
+    any worker evicts it for all. Values are stored as JSON (tuples come back
+    as lists). When over its limits the cache drops the entries closest to
+    expiry rather than the least recently used. Hit and miss counts are per
+    worker; entries and bytes are for the whole host.
+
+    SQLite calls block (up to the busy timeout while another worker writes),
+    so on the event loop use the *_async methods, which run them on a thread
+    with a connection of its own. A failing cache is logged and treated as
+    empty: it only costs a MongoDB round trip.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._counts_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # One connection per thread, opened on first use, i.e. in the worker
+        # process, never before a fork
+        connection = getattr(self._local, "db", None)
+        if connection is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            os.close(fd)
+            connection = sqlite3.connect(self.path, timeout=0.5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, size INTEGER NOT NULL, value BLOB NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tags "
+                "(key TEXT NOT NULL REFERENCES entries(key) ON DELETE CASCADE, tag TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag)")
+            connection.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+            self._local.db = connection
+        return connection
+
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        # Keys are tuples of strings, numbers and datetimes, whose repr is the same in every process
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counts_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value, or None on a miss or expired entry"""
+        try:
+            row = self.db.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at >= ?", (self._digest(key), time.time())
+            ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared query cache read failed: {e}")
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return loads(row[0])
+
+    def set(self, key: Hashable, value: Any, tags: FrozenSet[str]) -> None:
+        """Store a value, dropping expired and then soonest-expiring entries to stay within limits"""
+        if not self.enabled:
+            return
+
+        data = dumps(value)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            self._store(self._digest(key), data, tags)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared query cache write failed: {e}")
+
+    def _store(self, digest: str, data: bytes, tags: FrozenSet[str]) -> None:
+        now = time.time()
+        db = self.db
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM entries WHERE key = ? OR expires_at < ?", (digest, now))
+            db.execute(
+                "INSERT INTO entries (key, expires_at, size, value) VALUES (?, ?, ?, ?)",
+                (digest, now + self.ttl_seconds, len(data), data)
+            )
+            db.executemany("INSERT INTO tags (key, tag) VALUES (?, ?)", [(digest, tag) for tag in tags])
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            while count > self.max_entries or total > self.max_bytes:
+                oldest, size = db.execute(
+                    "SELECT key, size FROM entries ORDER BY expires_at LIMIT 1"
+                ).fetchone()
+                db.execute("DELETE FROM entries WHERE key = ?", (oldest,))
+                count -= 1
+                total -= size
+                self._count("evictions")
+
+    def invalidate(self, tags: FrozenSet[str]) -> int:
+        """Drop every entry tagged with any of the given tags"""
+        if not tags:
+            return 0
+        placeholders = ", ".join("?" * len(tags))
+        try:
+            removed = self.db.execute(
+                f"DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag IN ({placeholders}))",
+                tuple(tags)
+            ).rowcount
+        except (sqlite3.Error, OSError) as e:
+            # Entries that could not be dropped still expire with their TTL
+            logger.warning(f"Shared query cache invalidation failed: {e}")
+            return 0
+        self._count("invalidations", removed)
+        return removed
+
+    def clear(self) -> None:
+        try:
+            removed = self.db.execute("DELETE FROM entries").rowcount
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared query cache clear failed: {e}")
+            return
+        self._count("invalidations", removed)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        try:
+            count, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared query cache stats failed: {e}")
+            count = total = None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": count,
+            "bytes": total,
+            "shared": self.path,
+        }
+
+
+def make_query_cache(shared: bool = QUERY_CACHE_SHARED) -> Any:
+    """A result cache with the configured limits, shared between the workers of a host or in-process"""
+    if shared:
+        return SharedQueryCache(
+            QUERY_CACHE_SHARED_PATH, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES
+        )
+    return QueryCache(QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES)
@@ -0,0 +1,359 @@
+"""
+CPU-only semantic search over news articles
+
+Articles are embedded with latent semantic analysis (LSA): IDF-weighted,
+hashed unigram and bigram counts are projected onto a truncated SVD basis
+fitted on the corpus. Terms that occur in similar articles ("chip maker",
+"semiconductor company") end up close together in the reduced space, so
+paraphrases match without a neural model or network access.
+
+Unit vectors are served from an IVF (inverted file) index. k-means
+centroids partition the vectors into lists, and a query only scores the
+lists whose centroids are nearest to it. The index directory holds:
+
+    meta.json       dimensions, row counts and the newest indexed _id
+    model.npz       IDF weights and SVD basis of the embedding model
+    centroids.npy   one unit centroid per list
+    offsets.npy     first row of each list in vectors.f32 (nlist + 1 entries)
+    vectors.f32     float32 vectors, grouped by list, then an unclustered tail
+    ids.bin         12-byte article ObjectIds, in the same row order
+
+vectors.f32 and ids.bin are memory-mapped, so opening a 1M-article index is
+instant and pages are shared between processes. Appended rows (the tail)
+and rows added at runtime are assigned to their nearest list in memory.
+They are searched with the list they belong to until the next full rebuild.
+"""
+
+import os
+import re
+import json
+import zlib
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his in into is it its "
+    "of on or our said she that the their they this to was were which will with".split()
+)
+
+DEFAULT_HASH_DIM = 1 << 16
+DEFAULT_DIM = 256
+ID_BYTES = 12
+
+
+def article_text(article: dict) -> str:
+    """Text embedded for an article; the title is repeated to weigh it above the body"""
+    title = article.get("title") or ""
+    return f"{title} {title} {title} {article.get('content') or ''}"
+
+
+def hashed_counts(text: str, hash_dim: int) -> tuple:
+    """(bucket indices, counts) of the unigrams and bigrams of text, hashed into hash_dim buckets"""
+    words = [word for word in TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not terms:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    # crc32, unlike hash(), is stable across processes
+    buckets = np.fromiter((zlib.crc32(term.encode()) for term in terms), dtype=np.int64, count=len(terms))
+    indices, counts = np.unique(buckets % hash_dim, return_counts=True)
+    return indices, counts.astype(np.float64)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _sparse_dot(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_out: int,
+                matrix: np.ndarray) -> np.ndarray:
+    """Dense product of a COO sparse matrix (entries at [rows, cols]) with matrix"""
+    columns = np.ascontiguousarray(matrix.T)
+    out = np.empty((n_out, matrix.shape[1]))
+    for j, column in enumerate(columns):
+        out[:, j] = np.bincount(rows, weights=values * column[cols], minlength=n_out)
+    return out
+
+
+def _svd_basis(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_docs: int,
+               hash_dim: int, dim: int, power_iterations: int, rng) -> np.ndarray:
+    """Top dim right singular vectors of the document-term matrix, by randomized SVD"""
+    width = min(dim + 10, n_docs, hash_dim)
+    q, _ = np.linalg.qr(_sparse_dot(rows, cols, values, n_docs, rng.standard_normal((hash_dim, width))))
+    for _ in range(power_iterations):
+        q, _ = np.linalg.qr(_sparse_dot(cols, rows, values, hash_dim, q))
+        q, _ = np.linalg.qr(_sparse_dot(rows, cols, values, n_docs, q))
+    # B = Q^T A, computed as (A^T Q)^T; its right singular vectors are A's
+    _, _, vt = np.linalg.svd(_sparse_dot(cols, rows, values, hash_dim, q).T, full_matrices=False)
+    return vt[:dim].T.astype(np.float32)
+
+
+class EmbeddingModel:
+    """Hashed TF-IDF followed by a fixed LSA projection"""
+
+    def __init__(self, idf: np.ndarray, basis: np.ndarray):
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.basis = np.ascontiguousarray(basis, dtype=np.float32)
+
+    @property
+    def hash_dim(self) -> int:
+        return len(self.idf)
+
+    @property
+    def dim(self) -> int:
+        return self.basis.shape[1]
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit vector for text; all zeros if it has no known terms"""
+        indices, counts = hashed_counts(text, self.hash_dim)
+        if not len(indices):
+            return np.zeros(self.dim, dtype=np.float32)
+        weights = ((1 + np.log(counts)) * self.idf[indices]).astype(np.float32)
+        return normalize_rows(weights @ self.basis[indices])
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        vectors = [self.embed(text) for text in texts]
+        return np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, idf=self.idf, basis=self.basis)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingModel":
+        with np.load(path) as data:
+            return cls(data["idf"], data["basis"])
+
+    @classmethod
+    def fit(cls, texts: Iterable[str], hash_dim: int = DEFAULT_HASH_DIM, dim: int = DEFAULT_DIM,
+            power_iterations: int = 2, seed: int = 0) -> "EmbeddingModel":
+        """Fit IDF weights and the SVD basis on a sample of article texts"""
+        rows, cols, counts = [], [], []
+        n_docs = 0
+        for n_docs, text in enumerate(texts, 1):
+            indices, term_counts = hashed_counts(text, hash_dim)
+            rows.append(np.full(len(indices), n_docs - 1, dtype=np.int64))
+            cols.append(indices)
+            counts.append(term_counts)
+        if not n_docs:
+            raise ValueError("cannot fit an embedding model without articles")
+        rows, cols, counts = np.concatenate(rows), np.concatenate(cols), np.concatenate(counts)
+
+        document_frequency = np.bincount(cols, minlength=hash_dim)
+        idf = np.log((1 + n_docs) / (1 + document_frequency)) + 1
+        values = (1 + np.log(counts)) * idf[cols]
+        values /= np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n_docs))[rows]
+
+        rng = np.random.default_rng(seed)
+        basis = _svd_basis(rows, cols, values, n_docs, hash_dim, dim, power_iterations, rng)
+        return cls(idf, basis)
+
+
+def article_vectors(model: EmbeddingModel, articles: list) -> tuple:
+    """
+    (ids as n x 12 uint8, vectors) for articles with ObjectId _ids, reusing the
+    stored "embedding" of an article when it has the model's dimension
+    """
+    ids = np.frombuffer(b"".join(article["_id"].binary for article in articles), dtype=np.uint8)
+    vectors = np.empty((len(articles), model.dim), dtype=np.float32)
+    for row, article in enumerate(articles):
+        stored = article.get("embedding")
+        if stored is not None and len(stored) == model.dim * 4:
+            vectors[row] = np.frombuffer(stored, dtype="<f4")
+        else:
+            vectors[row] = model.embed(article_text(article))
+    return ids.reshape(-1, ID_BYTES), vectors
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_rows: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid (by inner product) for each vector"""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_rows):
+        lists[start:start + chunk_rows] = np.argmax(vectors[start:start + chunk_rows] @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10,
+                    sample_size: int = 100_000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), sample_size), replace=False))])
+    nlist = max(1, min(nlist, len(sample)))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+
+    for _ in range(iterations):
+        lists = assign_lists(sample, centroids)
+        order = np.argsort(lists, kind="stable")
+        present, starts = np.unique(lists[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(sample[order], starts)
+        # Re-seed lists that lost all their vectors
+        empty = np.setdiff1d(np.arange(nlist), present)
+        sums[empty] = sample[rng.choice(len(sample), len(empty))]
+        centroids = normalize_rows(sums)
+    return centroids.astype(np.float32)
+
+
+def _replace_file(path: str, write) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    _replace_file(os.path.join(path, "meta.json"), lambda f: f.write(json.dumps(meta).encode()))
+
+
+def write_index(path: str, model: EmbeddingModel, ids: np.ndarray, vectors: np.ndarray,
+                nlist: int, seed: int = 0, chunk_rows: int = 65536) -> dict:
+    """
+    Write a complete index for ids (n x 12 uint8) and unit vectors (n x dim,
+    may be a memmap), replacing any index at path. Returns its metadata.
+    """
+    count = len(ids)
+    if not count:
+        raise ValueError("cannot build an index without vectors")
+    os.makedirs(path, exist_ok=True)
+    centroids = train_centroids(vectors, nlist, seed=seed)
+    lists = assign_lists(vectors, centroids)
+    order = np.argsort(lists, kind="stable")
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(lists, minlength=len(centroids)))
+
+    def write_rows(source):
+        def write(f):
+            for start in range(0, count, chunk_rows):
+                f.write(np.ascontiguousarray(source[order[start:start + chunk_rows]]).tobytes())
+        return write
+
+    _replace_file(os.path.join(path, "vectors.f32"), write_rows(vectors))
+    _replace_file(os.path.join(path, "ids.bin"), write_rows(ids))
+    _replace_file(os.path.join(path, "centroids.npy"), lambda f: np.save(f, centroids))
+    _replace_file(os.path.join(path, "offsets.npy"), lambda f: np.save(f, offsets))
+    _replace_file(os.path.join(path, "model.npz"), lambda f: np.savez(f, idf=model.idf, basis=model.basis))
+
+    meta = {
+        "dim": model.dim,
+        "nlist": len(centroids),
+        "main_count": count,
+        "count": count,
+        "last_id": max((bytes(row) for row in ids), default=b"").hex(),
+    }
+    # meta.json last: readers never see counts for rows that are not written yet
+    _write_meta(path, meta)
+    return meta
+
+
+def append_to_index(path: str, ids: np.ndarray, vectors: np.ndarray) -> dict:
+    """Append rows to the unclustered tail of an index on disk; returns its metadata"""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if not len(ids):
+        return meta
+    with open(os.path.join(path, "vectors.f32"), "ab") as f:
+        f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    with open(os.path.join(path, "ids.bin"), "ab") as f:
+        f.write(np.ascontiguousarray(ids, dtype=np.uint8).tobytes())
+    meta["count"] += len(ids)
+    meta["last_id"] = max(bytes.fromhex(meta["last_id"]), *(bytes(row) for row in ids)).hex()
+    _write_meta(path, meta)
+    return meta
+
+
+class VectorIndex:
+    """Memory-mapped IVF index; search and add are safe to call from several threads"""
+
+    def __init__(self, model: EmbeddingModel, centroids: np.ndarray, offsets: np.ndarray,
+                 vectors: np.ndarray, ids: np.ndarray, last_id: bytes = b""):
+        self.model = model
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.ids = ids
+        self.last_id = last_id
+        # Rows added after the last build: (vectors, ids, list of each row), swapped as a unit
+        self._extra = (
+            np.zeros((0, model.dim), dtype=np.float32),
+            np.zeros((0, ID_BYTES), dtype=np.uint8),
+            np.zeros(0, dtype=np.int32),
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        dim, main_count, count = meta["dim"], meta["main_count"], meta["count"]
+        if count:
+            vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+            ids = np.memmap(os.path.join(path, "ids.bin"), dtype=np.uint8, mode="r", shape=(count, ID_BYTES))
+        else:
+            vectors = np.zeros((0, dim), dtype=np.float32)
+            ids = np.zeros((0, ID_BYTES), dtype=np.uint8)
+
+        index = cls(
+            EmbeddingModel.load(os.path.join(path, "model.npz")),
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            vectors[:main_count],
+            ids[:main_count],
+            bytes.fromhex(meta["last_id"]),
+        )
+        index.add(np.asarray(ids[main_count:]), np.asarray(vectors[main_count:]))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self._extra[1])
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add rows (ids as n x 12 uint8, unit vectors as n x dim) to the in-memory tail"""
+        if not len(ids):
+            return
+        lists = assign_lists(vectors, self.centroids)
+        newest = max(bytes(row) for row in ids)
+        with self._lock:
+            extra_vectors, extra_ids, extra_lists = self._extra
+            self._extra = (
+                np.concatenate([extra_vectors, vectors.astype(np.float32)]),
+                np.concatenate([extra_ids, ids.astype(np.uint8)]),
+                np.concatenate([extra_lists, lists]),
+            )
+            self.last_id = max(self.last_id, newest)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 32) -> tuple:
+        """Top k (ids as 12-byte strings, cosine scores) among the nprobe nearest lists"""
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        probe = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+
+        scores, rows = [], []
+        for list_id in probe:
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            if end > start:
+                scores.append(self.vectors[start:end] @ query)
+                rows.append(self.ids[start:end])
+        extra_vectors, extra_ids, extra_lists = self._extra
+        if len(extra_ids):
+            probed = np.isin(extra_lists, probe)
+            scores.append(extra_vectors[probed] @ query)
+            rows.append(extra_ids[probed])
+        if not scores:
+            return [], []
+
+        scores = np.concatenate(scores)
+        rows = np.concatenate(rows)
+        k = min(k, len(scores))
+        if k <= 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [rows[i].tobytes() for i in top], scores[top].tolist()
+
+
+def open_index(path: str) -> Optional[VectorIndex]:
+    """Load the index at path, or None if none has been built there"""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    return VectorIndex.load(path)
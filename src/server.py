@@ -6,18 +6,41 @@ Implements fetch_news tool to pull news from MongoDB and display via widgets
 
 import asyncio
 import os
-from typing import Any, Optional
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import partial
+from typing import Any, Callable, FrozenSet, Hashable, Iterator, Optional
+from datetime import datetime, timedelta
 
 from mcp.server.models import InitializationOptions
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 
+from bson.objectid import ObjectId
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+import pymongo
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+from pydantic import AnyUrl
 import logging
 
+from hot_store import PROJECTION as HOT_STORE_PROJECTION, HotStore
+from query_engine import (
+    ALL_CATEGORIES_TAG, ARTICLE_FIELDS, CATEGORY_SCAN_PLAN, CATEGORY_STATS_PLAN, DEFAULT_PREVIEW_CHARS,
+    INDEX_MANIFEST, INDEX_NOT_FOUND_CODE, MAX_MULTI_CATEGORIES, SEARCH_TAG, NewsRepository, articles_by_id_plan,
+    client_options, date_cutoff, decode_cursor, fetch_news_plan, group_by_category, make_query_cache, mongo_uri,
+    multi_category_plan, normalize_category, paginate, plan_checks, plan_stages, query_cancelled, rank_by_similarity,
+    run_plan, selected_fields, semantic_candidates, substring_search_plan, text_search_plan, tool_time_budget,
+    trend_keys, trends_plan
+)
+from semantic_index import VectorIndex, article_vectors, open_index
+from trends import (
+    DIMENSIONS, INTERVALS, MAX_TREND_SERIES, rollup_unit, summarize_trends, trend_window, validate_trend_arguments
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,31 +48,234 @@ logger = logging.getLogger(__name__)
 # Initialize MCP server
 server = Server("mongodb-news-mcp")
 
-# MongoDB connection
+# MongoDB connection (see query_engine.NewsRepository)
 db_client: Optional[MongoClient] = None
 db = None
 news_collection = None
+category_stats_collection = None
+# Trend rollups by unit ("hour", "day"), maintained by scripts/news_rollups.py
+rollup_collections: dict = {}
+
+# Articles per TextContent piece in tool results; 0 returns a single piece
+RENDER_CHUNK_ARTICLES = int(os.getenv("RENDER_CHUNK_ARTICLES", "100"))
+
+# Create the query_engine.INDEX_MANIFEST indexes at startup
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+
+# Explain the tools' queries at startup: "warn" logs plans that scan the
+# collection or sort in memory, "fail" refuses to start, "off" skips it
+INDEX_SELF_CHECK = os.getenv("INDEX_SELF_CHECK", "warn").lower()
+index_task: Optional[asyncio.Task] = None
+
+# Semantic search index built by scripts/build_vector_index.py; articles
+# added since the build are embedded and indexed in memory every interval
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", ".semantic")
+SEMANTIC_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "32"))
+SEMANTIC_SYNC_INTERVAL = float(os.getenv("SEMANTIC_SYNC_INTERVAL", "30"))
+SEMANTIC_SYNC_BATCH = 1000
+semantic_index: Optional[VectorIndex] = None
+semantic_sync_task: Optional[asyncio.Task] = None
+
+# In-memory hot window: articles of the last HOT_STORE_DAYS days are kept in
+# process, and fetch_news / fetch_news_multi / search_news calls within that
+# window are answered without MongoDB. "poll" picks up new articles every
+# HOT_STORE_POLL_INTERVAL seconds; "change_stream" (replica set only) also
+# sees updates and deletes. 0 days disables the store.
+HOT_STORE_DAYS = int(os.getenv("HOT_STORE_DAYS", "0"))
+HOT_STORE_SYNC = os.getenv("HOT_STORE_SYNC", "poll").lower()
+HOT_STORE_POLL_INTERVAL = float(os.getenv("HOT_STORE_POLL_INTERVAL", "5"))
+HOT_STORE_SYNC_BATCH = 1000
+hot_store = HotStore()
+hot_store_task: Optional[asyncio.Task] = None
+
+# Per-tool metrics, labelled by tool name and the set of arguments supplied,
+# served in Prometheus text format as the news://metrics resource
+METRICS_URI = "news://metrics"
+metrics_registry = CollectorRegistry()
+TOOL_LATENCY = Histogram(
+    "news_tool_latency_seconds", "Total tool call latency",
+    ["tool", "args"], registry=metrics_registry
+)
+MONGO_QUERY_SECONDS = Histogram(
+    "news_mongo_query_seconds", "Time spent in MongoDB calls per tool call",
+    ["tool", "args"], registry=metrics_registry
+)
+DOCUMENTS_RETURNED = Histogram(
+    "news_documents_returned", "Documents returned by MongoDB per tool call",
+    ["tool", "args"], buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    registry=metrics_registry
+)
+RESPONSE_BYTES = Histogram(
+    "news_response_bytes", "Serialized tool response size",
+    ["tool", "args"], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    registry=metrics_registry
+)
+TOOL_ERRORS = Counter(
+    "news_tool_errors_total", "Tool calls that returned an error",
+    ["tool", "args"], registry=metrics_registry
+)
+COALESCED_REQUESTS = Counter(
+    "news_coalesced_requests_total", "Tool calls that shared an identical in-flight MongoDB query",
+    ["tool", "args"], registry=metrics_registry
+)
+HOT_STORE_HITS = Counter(
+    "news_hot_store_hits_total", "Tool calls answered from the in-memory hot store",
+    ["tool", "args"], registry=metrics_registry
+)
+tool_labels: ContextVar[tuple[str, str]] = ContextVar("tool_labels", default=("none", "none"))
+# Argument names each tool declares in its inputSchema, filled on first call
+tool_arguments: Optional[dict[str, FrozenSet[str]]] = None
+
+
+async def declared_arguments() -> dict[str, FrozenSet[str]]:
+    """Map each tool name to the argument names its inputSchema declares"""
+    global tool_arguments
+    if tool_arguments is None:
+        tool_arguments = {
+            tool.name: frozenset(tool.inputSchema.get("properties", {}))
+            for tool in await handle_list_tools()
+        }
+    return tool_arguments
+
+
+def argument_shape(arguments: dict, declared: FrozenSet[str]) -> str:
+    """
+    Label value naming the arguments a call actually set, e.g. "category+days_back".
+
+    Only declared arguments are named, so clients cannot mint label values.
+    """
+    supplied = sorted(
+        name for name, value in arguments.items()
+        if name in declared and value not in (None, "", [])
+    )
+    return "+".join(supplied) or "none"
+
+
+def record_documents(count: int) -> None:
+    """Record how many documents the current tool call got back from MongoDB"""
+    DOCUMENTS_RETURNED.labels(*tool_labels.get()).observe(count)
+
+
+# pymongo is blocking, so every database call is run on a bounded thread pool
+# instead of the event loop. The pool size caps how many tool calls can hit
+# MongoDB at once on a single stdio session.
+DB_EXECUTOR_WORKERS = int(os.getenv("MONGODB_EXECUTOR_WORKERS", "8"))
+db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Return the shared executor used for blocking MongoDB calls"""
+    global db_executor
+    
+    if db_executor is None:
+        db_executor = ThreadPoolExecutor(
+            max_workers=max(1, DB_EXECUTOR_WORKERS),
+            thread_name_prefix="mongodb"
+        )
+    return db_executor
+
+
+def _timed_db_call(labels: tuple[str, str], func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run func on the executor thread, timing only the MongoDB work itself"""
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        MONGO_QUERY_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking pymongo call without stalling the MCP event loop.
+    
+    The call runs in a copy of the caller's context, so it keeps the tool's
+    pymongo.timeout() budget. If the caller is cancelled, the thread cannot be
+    interrupted, but query_engine.read_cursor sees the flag and kills the cursor.
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    context = copy_context()
+    context.run(query_cancelled.set, cancelled)
+    call = partial(context.run, _timed_db_call, tool_labels.get(), func, *args, **kwargs)
+    try:
+        return await loop.run_in_executor(get_db_executor(), call)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+# Result cache for repeated tool calls, configured in query_engine. Results
+# here hold native ObjectIds and datetimes, so the cache is always in-process.
+query_cache = make_query_cache(shared=False)
+
+# Concurrent identical tool calls share one in-flight database call
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "true").lower() in ("1", "true", "yes")
+shared_db_calls: dict[Hashable, asyncio.Future] = {}
+shared_call_waiters: dict[asyncio.Future, int] = {}
+
+
+def _finish_shared_call(key: Hashable, future: asyncio.Future) -> None:
+    if shared_db_calls.get(key) is future:
+        del shared_db_calls[key]
+    # Mark the exception retrieved even if every caller was cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+async def run_db_shared(key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    run_db, except that calls arriving while an identical call (same key) is
+    in flight wait for its result instead of querying MongoDB again.
+    """
+    if not QUERY_COALESCING:
+        return await run_db(func, *args, **kwargs)
+    
+    future = shared_db_calls.get(key)
+    if future is not None:
+        COALESCED_REQUESTS.labels(*tool_labels.get()).inc()
+    else:
+        future = asyncio.ensure_future(run_db(func, *args, **kwargs))
+        shared_db_calls[key] = future
+        future.add_done_callback(partial(_finish_shared_call, key))
+    
+    shared_call_waiters[future] = shared_call_waiters.get(future, 0) + 1
+    try:
+        # A cancelled caller must not cancel the call for the others...
+        return await asyncio.shield(future)
+    finally:
+        shared_call_waiters[future] -= 1
+        if not shared_call_waiters[future]:
+            del shared_call_waiters[future]
+            # ...but once every caller is gone, stop it
+            if not future.done():
+                future.cancel()
+
+
+async def run_db_cached(key: Hashable, tags: FrozenSet[str], func: Callable[..., Any], *args) -> Any:
+    """run_db_shared, answering repeated calls from the result cache until they expire"""
+    cached = query_cache.get(key)
+    if cached is not None:
+        return cached
+    result = await run_db_shared(key, func, *args)
+    query_cache.set(key, result, tags)
+    return result
 
 
 def connect_to_mongodb():
     """Establish connection to MongoDB"""
-    global db_client, db, news_collection
+    global db_client, db, news_collection, category_stats_collection, rollup_collections
     
     try:
-        # Get MongoDB connection string from environment variable
-        mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-        db_name = os.getenv("MONGODB_DATABASE", "news_db")
-        collection_name = os.getenv("MONGODB_COLLECTION", "news")
-        
-        logger.info(f"Connecting to MongoDB at {mongo_uri}")
-        db_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        logger.info(f"Connecting to MongoDB at {mongo_uri()}")
+        # One connection per executor worker so queued calls never wait on the pool
+        repository = NewsRepository(MongoClient(mongo_uri(), **client_options(DB_EXECUTOR_WORKERS)))
         
         # Verify connection
-        db_client.admin.command('ping')
+        repository.client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
         
-        db = db_client[db_name]
-        news_collection = db[collection_name]
+        db_client, db, news_collection = repository.client, repository.db, repository.news
+        category_stats_collection, rollup_collections = repository.category_stats, repository.rollups
         
         return True
     except ConnectionFailure as e:
@@ -60,6 +286,44 @@ def connect_to_mongodb():
         return False
 
 
+def ensure_indexes() -> None:
+    """Create the INDEX_MANIFEST indexes; a conflicting existing index is reported, not replaced"""
+    for model in INDEX_MANIFEST:
+        try:
+            news_collection.create_indexes([model])
+        except OperationFailure as e:
+            logger.warning(f"Could not create index {model.document['name']}: {e}")
+
+
+def check_query_plans() -> list[str]:
+    """Explain each tool query and describe the ones that scan the collection or sort in memory"""
+    issues = []
+    for name, command, sort_allowed in plan_checks(news_collection.name):
+        try:
+            explain = db.command("explain", command, verbosity="queryPlanner")
+        except OperationFailure as e:
+            issues.append(f"{name}: explain failed ({e})")
+            continue
+        stages = plan_stages(explain)
+        if "COLLSCAN" in stages:
+            issues.append(f"{name}: collection scan")
+        if "SORT" in stages and not sort_allowed:
+            issues.append(f"{name}: in-memory sort")
+    return issues
+
+
+def maintain_indexes() -> list[str]:
+    """Ensure the manifest indexes and return the query plan issues found"""
+    if ENSURE_INDEXES:
+        ensure_indexes()
+    if INDEX_SELF_CHECK == "off":
+        return []
+    issues = check_query_plans()
+    for issue in issues:
+        logger.warning(f"Query plan check: {issue}")
+    return issues
+
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List available tools"""
@@ -72,7 +336,7 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {
                     "category": {
                         "type": "string",
-                        "description": "Filter news by category (e.g., technology, sports, business, entertainment)"
+                        "description": "Filter news by category, case-insensitive exact match (e.g., technology, sports, business, entertainment)"
                     },
                     "limit": {
                         "type": "integer",
@@ -82,21 +346,71 @@ async def handle_list_tools() -> list[types.Tool]:
                     "sort_by": {
                         "type": "string",
                         "enum": ["date", "relevance"],
-                        "description": "Sort order for results (default: date)",
+                        "description": "Sort order for results (default: date). relevance ranks by recency, source weight and engagement",
                         "default": "date"
                     },
                     "days_back": {
                         "type": "integer",
                         "description": "Fetch news from last N days (default: 7)",
                         "default": 7
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Opaque next_cursor from a previous response, to fetch the following page"
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(ARTICLE_FIELDS)},
+                        "description": "Article fields to return (default: title, content, category, source, url, published_date)"
+                    },
+                    "preview_chars": {
+                        "type": "integer",
+                        "description": "Maximum characters of content to return per article; 0 returns the full content (default: 200)",
+                        "default": DEFAULT_PREVIEW_CHARS
                     }
                 },
                 "required": []
             },
         ),
+        types.Tool(
+            name="fetch_news_multi",
+            description="Fetch the latest news for several categories at once (e.g. a front page), grouped by category. One database round trip regardless of the number of categories.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "categories": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "maxItems": MAX_MULTI_CATEGORIES,
+                        "description": "Categories to fetch, case-insensitive exact match"
+                    },
+                    "per_category": {
+                        "type": "integer",
+                        "description": "Maximum number of articles per category (default: 5)",
+                        "default": 5
+                    },
+                    "days_back": {
+                        "type": "integer",
+                        "description": "Fetch news from last N days (default: 7)",
+                        "default": 7
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(ARTICLE_FIELDS)},
+                        "description": "Article fields to return (default: title, content, category, source, url, published_date)"
+                    },
+                    "preview_chars": {
+                        "type": "integer",
+                        "description": "Maximum characters of content to return per article; 0 returns the full content (default: 200)",
+                        "default": DEFAULT_PREVIEW_CHARS
+                    }
+                },
+                "required": ["categories"]
+            },
+        ),
         types.Tool(
             name="search_news",
-            description="Search news articles by keywords in title or content",
+            description="Search news articles by keywords in title or content. Results are ranked by relevance, with title matches weighted above content matches. Use \"quotes\" for exact phrases and a leading minus to exclude a word (e.g. climate \"carbon tax\" -sports).",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -104,10 +418,72 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "string",
                         "description": "Search query to find in news title or content"
                     },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["text", "substring"],
+                        "description": "text: ranked full-text search on the text index (default). substring: literal case-insensitive substring match (slow on large collections)",
+                        "default": "text"
+                    },
                     "limit": {
                         "type": "integer",
                         "description": "Maximum number of results (default: 10)",
                         "default": 10
+                    },
+                    "days_back": {
+                        "type": "integer",
+                        "description": "Only search news from the last N days (default: all news)"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Opaque next_cursor from a previous response, to fetch the following page"
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(ARTICLE_FIELDS)},
+                        "description": "Article fields to return (default: title, content, category, source, url, published_date)"
+                    },
+                    "preview_chars": {
+                        "type": "integer",
+                        "description": "Maximum characters of content to return per article; 0 returns the full content (default: 200)",
+                        "default": DEFAULT_PREVIEW_CHARS
+                    },
+                    "allow_partial": {
+                        "type": "boolean",
+                        "description": "If the search runs out of time, return the articles found so far, marked partial, instead of an error (default: false)",
+                        "default": False
+                    }
+                },
+                "required": ["query"]
+            },
+        ),
+        types.Tool(
+            name="semantic_search_news",
+            description="Search news by meaning rather than exact keywords, so paraphrases match (e.g. \"chip maker\" finds articles about semiconductor companies). Results are ordered by similarity.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "What to look for, in natural language"
+                    },
+                    "category": {
+                        "type": "string",
+                        "description": "Only return articles in this category (case-insensitive exact match)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of results (default: 10)",
+                        "default": 10
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(ARTICLE_FIELDS)},
+                        "description": "Article fields to return (default: title, content, category, source, url, published_date)"
+                    },
+                    "preview_chars": {
+                        "type": "integer",
+                        "description": "Maximum characters of content to return per article; 0 returns the full content (default: 200)",
+                        "default": DEFAULT_PREVIEW_CHARS
                     }
                 },
                 "required": ["query"]
@@ -121,6 +497,54 @@ async def handle_list_tools() -> list[types.Tool]:
                 "properties": {},
                 "required": []
             },
+        ),
+        types.Tool(
+            name="news_trends",
+            description="Count articles over time per category or per source, e.g. Technology stories per hour today, or which sources are surging compared with the previous period. Reads precomputed hourly/daily counts, so it is cheap over long ranges.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "dimension": {
+                        "type": "string",
+                        "enum": list(DIMENSIONS),
+                        "description": "Count per category or per source (default: category)",
+                        "default": "category"
+                    },
+                    "values": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Categories or sources to chart (default: the top ones)"
+                    },
+                    "interval": {
+                        "type": "string",
+                        "enum": list(INTERVALS),
+                        "description": "Bucket width, like $dateTrunc units (default: hour)",
+                        "default": "hour"
+                    },
+                    "bin_size": {
+                        "type": "integer",
+                        "description": "Intervals per bucket, e.g. 6 with interval hour for 6-hour buckets (default: 1)",
+                        "default": 1
+                    },
+                    "days_back": {
+                        "type": "integer",
+                        "description": "Length of the window in days, ending now; growth compares with the window before it (default: 1)",
+                        "default": 1
+                    },
+                    "top": {
+                        "type": "integer",
+                        "description": f"Series returned when values is not given, at most {MAX_TREND_SERIES} (default: 5)",
+                        "default": 5
+                    },
+                    "rank_by": {
+                        "type": "string",
+                        "enum": ["count", "growth"],
+                        "description": "count: busiest first. growth: fastest growing vs the previous window first (default: count)",
+                        "default": "count"
+                    }
+                },
+                "required": []
+            },
         )
     ]
 
@@ -131,30 +555,224 @@ async def handle_call_tool(
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool execution requests"""
     
-    if not news_collection:
+    if news_collection is None:
         return [types.TextContent(
             type="text",
             text="Error: MongoDB connection not established. Please check your connection settings."
         )]
     
+    declared = await declared_arguments()
+    labels = (
+        name if name in declared else "unknown",
+        argument_shape(arguments or {}, declared.get(name, frozenset()))
+    )
+    tool_labels.set(labels)
+    started = time.perf_counter()
+    
     try:
-        if name == "fetch_news":
-            return await fetch_news_handler(arguments or {})
-        elif name == "search_news":
-            return await search_news_handler(arguments or {})
-        elif name == "get_news_categories":
-            return await get_categories_handler()
-        else:
-            return [types.TextContent(
-                type="text",
-                text=f"Unknown tool: {name}"
-            )]
+        with pymongo.timeout(tool_time_budget(name)):
+            if name == "fetch_news":
+                result = await fetch_news_handler(arguments or {})
+            elif name == "fetch_news_multi":
+                result = await fetch_news_multi_handler(arguments or {})
+            elif name == "search_news":
+                result = await search_news_handler(arguments or {})
+            elif name == "semantic_search_news":
+                result = await semantic_search_news_handler(arguments or {})
+            elif name == "get_news_categories":
+                result = await get_categories_handler()
+            elif name == "news_trends":
+                result = await news_trends_handler(arguments or {})
+            else:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Unknown tool: {name}"
+                )]
     except Exception as e:
         logger.error(f"Error executing tool {name}: {e}")
-        return [types.TextContent(
+        result = [types.TextContent(
             type="text",
             text=f"Error executing tool: {str(e)}"
         )]
+    
+    TOOL_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+    RESPONSE_BYTES.labels(*labels).observe(sum(len(content.text.encode()) for content in result))
+    # Handlers report failures as "Error ..." text rather than raising
+    if result and result[0].text.startswith("Error"):
+        TOOL_ERRORS.labels(*labels).inc()
+    
+    return result
+
+
+@server.list_resources()
+async def handle_list_resources() -> list[types.Resource]:
+    """List available resources"""
+    return [
+        types.Resource(
+            uri=AnyUrl(METRICS_URI),
+            name="metrics",
+            description="Per-tool latency, MongoDB time, documents, response size and error metrics (Prometheus text format)",
+            mimeType="text/plain"
+        )
+    ]
+
+
+@server.read_resource()
+async def handle_read_resource(uri: AnyUrl) -> str:
+    """Read a resource"""
+    if str(uri) == METRICS_URI:
+        return generate_latest(metrics_registry).decode()
+    raise ValueError(f"Unknown resource: {uri}")
+
+
+def _run_page(plan) -> tuple[list, Optional[str], bool]:
+    """Run a paged query_engine plan; called on the DB executor. Returns (articles, next_cursor, partial)."""
+    articles, partial = run_plan(news_collection, plan)
+    record_documents(len(articles))
+    return (*plan.page(articles, partial), partial)
+
+
+def _multi_category_find(plan, category_keys: list) -> dict:
+    """Run a multi_category_plan; called on the DB executor. Returns {category_key: [articles]}."""
+    articles, _ = run_plan(news_collection, plan)
+    record_documents(len(articles))
+    return group_by_category(articles, category_keys)
+
+
+def _semantic_search_page(query_text: str, limit: int, category_key: Optional[str],
+                          fields: Optional[list], preview_chars: int) -> list:
+    """Rank articles by similarity to the query, then fetch them; called on the DB executor"""
+    similarity = semantic_candidates(semantic_index, query_text, limit, category_key, SEMANTIC_NPROBE)
+    if not similarity:
+        return []
+    plan = articles_by_id_plan(list(similarity), category_key, fields, preview_chars)
+    articles, _ = run_plan(news_collection, plan)
+    record_documents(len(articles))
+    return rank_by_similarity(similarity, articles, limit)
+
+
+def load_semantic_index() -> None:
+    """Open the semantic index, if one has been built"""
+    global semantic_index
+    
+    semantic_index = open_index(SEMANTIC_INDEX_DIR)
+    if semantic_index is None:
+        logger.info(
+            f"No semantic index in {SEMANTIC_INDEX_DIR}; semantic_search_news is unavailable "
+            f"until scripts/build_vector_index.py has been run"
+        )
+    else:
+        logger.info(f"Loaded semantic index with {len(semantic_index):,} articles")
+
+
+def sync_semantic_index() -> int:
+    """Index one batch of articles newer than the index; called on the DB executor"""
+    last_id = semantic_index.last_id
+    query = {"_id": {"$gt": ObjectId(last_id)}} if last_id else {"_id": {"$type": "objectId"}}
+    cursor = news_collection.find(query, {"title": 1, "content": 1, "embedding": 1})
+    articles = list(cursor.sort("_id", 1).limit(SEMANTIC_SYNC_BATCH))
+    if articles:
+        semantic_index.add(*article_vectors(semantic_index.model, articles))
+    return len(articles)
+
+
+async def keep_semantic_index_current() -> None:
+    """Add newly ingested articles to the in-memory part of the semantic index"""
+    while True:
+        try:
+            added = await run_db(sync_semantic_index)
+            if added:
+                logger.info(f"Added {added} articles to the semantic index")
+            if added == SEMANTIC_SYNC_BATCH:
+                continue
+        except Exception as e:
+            logger.warning(f"Semantic index sync failed: {e}")
+        await asyncio.sleep(SEMANTIC_SYNC_INTERVAL)
+
+
+def _hot_store_cutoff() -> datetime:
+    return datetime.now() - timedelta(days=HOT_STORE_DAYS)
+
+
+def load_hot_store() -> None:
+    """Load the hot window from MongoDB; called on the DB executor or the watch thread"""
+    started = time.perf_counter()
+    # Polling resumes after the newest _id seen before the snapshot; articles
+    # inserted while it is read are simply upserted again
+    newest = news_collection.find_one({"_id": {"$type": "objectId"}}, {"_id": 1}, sort=[("_id", -1)])
+    since = _hot_store_cutoff()
+    cursor = news_collection.find({"published_date": {"$gte": since}}, HOT_STORE_PROJECTION)
+    hot_store.load(cursor.batch_size(5000), since, newest["_id"] if newest else None)
+    logger.info(
+        f"Loaded {len(hot_store):,} articles of the last {HOT_STORE_DAYS} days into the hot store "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def poll_hot_store() -> int:
+    """Add one batch of articles inserted since the last poll; called on the DB executor"""
+    query = {"_id": {"$gt": hot_store.last_id}} if hot_store.last_id else {"_id": {"$type": "objectId"}}
+    cursor = news_collection.find(query, HOT_STORE_PROJECTION).sort("_id", 1).limit(HOT_STORE_SYNC_BATCH)
+    articles = list(cursor)
+    for article in articles:
+        hot_store.upsert(article)
+    return len(articles)
+
+
+def watch_hot_store() -> None:
+    """Load the hot store and apply every later write to it; runs on its own thread"""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    while True:
+        try:
+            # Open the stream before the snapshot so no write in between is missed
+            with news_collection.watch(pipeline, full_document="updateLookup") as stream:
+                load_hot_store()
+                for change in stream:
+                    hot_store.apply_change(change)
+        except Exception as e:
+            # Writes are missed while the stream is down; serve from MongoDB until reloaded
+            hot_store.invalidate()
+            logger.warning(f"Hot store change stream unavailable ({e}); retrying in 30s")
+            time.sleep(30)
+
+
+async def keep_hot_store_current() -> None:
+    """Keep the hot store loaded, current and trimmed to the window"""
+    if HOT_STORE_SYNC == "change_stream":
+        threading.Thread(target=watch_hot_store, name="hot-store-watch", daemon=True).start()
+    else:
+        while not hot_store.ready:
+            try:
+                await run_db(load_hot_store)
+            except Exception as e:
+                logger.warning(f"Hot store load failed ({e}); retrying in 30s")
+                await asyncio.sleep(30)
+    
+    while True:
+        added = 0
+        if HOT_STORE_SYNC != "change_stream":
+            try:
+                added = await run_db(poll_hot_store)
+            except Exception as e:
+                logger.warning(f"Hot store poll failed: {e}")
+        hot_store.evict(_hot_store_cutoff())
+        if added < HOT_STORE_SYNC_BATCH:
+            await asyncio.sleep(HOT_STORE_POLL_INTERVAL)
+
+
+def _hot_fetch_page(category_key: Optional[str], cutoff_date: datetime, limit: int, fields: list,
+                    preview_chars: int, after: Optional[list] = None) -> tuple[list, Optional[str]]:
+    """Answer one newest-first page from the hot store"""
+    records = hot_store.fetch(category_key, cutoff_date, limit + 1, tuple(after) if after else None)
+    return paginate([record.to_dict(fields, preview_chars) for record in records], limit, "date")
+
+
+def _hot_search_page(query_text: str, cutoff_date: datetime, limit: int, fields: list,
+                     preview_chars: int, after: Optional[list] = None) -> tuple[list, Optional[str]]:
+    """Answer one page of keyword search from the hot store"""
+    matches = hot_store.search(query_text, cutoff_date, limit + 1, tuple(after) if after else None)
+    articles = [{**record.to_dict(fields, preview_chars), "score": score} for score, record in matches]
+    return paginate(articles, limit, "hot_score")
 
 
 async def fetch_news_handler(arguments: dict) -> list[types.TextContent]:
@@ -163,24 +781,36 @@ async def fetch_news_handler(arguments: dict) -> list[types.TextContent]:
     limit = arguments.get("limit", 10)
     sort_by = arguments.get("sort_by", "date")
     days_back = arguments.get("days_back", 7)
-    
-    # Build query
-    query = {}
-    if category:
-        query["category"] = {"$regex": category, "$options": "i"}
-    
-    # Add date filter
-    from datetime import timedelta
+    cursor = arguments.get("cursor")
+    fields = arguments.get("fields")
+    preview_chars = arguments.get("preview_chars", DEFAULT_PREVIEW_CHARS)
+    category_key = normalize_category(category) if category else None
     cutoff_date = datetime.now() - timedelta(days=days_back)
-    query["published_date"] = {"$gte": cutoff_date}
     
-    # Determine sort order
-    sort_field = "published_date" if sort_by == "date" else "_id"
+    # Determine sort order. relevance_score is precomputed by
+    # scripts/refresh_relevance.py and indexed with published_date, so both
+    # orders are index scans that stop at the limit.
+    sort_key = "relevance" if sort_by == "relevance" else "date"
     
     try:
-        # Fetch from MongoDB
-        cursor = news_collection.find(query).sort(sort_field, -1).limit(limit)
-        news_articles = list(cursor)
+        after = None
+        if cursor:
+            cursor_sort_key, after = decode_cursor(cursor)
+            if cursor_sort_key != sort_key:
+                raise ValueError("Pagination cursor does not match sort_by")
+        
+        if sort_key == "date" and hot_store.covers(cutoff_date):
+            news_articles, next_cursor = _hot_fetch_page(
+                category_key, cutoff_date, limit, selected_fields(fields), preview_chars, after
+            )
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            # Fetch from MongoDB
+            key = ("fetch_news", category_key, days_back, sort_key, limit, cursor, tuple(fields or ()), preview_chars)
+            plan = fetch_news_plan(category_key, cutoff_date, sort_key, limit, fields, preview_chars, after)
+            news_articles, next_cursor, _ = await run_db_cached(
+                key, frozenset({category_key or ALL_CATEGORIES_TAG}), _run_page, plan
+            )
         
         if not news_articles:
             return [types.TextContent(
@@ -189,12 +819,63 @@ async def fetch_news_handler(arguments: dict) -> list[types.TextContent]:
             )]
         
         # Format results for widget display
-        result = format_news_for_widget(news_articles, category)
-        
+        return render_news_contents(news_articles, category or "News Feed", next_cursor)
+    except Exception as e:
+        logger.error(f"Error fetching news: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"Error fetching news from database: {str(e)}"
+        )]
+
+
+async def fetch_news_multi_handler(arguments: dict) -> list[types.TextContent]:
+    """Fetch the latest news for several categories in one round trip"""
+    per_category = arguments.get("per_category", 5)
+    days_back = arguments.get("days_back", 7)
+    fields = arguments.get("fields")
+    preview_chars = arguments.get("preview_chars", DEFAULT_PREVIEW_CHARS)
+    
+    # One section per distinct category_key, in the order requested
+    sections = {}
+    for category in arguments.get("categories") or []:
+        sections.setdefault(normalize_category(category), category)
+    if not sections:
+        return [types.TextContent(type="text", text="Please provide at least one category.")]
+    if len(sections) > MAX_MULTI_CATEGORIES:
         return [types.TextContent(
             type="text",
-            text=result
+            text=f"Error: at most {MAX_MULTI_CATEGORIES} categories can be fetched at once"
         )]
+    
+    try:
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        if hot_store.covers(cutoff_date):
+            selected = selected_fields(fields)
+            grouped = {
+                key: [
+                    record.to_dict(selected, preview_chars)
+                    for record in hot_store.fetch(key, cutoff_date, per_category)
+                ]
+                for key in sections
+            }
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            key = ("fetch_news_multi", tuple(sections), per_category, days_back, tuple(fields or ()), preview_chars)
+            plan = multi_category_plan(
+                news_collection.name, list(sections), cutoff_date, per_category, fields, preview_chars
+            )
+            grouped = await run_db_cached(key, frozenset(sections), _multi_category_find, plan, list(sections))
+        
+        contents = []
+        for key, category in sections.items():
+            if grouped[key]:
+                contents += render_news_contents(grouped[key], category)
+            else:
+                contents.append(types.TextContent(
+                    type="text",
+                    text=f"📰 **{category}**\n\nNo articles in the last {days_back} days\n\n"
+                ))
+        return contents
     except Exception as e:
         logger.error(f"Error fetching news: {e}")
         return [types.TextContent(
@@ -207,6 +888,12 @@ async def search_news_handler(arguments: dict) -> list[types.TextContent]:
     """Search news by keywords"""
     query_text = arguments.get("query", "")
     limit = arguments.get("limit", 10)
+    mode = arguments.get("mode", "text")
+    days_back = arguments.get("days_back")
+    cursor = arguments.get("cursor")
+    allow_partial = bool(arguments.get("allow_partial", False))
+    fields = arguments.get("fields")
+    preview_chars = arguments.get("preview_chars", DEFAULT_PREVIEW_CHARS)
     
     if not query_text:
         return [types.TextContent(
@@ -215,41 +902,130 @@ async def search_news_handler(arguments: dict) -> list[types.TextContent]:
         )]
     
     try:
-        # Search in title and content
-        query = {
-            "$or": [
-                {"title": {"$regex": query_text, "$options": "i"}},
-                {"content": {"$regex": query_text, "$options": "i"}}
-            ]
-        }
+        # A cursor carries the sort order of the page it came from, so a
+        # search that fell back to substring mode keeps paging that way
+        after = None
+        sort_key = "score" if mode == "text" else "date"
+        if cursor:
+            sort_key, after = decode_cursor(cursor)
+            if sort_key not in ("score", "date", "hot_score"):
+                raise ValueError("Pagination cursor does not belong to search_news")
+        cutoff_date = date_cutoff(days_back)
+        if sort_key == "score" and not cursor and hot_store.covers(cutoff_date):
+            sort_key = "hot_score"
         
-        cursor = news_collection.find(query).sort("published_date", -1).limit(limit)
-        news_articles = list(cursor)
+        if sort_key == "hot_score":
+            if not hot_store.covers(cutoff_date):
+                raise ValueError("Pagination cursor has expired; repeat the search without it")
+            news_articles, next_cursor = await asyncio.to_thread(
+                _hot_search_page, query_text, cutoff_date, limit, selected_fields(fields), preview_chars, after
+            )
+            partial = False
+            HOT_STORE_HITS.labels(*tool_labels.get()).inc()
+        else:
+            # Search in title and content
+            key = (
+                "search_news", query_text, sort_key, days_back, limit, cursor, allow_partial,
+                tuple(fields or ()), preview_chars
+            )
+            page = query_cache.get(key)
+            if page is None:
+                search_plan = text_search_plan if sort_key == "score" else substring_search_plan
+                try:
+                    page = await run_db_shared(
+                        key, _run_page,
+                        search_plan(query_text, limit, fields, preview_chars, after, cutoff_date, allow_partial)
+                    )
+                except OperationFailure as e:
+                    if sort_key != "score" or e.code != INDEX_NOT_FOUND_CODE:
+                        raise
+                    logger.warning("No text index on news collection; falling back to substring search")
+                    page = await run_db_shared(
+                        key + ("substring",), _run_page,
+                        substring_search_plan(query_text, limit, fields, preview_chars, None, cutoff_date, allow_partial)
+                    )
+                # A partial page only reflects how far this call got in time
+                if not page[2]:
+                    query_cache.set(key, page, frozenset({SEARCH_TAG}))
+            news_articles, next_cursor, partial = page
         
+        partial_note = [types.TextContent(
+            type="text",
+            text="Partial results: the search ran out of time before it finished."
+        )] if partial else []
         if not news_articles:
             return [types.TextContent(
                 type="text",
                 text=f"No news articles found for query: '{query_text}'"
-            )]
-        
-        result = format_news_for_widget(news_articles, f"Search: {query_text}")
+            )] + partial_note
         
+        return render_news_contents(news_articles, f"Search: {query_text}", next_cursor) + partial_note
+    except Exception as e:
+        logger.error(f"Error searching news: {e}")
+        message = str(e)
+        if isinstance(e, PyMongoError) and e.timeout:
+            message = f"Search ran out of time ({e}); narrow it with days_back, or pass allow_partial"
+        return [types.TextContent(
+            type="text",
+            text=f"Error searching news: {message}"
+        )]
+
+
+async def semantic_search_news_handler(arguments: dict) -> list[types.TextContent]:
+    """Search news by meaning using the semantic index"""
+    query_text = arguments.get("query", "")
+    limit = arguments.get("limit", 10)
+    category = arguments.get("category")
+    fields = arguments.get("fields")
+    preview_chars = arguments.get("preview_chars", DEFAULT_PREVIEW_CHARS)
+    
+    if not query_text:
+        return [types.TextContent(
+            type="text",
+            text="Please provide a search query."
+        )]
+    if semantic_index is None:
         return [types.TextContent(
             type="text",
-            text=result
+            text="Error: semantic search is not available. Build the index with scripts/build_vector_index.py"
         )]
+    
+    try:
+        category_key = normalize_category(category) if category else None
+        key = ("semantic_search_news", query_text, category_key, limit, tuple(fields or ()), preview_chars)
+        news_articles = await run_db_cached(
+            key, frozenset({SEARCH_TAG}), _semantic_search_page, query_text, limit, category_key, fields, preview_chars
+        )
+        
+        if not news_articles:
+            return [types.TextContent(
+                type="text",
+                text=f"No news articles found for query: '{query_text}'"
+            )]
+        
+        return render_news_contents(news_articles, f"Semantic search: {query_text}")
     except Exception as e:
-        logger.error(f"Error searching news: {e}")
+        logger.error(f"Error in semantic search: {e}")
         return [types.TextContent(
             type="text",
             text=f"Error searching news: {str(e)}"
         )]
 
 
+def _list_categories() -> list:
+    """Read category names from category_stats; called on the DB executor"""
+    results, _ = run_plan(category_stats_collection, CATEGORY_STATS_PLAN)
+    if not results:
+        logger.warning("category_stats is empty; falling back to $group over the news collection")
+        results, _ = run_plan(news_collection, CATEGORY_SCAN_PLAN)
+    record_documents(len(results))
+    return [stats["name"] for stats in results if stats.get("name") is not None]
+
+
 async def get_categories_handler() -> list[types.TextContent]:
-    """Get distinct categories from news collection"""
+    """Get categories from the materialized category_stats collection"""
     try:
-        categories = news_collection.distinct("category")
+        categories = await run_db_shared(("get_news_categories",), _list_categories)
         
         if not categories:
             return [types.TextContent(
@@ -257,13 +1033,12 @@ async def get_categories_handler() -> list[types.TextContent]:
                 text="No categories found in the database."
             )]
         
-        result = "Available News Categories:\n\n"
-        for idx, category in enumerate(categories, 1):
-            result += f"{idx}. {category}\n"
+        parts = ["Available News Categories:\n\n"]
+        parts.extend(f"{idx}. {category}\n" for idx, category in enumerate(categories, 1))
         
         return [types.TextContent(
             type="text",
-            text=result
+            text="".join(parts)
         )]
     except Exception as e:
         logger.error(f"Error fetching categories: {e}")
@@ -273,54 +1048,169 @@ async def get_categories_handler() -> list[types.TextContent]:
         )]
 
 
-def format_news_for_widget(news_articles: list, title: str = "News Feed") -> str:
+def _trend_rows(unit: str, plan) -> list:
+    """Aggregate trend buckets from one rollup collection; called on the DB executor"""
+    rows, _ = run_plan(rollup_collections[unit], plan)
+    record_documents(len(rows))
+    return rows
+
+
+async def news_trends_handler(arguments: dict) -> list[types.TextContent]:
+    """Article counts over time per category or source, from the rollups"""
+    dimension = arguments.get("dimension", "category")
+    interval = arguments.get("interval", "hour")
+    bin_size = arguments.get("bin_size", 1)
+    days_back = arguments.get("days_back", 1)
+    top = arguments.get("top", 5)
+    rank_by = arguments.get("rank_by", "count")
+    
+    try:
+        validate_trend_arguments(dimension, interval, bin_size, days_back, top)
+        keys = trend_keys(dimension, arguments.get("values"))
+        
+        previous_start, start, end = trend_window(interval, days_back)
+        plan = trends_plan(dimension, keys, interval, bin_size, previous_start, start, end)
+        key = ("news_trends", dimension, tuple(keys), interval, bin_size, days_back, start)
+        rows = await run_db_cached(key, frozenset({ALL_CATEGORIES_TAG}), _trend_rows, rollup_unit(interval), plan)
+        series = summarize_trends(rows, len(keys) or top, rank_by)
+        
+        if not series:
+            return [types.TextContent(
+                type="text",
+                text=f"No articles counted in the last {days_back} day(s). "
+                     f"If articles exist, build the rollups with scripts/news_rollups.py"
+            )]
+        
+        width = f"{bin_size} {interval}s" if bin_size > 1 else interval
+        result = f"📈 **Articles per {width} by {dimension}, last {days_back} day(s)**\n\n"
+        for entry in series:
+            result += (
+                f"**{entry['name']}**: {entry['total']:,} articles "
+                f"({entry['previous_total']:,} in the previous period, growth {entry['growth']:+.2f})\n"
+            )
+            for bucket in entry["buckets"]:
+                result += f"  {bucket['start']}  {bucket['count']:,}\n"
+            result += "\n"
+        
+        return [types.TextContent(type="text", text=result)]
+    except Exception as e:
+        logger.error(f"Error computing trends: {e}")
+        return [types.TextContent(
+            type="text",
+            text=f"Error computing trends: {str(e)}"
+        )]
+
+
+# Precomputed pieces for the widget renderer
+MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+)
+HEADER_RULE = "=" * 60 + "\n\n"
+ARTICLE_RULE = "-" * 60 + "\n\n"
+
+
+def format_widget_date(value: Any) -> str:
+    """Format a date like strftime("%B %d, %Y %I:%M %p") without per-call locale lookups"""
+    if not isinstance(value, datetime):
+        return str(value)
+    hour = value.hour % 12 or 12
+    meridiem = "AM" if value.hour < 12 else "PM"
+    return f"{MONTH_NAMES[value.month - 1]} {value.day:02d}, {value.year} {hour:02d}:{value.minute:02d} {meridiem}"
+
+
+def iter_news_widget_chunks(news_articles: list, title: str = "News Feed",
+                            next_cursor: Optional[str] = None,
+                            chunk_articles: int = 0) -> Iterator[str]:
     """
-    Format news articles for widget display in ChatGPT
-    Similar to the pizza example widget format
+    Render news articles for widget display in ChatGPT, one pass over the list.
+    
+    Yields the output in pieces of chunk_articles articles (0 means a single
+    piece), so large result sets can be emitted progressively.
     """
-    result = f"📰 **{title}**\n\n"
-    result += f"Found {len(news_articles)} article(s)\n\n"
-    result += "=" * 60 + "\n\n"
+    # Articles without a date show the render time, computed once per render
+    fallback_date = format_widget_date(datetime.now())
+    parts = [f"📰 **{title}**\n\nFound {len(news_articles)} article(s)\n\n", HEADER_RULE]
     
     for idx, article in enumerate(news_articles, 1):
-        title = article.get("title", "Untitled")
+        published_date = article.get("published_date")
+        date_str = fallback_date if published_date is None else format_widget_date(published_date)
         content = article.get("content", "No content available")
-        source = article.get("source", "Unknown source")
-        category = article.get("category", "Uncategorized")
-        published_date = article.get("published_date", datetime.now())
-        url = article.get("url", "")
-        
-        # Format date
-        if isinstance(published_date, datetime):
-            date_str = published_date.strftime("%B %d, %Y %I:%M %p")
-        else:
-            date_str = str(published_date)
-        
-        # Truncate content for preview
-        content_preview = content[:200] + "..." if len(content) > 200 else content
-        
-        result += f"**{idx}. {title}**\n"
-        result += f"📂 Category: {category}\n"
-        result += f"📰 Source: {source}\n"
-        result += f"📅 Published: {date_str}\n\n"
-        result += f"{content_preview}\n\n"
+        # Content arrives already cut to preview_chars by the query projection
+        if article.get("content_truncated"):
+            content += "..."
         
+        parts.append(
+            f"**{idx}. {article.get('title', 'Untitled')}**\n"
+            f"📂 Category: {article.get('category', 'Uncategorized')}\n"
+            f"📰 Source: {article.get('source', 'Unknown source')}\n"
+            f"📅 Published: {date_str}\n\n"
+            f"{content}\n\n"
+        )
+        url = article.get("url")
         if url:
-            result += f"🔗 Read more: {url}\n\n"
+            parts.append(f"🔗 Read more: {url}\n\n")
+        parts.append(ARTICLE_RULE)
         
-        result += "-" * 60 + "\n\n"
+        if chunk_articles and idx % chunk_articles == 0:
+            yield "".join(parts)
+            parts = []
     
-    return result
+    if next_cursor:
+        parts.append(f"More articles available. Next page cursor: {next_cursor}\n")
+    if parts:
+        yield "".join(parts)
+
+
+def format_news_for_widget(news_articles: list, title: str = "News Feed",
+                           next_cursor: Optional[str] = None) -> str:
+    """
+    Format news articles for widget display in ChatGPT
+    Similar to the pizza example widget format
+    """
+    return "".join(iter_news_widget_chunks(news_articles, title, next_cursor))
+
+
+def render_news_contents(news_articles: list, title: str = "News Feed",
+                         next_cursor: Optional[str] = None) -> list[types.TextContent]:
+    """Render articles as TextContent pieces of RENDER_CHUNK_ARTICLES articles each"""
+    return [
+        types.TextContent(type="text", text=chunk)
+        for chunk in iter_news_widget_chunks(news_articles, title, next_cursor, RENDER_CHUNK_ARTICLES)
+    ]
+
+
+def _log_index_failure(task: asyncio.Future) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Index maintenance failed: {task.exception()}")
 
 
 async def main():
     """Main entry point for the MCP server"""
+    global index_task, hot_store_task, semantic_sync_task
+    
     logger.info("Starting MongoDB News MCP Server...")
     
     # Connect to MongoDB
     if not connect_to_mongodb():
         logger.error("Failed to connect to MongoDB. Please check your configuration.")
         logger.info("Server will start but tools will not function properly.")
+    elif INDEX_SELF_CHECK == "fail":
+        if await run_db(maintain_indexes):
+            logger.error("Query plan check failed (INDEX_SELF_CHECK=fail); not starting")
+            return
+    elif ENSURE_INDEXES or INDEX_SELF_CHECK != "off":
+        # Index builds can take a while on a large collection; serve meanwhile
+        index_task = asyncio.create_task(run_db(maintain_indexes))
+        index_task.add_done_callback(_log_index_failure)
+    
+    if news_collection is not None and HOT_STORE_DAYS > 0:
+        hot_store_task = asyncio.create_task(keep_hot_store_current())
+    
+    if news_collection is not None:
+        await run_db(load_semantic_index)
+        if semantic_index is not None and SEMANTIC_SYNC_INTERVAL > 0:
+            semantic_sync_task = asyncio.create_task(keep_semantic_index_current())
     
     # Run the server
     async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
@@ -337,6 +1227,12 @@ async def main():
                 ),
             ),
         )
+    
+    for task in (index_task, hot_store_task, semantic_sync_task):
+        if task is not None:
+            task.cancel()
+    if db_executor is not None:
+        db_executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
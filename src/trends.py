@@ -0,0 +1,112 @@
+"""
+Time-bucketed article counts for news_trends
+
+Counts come from the rollup collections maintained by scripts/news_rollups.py
+(one document per dimension value and hour or day), never from the articles
+themselves. A trends query reads the buckets of the requested window and of
+the equally long window before it, and regroups them with $dateTrunc:
+
+    interval "hour"            -> hourly rollups
+    interval "day"/"week"/"month" -> daily rollups
+
+Both servers build the pipeline and summarize its rows with these helpers.
+All times are UTC.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+DIMENSIONS = ("category", "source")
+INTERVALS = ("hour", "day", "week", "month")
+
+# Longest window per rollup granularity, so a call reads a bounded number of buckets
+MAX_DAYS_BACK = {"hour": 31, "day": 730}
+MAX_TREND_SERIES = 20
+
+
+def rollup_unit(interval: str) -> str:
+    """Granularity of the rollups an interval is computed from"""
+    return "hour" if interval == "hour" else "day"
+
+
+def trend_window(interval: str, days_back: int, now: Optional[datetime] = None) -> Tuple[datetime, datetime, datetime]:
+    """
+    (previous_start, start, end) of the window ending with the current bucket,
+    as naive UTC datetimes like those stored in the rollups
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    if rollup_unit(interval) == "hour":
+        end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    else:
+        end = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = end - timedelta(days=days_back)
+    return start - (end - start), start, end
+
+
+def validate_trend_arguments(dimension: str, interval: str, bin_size: int, days_back: int, top: int) -> None:
+    """Raise ValueError for arguments news_trends cannot serve"""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    if bin_size < 1:
+        raise ValueError("bin_size must be at least 1")
+    max_days = MAX_DAYS_BACK[rollup_unit(interval)]
+    if not 1 <= days_back <= max_days:
+        raise ValueError(f"days_back must be between 1 and {max_days} for interval '{interval}'")
+    if not 1 <= top <= MAX_TREND_SERIES:
+        raise ValueError(f"top must be between 1 and {MAX_TREND_SERIES}")
+
+
+def trend_pipeline(dimension: str, keys: Optional[List[str]], interval: str, bin_size: int,
+                   previous_start: datetime, start: datetime, end: datetime) -> List[dict]:
+    """
+    Aggregation over a rollup collection: one row per series key, window
+    (current or previous) and $dateTrunc bucket
+    """
+    match: dict = {"dim": dimension, "t": {"$gte": previous_start, "$lt": end}}
+    if keys:
+        match["key"] = {"$in": keys}
+    truncate: dict = {"date": "$t", "unit": interval, "binSize": bin_size}
+    if interval == "week":
+        truncate["startOfWeek"] = "monday"
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "key": "$key",
+                "previous": {"$lt": ["$t", start]},
+                "bucket": {"$dateTrunc": truncate},
+            },
+            "name": {"$first": "$name"},
+            "count": {"$sum": "$count"},
+        }},
+        {"$sort": {"_id.bucket": 1}},
+    ]
+
+
+def summarize_trends(rows: List[dict], top: int, rank_by: str = "count") -> List[dict]:
+    """
+    Turn pipeline rows into at most top series, each with its buckets in the
+    current window, its total, the previous window's total and its growth:
+    (total - previous_total) / (previous_total + 1). rank_by "growth" puts
+    surging series first, "count" the busiest.
+    """
+    series: dict = {}
+    for row in rows:
+        key = row["_id"]["key"]
+        entry = series.setdefault(key, {
+            "key": key, "name": row.get("name") or key, "total": 0, "previous_total": 0, "buckets": []
+        })
+        if row["_id"]["previous"]:
+            entry["previous_total"] += row["count"]
+        else:
+            entry["total"] += row["count"]
+            entry["buckets"].append({"start": row["_id"]["bucket"].isoformat(), "count": row["count"]})
+
+    current = [entry for entry in series.values() if entry["total"]]
+    for entry in current:
+        entry["growth"] = round((entry["total"] - entry["previous_total"]) / (entry["previous_total"] + 1), 3)
+    rank = (lambda entry: entry["growth"]) if rank_by == "growth" else (lambda entry: entry["total"])
+    current.sort(key=lambda entry: (rank(entry), entry["total"]), reverse=True)
+    return current[:top]
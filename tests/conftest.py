@@ -0,0 +1,28 @@
+"""
+Make the servers and scripts importable the way they run: src/server.py and
+its modules from src/, server/main.py from server/, the CLIs from scripts/.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for directory in ("src", "server", "scripts"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope="session")
+def http_server():
+    """server/main.py, imported once, or skipped without its FastMCP"""
+    pytest.importorskip("fastmcp")
+    import fastmcp
+
+    if not hasattr(fastmcp.FastMCP, "get_app"):
+        pytest.skip("server/main.py needs a FastMCP with get_app()")
+    import main
+    return main
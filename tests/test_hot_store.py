@@ -0,0 +1,58 @@
+"""Hot store search scores matches without blocking writers and readers"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("bson")
+
+from bson.objectid import ObjectId  # noqa: E402
+
+from hot_store import HotStore  # noqa: E402
+
+NOW = datetime(2025, 10, 15, 12, 0)
+
+
+def article(title, hours_ago=1):
+    return {
+        "_id": ObjectId(), "title": title, "content": "Markets rallied on the news",
+        "category": "Business", "category_key": "business", "published_date": NOW - timedelta(hours=hours_ago),
+    }
+
+
+def test_search_ranks_title_matches_first():
+    store = HotStore()
+    store.load([article("Central bank holds rates"), article("Rates rise again", hours_ago=2), article("Sports roundup")],
+               NOW - timedelta(days=3))
+
+    results = store.search("rates -sports", NOW - timedelta(days=1), 10)
+
+    assert sorted(record.title for _, record in results) == ["Central bank holds rates", "Rates rise again"]
+
+
+def test_lock_is_free_while_matches_are_checked():
+    store = HotStore()
+    lock_free = []
+
+    class Title(str):
+        def __format__(self, spec):
+            # The phrase check formats the title; see whether another thread could write now
+            checker = threading.Thread(target=try_lock)
+            checker.start()
+            checker.join()
+            return super().__format__(spec)
+
+    def try_lock():
+        acquired = store._lock.acquire(blocking=False)
+        lock_free.append(acquired)
+        if acquired:
+            store._lock.release()
+
+    store.load([article(Title("Central bank holds rates"))], NOW - timedelta(days=3))
+    store.upsert(article("Rates rise again"))
+
+    results = store.search('"holds rates"', NOW - timedelta(days=1), 10)
+
+    assert [record.title for _, record in results] == ["Central bank holds rates"]
+    assert lock_free and all(lock_free)
@@ -0,0 +1,112 @@
+"""Ingestion rejects malformed records one at a time and keeps resume offsets per input file"""
+
+import json
+
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("dateutil")
+
+import ingest_news  # noqa: E402  (scripts/ingest_news.py)
+
+
+def record(**overrides):
+    return {
+        "title": "Rover finds water", "content": "Full story", "category": "Science", "source": "Wire",
+        "published_date": "2025-10-15T12:00:00", "url": "https://example.com/rover", **overrides
+    }
+
+
+def test_prepare_article_derives_stored_fields():
+    article = ingest_news.prepare_article(record(category="  Science "), {})
+
+    assert article["category_key"] == "science"
+    assert article["published_date"].year == 2025
+    assert isinstance(article["relevance_score"], float)
+
+
+@pytest.mark.parametrize("raw, message", [
+    (record(category=["Science"]), "category must be a string"),
+    (record(category={"name": "Science"}), "category must be a string"),
+    (record(url=42, title=7), "title, url must be a string"),
+    (record(category=""), "missing category"),
+    (["not", "an", "object"], "not a JSON object"),
+])
+def test_malformed_records_are_rejected(raw, message):
+    with pytest.raises(ValueError, match=message):
+        ingest_news.prepare_article(raw, {})
+
+
+def test_malformed_records_are_counted_and_skipped(tmp_path):
+    lines = [record(url="https://example.com/1"), record(category=5), "not json", record(url="https://example.com/2")]
+    path = tmp_path / "news.jsonl"
+    path.write_text("".join((line if isinstance(line, str) else json.dumps(line)) + "\n" for line in lines))
+    errors = []
+
+    batches = list(ingest_news.read_batches(str(path), 0, 10, {}, None, errors))
+
+    assert [article["url"] for article in batches[0][0]] == ["https://example.com/1", "https://example.com/2"]
+    assert batches[0][1] == path.stat().st_size
+    assert [message for _, message in errors][0] == "category must be a string"
+    assert len(errors) == 2
+
+
+def test_inputs_with_the_same_name_keep_separate_checkpoints(tmp_path):
+    checkpoint_dir = str(tmp_path / ".ingest")
+    for directory in ("monday", "tuesday"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "news.jsonl").write_text("{}\n" * 100)
+
+    monday = ingest_news.Checkpoint(checkpoint_dir, str(tmp_path / "monday" / "news.jsonl"))
+    monday.save(150)
+    tuesday = ingest_news.Checkpoint(checkpoint_dir, str(tmp_path / "tuesday" / "news.jsonl"))
+
+    assert tuesday.offset == 0
+    assert tuesday.path != monday.path
+    # The same file, however it is named on the command line, resumes where it stopped
+    assert ingest_news.Checkpoint(checkpoint_dir, str(tmp_path / "monday" / ".." / "monday" / "news.jsonl")).offset == 150
+
+
+def test_appended_file_resumes_and_replaced_file_starts_over(tmp_path):
+    checkpoint_dir = str(tmp_path / ".ingest")
+    path = tmp_path / "news.jsonl"
+    path.write_text('{"n": 1}\n' * 10)
+    ingest_news.Checkpoint(checkpoint_dir, str(path)).save(45)
+
+    with open(path, "a") as f:
+        f.write('{"n": 2}\n' * 10)
+    assert ingest_news.Checkpoint(checkpoint_dir, str(path)).offset == 45
+
+    # Same name, larger size, different content
+    replacement = tmp_path / "replacement.jsonl"
+    replacement.write_text('{"n": 3}\n' * 30)
+    replacement.replace(path)
+    assert ingest_news.Checkpoint(checkpoint_dir, str(path)).offset == 0
+
+
+def test_file_rewritten_in_place_starts_over(tmp_path):
+    checkpoint_dir = str(tmp_path / ".ingest")
+    path = tmp_path / "news.jsonl"
+    path.write_text('{"n": 1}\n' * 10)
+    ingest_news.Checkpoint(checkpoint_dir, str(path)).save(45)
+
+    with open(path, "w") as f:
+        f.write('{"n": 9}\n' * 10)
+    assert ingest_news.Checkpoint(checkpoint_dir, str(path)).offset == 0
+
+
+def test_failed_batch_still_counts_its_inserted_articles(monkeypatch):
+    from pymongo.errors import BulkWriteError
+
+    class FailingCollection:
+        def bulk_write(self, operations, ordered):
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}], "upserted": [{"index": 0, "_id": 1}, {"index": 2, "_id": 2}]})
+
+    recorded = []
+    monkeypatch.setattr(ingest_news, "update_category_stats", lambda stats, inserted: recorded.append(inserted))
+    articles = [ingest_news.prepare_article(record(url=f"https://example.com/{n}"), {}) for n in range(3)]
+
+    with pytest.raises(BulkWriteError):
+        ingest_news.write_batch(FailingCollection(), None, None, articles)
+
+    assert [article["url"] for article in recorded[0]] == ["https://example.com/0", "https://example.com/2"]
@@ -0,0 +1,134 @@
+"""Draining on shutdown and metrics summed over the workers of server/serve.py"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("uvicorn")
+
+import serve  # noqa: E402  (server/serve.py)
+
+SERVER_DIR = os.path.dirname(os.path.abspath(serve.__file__))
+
+
+@pytest.fixture
+def worker(http_server, monkeypatch):
+    monkeypatch.setattr(http_server, "draining", False)
+    monkeypatch.setattr(http_server, "drain_event", asyncio.Event())
+    monkeypatch.setattr(http_server, "db_status", "ready")
+    monkeypatch.setattr(http_server, "INDEX_SELF_CHECK", "warn")
+    return http_server
+
+
+def readyz(worker):
+    response = asyncio.run(worker.readyz(None))
+    return response.status_code, json.loads(response.body)
+
+
+def test_readyz_turns_503_while_draining(worker):
+    status, body = readyz(worker)
+    assert (status, body["status"]) == (200, "ready")
+
+    worker.begin_drain()
+
+    status, body = readyz(worker)
+    assert (status, body["status"]) == (503, "draining")
+    assert worker.drain_event.is_set()
+
+
+def event_stream_scope(accept=b"text/event-stream"):
+    return {"type": "http", "method": "GET", "path": "/mcp", "headers": [(b"accept", accept)]}
+
+
+def test_drain_closes_open_event_streams(worker):
+    sent = []
+
+    async def endless_stream(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"event: endpoint\n\n", "more_body": True})
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    async def serve_then_drain():
+        stream = asyncio.ensure_future(worker.EventStreamDrain(endless_stream)(event_stream_scope(), None, send))
+        await asyncio.sleep(0.05)
+        assert not stream.done()
+        worker.begin_drain()
+        await asyncio.wait_for(stream, 1)
+
+    asyncio.run(serve_then_drain())
+    assert sent[0]["status"] == 200
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+def test_drain_leaves_other_requests_alone(worker):
+    sent = []
+
+    async def tool_call(scope, receive, send):
+        await asyncio.sleep(0.1)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def send(message):
+        sent.append(message)
+
+    async def call_while_draining():
+        call = asyncio.ensure_future(
+            worker.EventStreamDrain(tool_call)(event_stream_scope(b"application/json"), None, send)
+        )
+        await asyncio.sleep(0.01)
+        worker.begin_drain()
+        await call
+
+    asyncio.run(call_while_draining())
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+    assert sent[-1]["body"] == b"{}"
+
+
+def test_prepare_metrics_dir_empties_a_given_directory(tmp_path, monkeypatch):
+    (tmp_path / "counter_1234.db").write_bytes(b"stale")
+    (tmp_path / "README").write_text("kept")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    assert serve.prepare_metrics_dir() is False
+    assert sorted(os.listdir(tmp_path)) == ["README"]
+
+
+def test_prepare_metrics_dir_creates_one(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+    assert serve.prepare_metrics_dir() is True
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    assert os.path.isdir(path) and not os.listdir(path)
+    os.rmdir(path)
+
+
+WORKER = """
+import asyncio, sys
+import main
+main.TOOL_ERRORS.labels("fetch_news", "category").inc()
+main.TOOL_LATENCY.labels("fetch_news", "category").observe(0.02)
+if sys.argv[1] == "scrape":
+    print(asyncio.run(main.metrics(None)).body.decode())
+main.mark_worker_dead()
+"""
+
+
+def test_metrics_add_up_across_workers(http_server, tmp_path):
+    # Each worker is a separate process writing to the shared directory
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for role in ("work", "work", "scrape"):
+        result = subprocess.run(
+            [sys.executable, "-c", WORKER, role], cwd=SERVER_DIR, env=env,
+            capture_output=True, text=True, timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+
+    assert 'news_tool_errors_total{args="category",tool="fetch_news"} 3.0' in result.stdout
+    assert 'news_tool_latency_seconds_count{args="category",tool="fetch_news"} 3.0' in result.stdout
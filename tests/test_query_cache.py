@@ -0,0 +1,150 @@
+"""Result cache: LRU order, TTL, memory cap and tag-scoped invalidation from change events"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from query_engine import ALL_CATEGORIES_TAG, SEARCH_TAG, QueryCache, dumps  # noqa: E402
+
+
+def make_cache(ttl_seconds=60, max_entries=100, max_bytes=1 << 20):
+    return QueryCache(ttl_seconds, max_entries, max_bytes)
+
+
+def fill(cache):
+    """One entry per kind of query, tagged the way the tools tag them"""
+    cache.set(("fetch_news", "technology"), ["tech"], frozenset({"technology"}))
+    cache.set(("fetch_news", "sports"), ["sports"], frozenset({"sports"}))
+    cache.set(("fetch_news", None), ["all"], frozenset({ALL_CATEGORIES_TAG}))
+    cache.set(("fetch_news_multi", "sports", "technology"), ["multi"], frozenset({"sports", "technology"}))
+    cache.set(("search_news", "mars"), ["search"], frozenset({SEARCH_TAG}))
+
+
+def cached_keys(cache):
+    return {key for key in [
+        ("fetch_news", "technology"), ("fetch_news", "sports"), ("fetch_news", None),
+        ("fetch_news_multi", "sports", "technology"), ("search_news", "mars"),
+    ] if key in cache._entries}
+
+
+def test_evicts_least_recently_used_first():
+    cache = make_cache(max_entries=2)
+    cache.set("a", 1, frozenset())
+    cache.set("b", 2, frozenset())
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, frozenset())
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl_seconds=0.05)
+    cache.set("a", 1, frozenset())
+    assert cache.get("a") == 1
+
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_stays_within_the_byte_cap():
+    value = ["x" * 100]
+    size = len(dumps(value))
+    cache = make_cache(max_bytes=2 * size)
+    for key in "abc":
+        cache.set(key, value, frozenset())
+
+    assert cache.stats()["bytes"] == 2 * size
+    assert cache.get("a") is None and cache.get("c") == value
+
+    # A value larger than the whole cache is not stored at all
+    cache.set("huge", ["x" * 1000], frozenset())
+    assert cache.get("huge") is None and cache.get("c") == value
+
+
+def test_disabled_cache_stores_nothing():
+    cache = make_cache(ttl_seconds=0)
+    cache.set("a", 1, frozenset())
+    assert cache.get("a") is None
+
+
+def test_invalidation_is_scoped_by_tag():
+    cache = make_cache()
+    fill(cache)
+
+    assert cache.invalidate(frozenset({"technology"})) == 2
+    assert cached_keys(cache) == {("fetch_news", "sports"), ("fetch_news", None), ("search_news", "mars")}
+    assert cache.invalidate(frozenset({SEARCH_TAG})) == 1
+    assert cache.stats()["invalidations"] == 3
+
+
+class FakeChangeStream:
+    """AsyncMongoClient change stream stand-in: yields events, then waits for more"""
+
+    def __init__(self, events, consumed):
+        self.events = events
+        self.consumed = consumed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.events:
+            self.consumed.set()
+            await asyncio.Event().wait()
+        return self.events.pop(0)
+
+
+class WatchableCollection:
+    def __init__(self, events):
+        self.events = events
+        self.consumed = asyncio.Event()
+
+    async def watch(self, pipeline, **kwargs):
+        return FakeChangeStream(list(self.events), self.consumed)
+
+
+def watch_until_consumed(http_server, monkeypatch, cache, events):
+    monkeypatch.setattr(http_server, "query_cache", cache)
+
+    async def run():
+        collection = WatchableCollection(events)
+        monkeypatch.setattr(http_server, "news_collection", collection)
+        watcher = asyncio.ensure_future(http_server.watch_news_changes())
+        await asyncio.wait_for(collection.consumed.wait(), 1)
+        watcher.cancel()
+
+    asyncio.run(run())
+
+
+def test_change_event_evicts_its_category_all_category_and_search(http_server, monkeypatch):
+    cache = make_cache()
+    fill(cache)
+    insert = {"operationType": "insert", "fullDocument": {"category_key": "technology", "title": "New chip"}}
+
+    watch_until_consumed(http_server, monkeypatch, cache, [insert])
+
+    assert cached_keys(cache) == {("fetch_news", "sports")}
+
+
+def test_change_event_without_a_document_clears_everything(http_server, monkeypatch):
+    cache = make_cache()
+    fill(cache)
+    # A delete, or an update whose document is already gone, has no category to scope by
+    delete = {"operationType": "delete", "documentKey": {"_id": "65f0c0ffee"}}
+
+    watch_until_consumed(http_server, monkeypatch, cache, [delete])
+
+    assert cached_keys(cache) == set()
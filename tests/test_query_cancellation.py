@@ -0,0 +1,159 @@
+"""Cancelled and out-of-time queries close their cursors; partial pages are flagged and not cached"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from bson.objectid import ObjectId  # noqa: E402
+from pymongo.errors import ExecutionTimeout  # noqa: E402
+
+from query_engine import read_cursor_async  # noqa: E402
+
+
+def articles(count):
+    now = datetime.now()
+    return [
+        {"_id": ObjectId(), "title": f"Mars article {i}", "content": "Rover news", "category": "Science",
+         "source": "Wire", "published_date": now - timedelta(minutes=i), "score": 2.0 - i / 100}
+        for i in range(count)
+    ]
+
+
+class SlowAsyncCursor:
+    """AsyncMongoClient cursor stand-in: one document per delay, then an optional error"""
+
+    def __init__(self, documents, delay=0.02, error=None):
+        self.documents = list(documents)
+        self.delay = delay
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.delay)
+        if self.documents:
+            return self.documents.pop(0)
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return [document async for document in self][:length]
+
+    async def close(self):
+        # killCursors is a round trip to the server
+        await asyncio.sleep(0.01)
+        self.closed = True
+
+
+@pytest.mark.parametrize("allow_partial", [False, True])
+def test_cancelling_the_task_mid_iteration_closes_the_cursor(allow_partial):
+    cursor = SlowAsyncCursor(articles(100))
+
+    async def cancel_midway():
+        read = asyncio.ensure_future(read_cursor_async(cursor, 100, allow_partial))
+        await asyncio.sleep(0.05)
+        read.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await read
+        await asyncio.sleep(0.05)
+
+    asyncio.run(cancel_midway())
+    assert cursor.closed
+    assert cursor.documents
+
+
+@pytest.mark.parametrize("allow_partial", [False, True])
+def test_cancel_scope_mid_iteration_closes_the_cursor(allow_partial):
+    anyio = pytest.importorskip("anyio")
+    cursor = SlowAsyncCursor(articles(100))
+
+    async def cancel_midway():
+        # How MCP cancels a request: every await in the scope is cancelled until it exits
+        with anyio.move_on_after(0.05) as scope:
+            await read_cursor_async(cursor, 100, allow_partial)
+        assert scope.cancelled_caught
+        await anyio.sleep(0.05)
+
+    anyio.run(cancel_midway)
+    assert cursor.closed
+
+
+def test_out_of_time_with_allow_partial_returns_what_was_read():
+    cursor = SlowAsyncCursor(articles(3), delay=0, error=ExecutionTimeout("operation exceeded time limit", 50))
+
+    documents, partial = asyncio.run(read_cursor_async(cursor, 10, allow_partial=True))
+
+    assert (len(documents), partial) == (3, True)
+    assert cursor.closed
+
+
+def test_out_of_time_without_allow_partial_raises():
+    cursor = SlowAsyncCursor(articles(3), delay=0, error=ExecutionTimeout("operation exceeded time limit", 50))
+
+    with pytest.raises(ExecutionTimeout):
+        asyncio.run(read_cursor_async(cursor, 10))
+    assert cursor.closed
+
+
+class TimingOutCollection:
+    """PyMongo collection stand-in whose searches run out of time after two articles"""
+
+    def __init__(self, time_out=True):
+        self.time_out = time_out
+        self.searches = 0
+
+    def aggregate(self, pipeline, **kwargs):
+        self.searches += 1
+        yield from articles(2)
+        if self.time_out:
+            raise ExecutionTimeout("operation exceeded time limit", 50)
+
+
+@pytest.fixture
+def stdio_server(monkeypatch):
+    server = pytest.importorskip("server")
+    server.query_cache.clear()
+    yield server
+    server.query_cache.clear()
+
+
+def search(server, **arguments):
+    return asyncio.run(server.handle_call_tool("search_news", {"query": "mars", **arguments}))
+
+
+def test_partial_search_page_is_flagged_and_not_cached(stdio_server, monkeypatch):
+    collection = TimingOutCollection()
+    monkeypatch.setattr(stdio_server, "news_collection", collection)
+
+    for _ in range(2):
+        result = search(stdio_server, allow_partial=True)
+        assert "Mars article 1" in result[0].text
+        assert result[-1].text.startswith("Partial results")
+
+    assert collection.searches == 2
+    assert stdio_server.query_cache.stats()["entries"] == 0
+
+
+def test_out_of_time_search_without_allow_partial_is_an_error(stdio_server, monkeypatch):
+    monkeypatch.setattr(stdio_server, "news_collection", TimingOutCollection())
+
+    result = search(stdio_server)
+
+    assert result[0].text.startswith("Error searching news: Search ran out of time")
+
+
+def test_complete_search_page_is_cached(stdio_server, monkeypatch):
+    collection = TimingOutCollection(time_out=False)
+    monkeypatch.setattr(stdio_server, "news_collection", collection)
+
+    for _ in range(2):
+        result = search(stdio_server, allow_partial=True)
+        assert not result[-1].text.startswith("Partial results")
+
+    assert collection.searches == 1
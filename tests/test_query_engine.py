@@ -0,0 +1,278 @@
+"""The pure parts of the shared query engine: cursors, keyset pages, memoized plan parts and caches"""
+
+import base64
+import copy
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from bson.objectid import ObjectId  # noqa: E402
+
+import query_engine as engine  # noqa: E402
+from query_engine import (  # noqa: E402
+    SORT_KEYS, QueryCache, SharedQueryCache, decode_cursor, encode_cursor, keyset_filter, paginate
+)
+
+NOW = datetime(2025, 10, 15, 12, 30)
+
+
+def articles(count, start=NOW):
+    return [
+        {"_id": ObjectId(), "title": f"Article {i}", "published_date": start - timedelta(minutes=i),
+         "relevance_score": 1.0 - i / 1000}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def cold_plan_cache():
+    engine.clear_plan_cache()
+    yield
+    engine.clear_plan_cache()
+
+
+# Cursors
+
+@pytest.mark.parametrize("sort_key, values", [
+    ("date", [NOW, ObjectId()]),
+    ("relevance", [0.75, NOW, ObjectId()]),
+    ("score", [3.5, NOW, ObjectId()]),
+    ("hot_score", [1.25, NOW, ObjectId()]),
+])
+def test_cursor_round_trips_with_bson_types(sort_key, values):
+    cursor = encode_cursor(sort_key, values)
+
+    assert "=" not in cursor
+    decoded_sort_key, decoded = decode_cursor(cursor)
+    assert decoded_sort_key == sort_key
+    assert decoded == values
+    assert [type(value) for value in decoded] == [type(value) for value in values]
+
+
+def forged(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    forged(b"{not json"),
+    forged(b'{"v": [1, 2]}'),
+    forged(b'{"s": "title", "v": [1, 2]}'),
+    forged(b'{"s": "date", "v": [1]}'),
+    forged(b'{"s": "date", "v": [1, 2, 3]}'),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        decode_cursor(cursor)
+
+
+# Keyset pages
+
+def test_keyset_filter_matches_strictly_after_the_key():
+    last_id = ObjectId()
+
+    assert keyset_filter(SORT_KEYS["relevance"], [0.5, NOW, last_id]) == {"$or": [
+        {"relevance_score": {"$lt": 0.5}},
+        {"relevance_score": 0.5, "published_date": {"$lt": NOW}},
+        {"relevance_score": 0.5, "published_date": NOW, "_id": {"$lt": last_id}},
+    ]}
+
+
+def test_paginate_trims_the_extra_article_and_points_past_the_last():
+    found = articles(11)
+
+    page, cursor = paginate(found, 10, "date")
+
+    assert page == found[:10]
+    assert decode_cursor(cursor) == ("date", [found[9]["published_date"], found[9]["_id"]])
+
+
+def test_paginate_last_page_has_no_cursor():
+    found = articles(10)
+
+    assert paginate(found, 10, "date") == (found, None)
+    assert paginate([], 10, "date") == ([], None)
+
+
+def test_paginate_partial_page_continues_after_its_last_article():
+    found = articles(3)
+
+    page, cursor = paginate(found, 10, "date", partial=True)
+
+    assert page == found
+    assert decode_cursor(cursor)[1] == [found[2]["published_date"], found[2]["_id"]]
+    assert paginate([], 10, "date", partial=True) == ([], None)
+
+
+def test_paginate_restores_bson_types_of_string_decoded_keys():
+    # Articles read with ARTICLE_CODEC_OPTIONS carry ids and dates as strings
+    found = [{**article, "_id": str(article["_id"]), "published_date": article["published_date"].isoformat()}
+             for article in articles(2)]
+
+    _, cursor = paginate(found, 1, "date")
+
+    assert decode_cursor(cursor)[1] == [NOW, ObjectId(found[0]["_id"])]
+
+
+# Plans
+
+def test_fetch_news_plan_is_an_indexed_keyset_find():
+    last_id = ObjectId()
+
+    plan = engine.fetch_news_plan("technology", NOW, "date", 10, ["title"], after=[NOW, last_id])
+
+    assert plan.kind == "find"
+    assert plan.filter == {"$and": [
+        {"category_key": "technology", "published_date": {"$gte": NOW}},
+        keyset_filter(SORT_KEYS["date"], [NOW, last_id]),
+    ]}
+    assert plan.sort == [("published_date", -1), ("_id", -1)]
+    assert plan.projection == {"title": 1, "published_date": 1, "_id": 1}
+    assert (plan.limit, plan.page_size) == (11, 10)
+
+
+def test_projection_truncates_content_in_mongodb():
+    projection = engine.build_projection(["title", "content", "password"], 50)
+
+    assert set(projection) == {"title", "content", "content_truncated"}
+    assert projection["content"] == {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, 50]}
+    assert engine.build_projection(["content"], 0) == {"content": 1}
+    assert set(engine.build_projection()) == set(engine.DEFAULT_FIELDS) | {"content_truncated"}
+
+
+def test_plan_parts_are_memoized_per_shape():
+    first = engine.fetch_news_plan("technology", NOW, "date", 10, ["title", "url"])
+    second = engine.fetch_news_plan("sports", NOW - timedelta(days=1), "date", 10, ["title", "url"])
+    other = engine.fetch_news_plan("sports", NOW, "date", 10, ["title"])
+
+    assert first.projection is second.projection and first.sort is second.sort
+    assert other.projection is not first.projection
+    # Values bound per call are never shared
+    assert first.filter is not second.filter
+    assert first.filter["category_key"] == "technology"
+    assert engine.plan_cache_info()["page_shape"]["hits"] == 1
+
+
+def test_compiling_plans_never_mutates_memoized_parts():
+    plan = engine.fetch_news_plan(None, NOW, "relevance", 10, ["title", "content"])
+    search = engine.text_search_plan("mars", 10, ["title"])
+    multi = engine.multi_category_plan("news", ["sports", "technology"], NOW, 5, ["title"])
+    memoized = copy.deepcopy((plan.projection, plan.sort, search.pipeline, multi.pipeline))
+
+    for _ in range(3):
+        engine.fetch_news_plan("science", NOW, "relevance", 10, ["title", "content"], after=[0.5, NOW, ObjectId()])
+        engine.text_search_plan("rover", 10, ["title"], after=[2.0, NOW, ObjectId()], cutoff_date=NOW)
+        engine.multi_category_plan("news", ["world", "sports", "science"], NOW, 5, ["title"])
+        engine.page_plan({"title": "x"}, "relevance", 10, ["title", "content"])
+
+    assert (plan.projection, plan.sort, search.pipeline, multi.pipeline) == memoized
+
+
+def test_text_search_plan_ranks_then_pages():
+    last_id = ObjectId()
+
+    plan = engine.text_search_plan("mars rover", 10, ["title"], after=[2.5, NOW, last_id], cutoff_date=NOW)
+
+    assert plan.kind == "aggregate" and plan.sort_key == "score"
+    assert plan.pipeline[0] == {"$match": {"$text": {"$search": "mars rover"}, "published_date": {"$gte": NOW}}}
+    assert plan.pipeline[2] == {"$match": keyset_filter(SORT_KEYS["score"], [2.5, NOW, last_id])}
+    assert plan.pipeline[-2] == {"$limit": 11}
+    assert plan.pipeline[-1]["$project"]["score"] == 1
+
+
+def test_multi_category_plan_chains_one_branch_per_category():
+    plan = engine.multi_category_plan("news", ["sports", "technology", "world"], NOW, 5)
+
+    assert plan.pipeline[0] == {"$match": {"category_key": "sports", "published_date": {"$gte": NOW}}}
+    unions = [stage["$unionWith"] for stage in plan.pipeline if "$unionWith" in stage]
+    assert [union["pipeline"][0]["$match"]["category_key"] for union in unions] == ["technology", "world"]
+    assert all(union["coll"] == "news" for union in unions)
+
+    grouped = engine.group_by_category(
+        [{"title": "a", "category_key": "world"}, {"title": "b", "category_key": "sports"}],
+        ["sports", "technology", "world"]
+    )
+    assert grouped == {"sports": [{"title": "b"}], "technology": [], "world": [{"title": "a"}]}
+
+
+# Caches: the in-process one, and the SQLite one shared by the workers of a host
+
+@pytest.fixture(params=["in-process", "shared"])
+def make_cache(request, tmp_path):
+    def make(ttl_seconds=60, max_entries=100, max_bytes=1 << 20):
+        if request.param == "shared":
+            return SharedQueryCache(str(tmp_path / "cache.sqlite"), ttl_seconds, max_entries, max_bytes)
+        return QueryCache(ttl_seconds, max_entries, max_bytes)
+    return make
+
+
+def test_cache_returns_what_was_stored(make_cache):
+    cache = make_cache()
+    page = [{"_id": "65f0c0ffee", "title": "a"}]
+
+    assert cache.get(("fetch_news", "technology")) is None
+    cache.set(("fetch_news", "technology"), page, frozenset({"technology"}))
+
+    assert cache.get(("fetch_news", "technology")) == page
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_cache_entries_expire(make_cache):
+    cache = make_cache(ttl_seconds=0.05)
+    cache.set("a", 1, frozenset())
+
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+
+
+def test_cache_invalidates_by_tag(make_cache):
+    cache = make_cache()
+    cache.set("technology", 1, frozenset({"technology"}))
+    cache.set("multi", 2, frozenset({"technology", "sports"}))
+    cache.set("sports", 3, frozenset({"sports"}))
+
+    assert cache.invalidate(frozenset({"technology"})) == 2
+    assert (cache.get("technology"), cache.get("multi"), cache.get("sports")) == (None, None, 3)
+
+    cache.clear()
+    assert cache.get("sports") is None and cache.stats()["entries"] == 0
+
+
+def test_cache_stays_within_its_entry_limit(make_cache):
+    cache = make_cache(max_entries=2)
+    for key in "abc":
+        cache.set(key, key, frozenset())
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("c") == "c"
+
+
+def test_shared_cache_serves_every_worker(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    worker_a = SharedQueryCache(path, 60, 100, 1 << 20)
+    worker_b = SharedQueryCache(path, 60, 100, 1 << 20)
+
+    worker_a.set(("search_news", "mars"), ([{"title": "a"}], None, False), frozenset({engine.SEARCH_TAG}))
+
+    # Stored as JSON, so tuples come back as lists
+    assert worker_b.get(("search_news", "mars")) == [[{"title": "a"}], None, False]
+    assert worker_b.invalidate(frozenset({engine.SEARCH_TAG})) == 1
+    assert worker_a.get(("search_news", "mars")) is None
+
+
+def test_shared_cache_drops_soonest_expiring_entries_first(tmp_path):
+    cache = SharedQueryCache(str(tmp_path / "cache.sqlite"), 60, 2, 1 << 20)
+    cache.set("a", 1, frozenset())
+    cache.set("b", 2, frozenset())
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, frozenset())
+
+    # Unlike QueryCache, reading "a" did not keep it: it expires first
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, 2, 3)
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,117 @@
+"""SharedQueryCache keeps SQLite off the event loop and survives a failing database"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from query_engine import SharedQueryCache  # noqa: E402
+
+TAGS = frozenset({"technology"})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SharedQueryCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60, max_entries=100, max_bytes=1 << 20)
+
+
+def test_async_methods_run_on_a_worker_thread(cache, monkeypatch):
+    threads = []
+    get = cache.get
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    monkeypatch.setattr(cache, "get", recording_get)
+
+    async def roundtrip():
+        await cache.set_async(("fetch_news", "technology"), [{"title": "a"}], TAGS)
+        return await cache.get_async(("fetch_news", "technology"))
+
+    assert asyncio.run(roundtrip()) == [{"title": "a"}]
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_locked_database_does_not_stall_the_event_loop(cache):
+    cache.set(("warm",), 1, TAGS)
+    # Another worker holds the write lock for longer than the busy timeout
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def write_while_locked():
+        ticker = asyncio.ensure_future(tick())
+        await cache.set_async(("fetch_news", "sports"), [1], frozenset({"sports"}))
+        ticker.cancel()
+
+    try:
+        asyncio.run(write_while_locked())
+    finally:
+        writer.rollback()
+        writer.close()
+    # The 0.5s busy timeout elapsed on a worker thread while the loop kept running
+    assert ticks >= 10
+    assert cache.get(("fetch_news", "sports")) is None
+
+
+def test_failing_database_is_logged_not_raised(tmp_path, caplog):
+    # The directory for the SQLite file does not exist, so it cannot be opened
+    cache = SharedQueryCache(str(tmp_path / "missing" / "cache.sqlite"), 60, 100, 1 << 20)
+
+    assert cache.get(("fetch_news",)) is None
+    cache.set(("fetch_news",), [1], TAGS)
+    assert cache.invalidate(TAGS) == 0
+    cache.clear()
+    stats = cache.stats()
+    assert stats["entries"] is None and stats["misses"] == 1
+    assert asyncio.run(cache.clear_async()) is None
+    assert "Shared query cache clear failed" in caplog.text
+
+
+def test_locked_database_invalidation_is_logged_not_raised(cache, caplog):
+    cache.set(("fetch_news", "technology"), [1], TAGS)
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert cache.invalidate(TAGS) == 0
+        cache.clear()
+        assert cache.stats()["hits"] == 0
+    finally:
+        writer.rollback()
+        writer.close()
+    assert "Shared query cache invalidation failed" in caplog.text
+    # Once the lock is released the entry is still there, and can be dropped
+    assert cache.get(("fetch_news", "technology")) == [1]
+    assert cache.invalidate(TAGS) == 1
+
+
+def test_change_stream_watcher_survives_a_failing_cache(http_server, tmp_path, monkeypatch):
+    class UnwatchableCollection:
+        async def watch(self, pipeline, **kwargs):
+            raise RuntimeError("The $changeStream stage is only supported on replica sets")
+
+    cache = SharedQueryCache(str(tmp_path / "missing" / "cache.sqlite"), 60, 100, 1 << 20)
+    monkeypatch.setattr(http_server, "query_cache", cache)
+    monkeypatch.setattr(http_server, "news_collection", UnwatchableCollection())
+
+    async def watch_briefly():
+        watcher = asyncio.ensure_future(http_server.watch_news_changes())
+        await asyncio.sleep(0.2)
+        # Still retrying (asleep until the next attempt), not dead
+        alive = not watcher.done()
+        watcher.cancel()
+        return alive, watcher
+
+    alive, watcher = asyncio.run(watch_briefly())
+    assert alive
+    assert watcher.cancelled()
@@ -0,0 +1,60 @@
+"""Tool calls on the stdio server overlap instead of running one after the other"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("pymongo")
+
+import server  # noqa: E402  (src/server.py)
+
+DELAY = 0.3
+
+
+@pytest.fixture
+def stdio_server(monkeypatch):
+    # Any non-None collection passes the "connection established" check
+    monkeypatch.setattr(server, "news_collection", object())
+    monkeypatch.setattr(server, "QUERY_COALESCING", False)
+    server.query_cache.clear()
+    yield server
+    server.query_cache.clear()
+
+
+def test_slow_tool_calls_overlap(stdio_server, monkeypatch):
+    calls = []
+
+    async def slow_run_db(func, *args, **kwargs):
+        calls.append(func)
+        await asyncio.sleep(DELAY)
+        return [], None, False
+
+    monkeypatch.setattr(stdio_server, "run_db", slow_run_db)
+
+    async def two_calls():
+        return await asyncio.gather(
+            stdio_server.handle_call_tool("fetch_news", {"category": "Technology"}),
+            stdio_server.handle_call_tool("fetch_news", {"category": "Sports"}),
+        )
+
+    started = time.perf_counter()
+    results = asyncio.run(two_calls())
+    elapsed = time.perf_counter() - started
+
+    assert len(calls) == 2
+    assert all(result[0].text.startswith("No news articles found") for result in results)
+    assert elapsed < 1.5 * DELAY
+
+
+def test_blocking_calls_run_off_the_event_loop(stdio_server):
+    async def two_calls():
+        return await asyncio.gather(
+            stdio_server.run_db(time.sleep, DELAY),
+            stdio_server.run_db(time.sleep, DELAY),
+        )
+
+    started = time.perf_counter()
+    asyncio.run(two_calls())
+    assert time.perf_counter() - started < 1.5 * DELAY
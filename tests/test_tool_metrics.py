@@ -0,0 +1,52 @@
+"""Tool metric labels stay bounded and response sizes are sampled"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("pymongo")
+
+import server  # noqa: E402  (src/server.py)
+
+
+def test_stdio_labels_name_only_declared_arguments(monkeypatch):
+    monkeypatch.setattr(server, "news_collection", object())
+
+    async def empty_handler(arguments):
+        return [server.types.TextContent(type="text", text="No news articles found")]
+
+    monkeypatch.setattr(server, "fetch_news_handler", empty_handler)
+
+    async def calls():
+        await server.handle_call_tool("fetch_news", {"category": "Science", "x-trace-1234": "1"})
+        await server.handle_call_tool("no_such_tool_5678", {"limit": 5})
+
+    asyncio.run(calls())
+
+    samples = {
+        (sample.labels["tool"], sample.labels["args"])
+        for metric in server.metrics_registry.collect() if metric.name == "news_tool_latency_seconds"
+        for sample in metric.samples
+    }
+    assert ("fetch_news", "category") in samples
+    assert not any("x-trace" in args or tool == "no_such_tool_5678" for tool, args in samples)
+
+
+def test_response_bytes_are_sampled(http_server, monkeypatch):
+    monkeypatch.setattr(http_server, "RESPONSE_BYTES_SAMPLE_EVERY", 3)
+
+    async def sampled_tool(category: str = "") -> dict:
+        return {"data": {"articles": []}}
+
+    tool = http_server.instrumented(sampled_tool)
+
+    async def calls():
+        for _ in range(7):
+            await tool(category="Science")
+
+    asyncio.run(calls())
+
+    labels = {"tool": "sampled_tool", "args": "category"}
+    assert http_server.metrics_registry.get_sample_value("news_tool_latency_seconds_count", labels) == 7
+    assert http_server.metrics_registry.get_sample_value("news_response_bytes_count", labels) == 3
@@ -0,0 +1,23 @@
+"""The widget templates are served as Apps SDK (skybridge) HTML resources"""
+
+import asyncio
+
+import pytest
+
+fastmcp = pytest.importorskip("fastmcp")
+
+
+@pytest.mark.parametrize("uri", ["ui://widget/news-list.html", "ui://widget/news-search.html"])
+def test_widget_resource_is_skybridge_html(http_server, uri):
+    async def read():
+        async with fastmcp.Client(http_server.mcp) as client:
+            listed = {str(resource.uri): resource for resource in await client.list_resources()}
+            return listed[uri], await client.read_resource(uri)
+
+    listed, contents = asyncio.run(read())
+
+    assert listed.mimeType == http_server.MIME_TYPE == "text/html+skybridge"
+    assert [content.mimeType for content in contents] == ["text/html+skybridge"]
+    widget = http_server.WIDGETS_BY_URI[uri]
+    assert contents[0].text == widget.html
+    assert "<script" in widget.html and widget.meta["openai/outputTemplate"] == uri
@@ -9,6 +9,7 @@ interface Article {
   source: string;
   url?: string;
   published_date: string;
+  content_truncated?: boolean;
 }
 
 interface NewsData {
@@ -16,6 +17,8 @@ interface NewsData {
   category: string;
   count: number;
   days_back: number;
+  cursor?: string | null;
+  next_cursor?: string | null;
 }
 
 function NewsListWidget() {
@@ -38,9 +41,15 @@ function NewsListWidget() {
 
     loadData();
 
-    // Listen for data updates
+    // Listen for data updates; a page fetched with our next_cursor is appended
     window.openai?.onData?.((newData: NewsData) => {
-      setData(newData);
+      setData((prev) => {
+        if (prev && newData.cursor && newData.cursor === prev.next_cursor) {
+          const articles = [...prev.articles, ...newData.articles];
+          return { ...newData, articles, count: articles.length };
+        }
+        return newData;
+      });
     });
   }, []);
 
@@ -74,6 +83,23 @@ function NewsListWidget() {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!data?.next_cursor) return;
+    setLoading(true);
+    try {
+      await window.openai?.callTool('fetch_news', {
+        category: data.category === 'All' ? '' : data.category,
+        limit: 10,
+        days_back: data.days_back,
+        cursor: data.next_cursor
+      });
+    } catch (error) {
+      console.error('Error loading more news:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const openArticle = (url: string) => {
     if (url) {
       window.open(url, '_blank');
@@ -133,7 +159,7 @@ function NewsListWidget() {
 
             <p className="news-card-content">
               {article.content.substring(0, 200)}
-              {article.content.length > 200 ? '...' : ''}
+              {article.content_truncated || article.content.length > 200 ? '...' : ''}
             </p>
 
             <div className="news-card-footer">
@@ -153,6 +179,12 @@ function NewsListWidget() {
           </div>
         ))}
       </div>
+
+      {data.next_cursor && (
+        <button onClick={handleLoadMore} className="refresh-btn load-more-btn" disabled={loading}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
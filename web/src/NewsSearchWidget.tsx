@@ -9,6 +9,7 @@ interface Article {
   source: string;
   url?: string;
   published_date: string;
+  content_truncated?: boolean;
 }
 
 interface SearchData {
@@ -152,7 +153,7 @@ function NewsSearchWidget() {
               <p className="news-card-content">
                 {highlightText(
                   article.content.substring(0, 200) +
-                    (article.content.length > 200 ? '...' : ''),
+                    (article.content_truncated || article.content.length > 200 ? '...' : ''),
                   data?.query || ''
                 )}
               </p>
@@ -7,20 +7,18 @@ export default defineConfig({
   build: {
     outDir: '../assets',
     emptyOutDir: true,
+    manifest: 'manifest.json',
     rollupOptions: {
       input: {
         'news-list': resolve(__dirname, 'src/NewsListWidget.tsx'),
         'news-search': resolve(__dirname, 'src/NewsSearchWidget.tsx'),
       },
       output: {
-        entryFileNames: '[name].js',
+        // Content-hashed names let the server cache bundles as immutable;
+        // manifest.json tells it which hashed file belongs to each widget
+        entryFileNames: '[name]-[hash].js',
         chunkFileNames: '[name]-[hash].js',
-        assetFileNames: (assetInfo) => {
-          if (assetInfo.name?.endsWith('.css')) {
-            return '[name].css';
-          }
-          return '[name]-[hash][extname]';
-        },
+        assetFileNames: '[name]-[hash][extname]',
       },
     },
   },